@@ -0,0 +1,111 @@
+"""Compare per-agent latency and token usage: tiered config vs. the legacy flagship setup.
+
+Legacy = every agent on settings.openai_model, temperature 0.7, no max_tokens.
+Tiered = settings.agent_llm (fast tier for routing agents, output caps).
+
+Usage: python bench_agents.py [runs_per_agent]
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from typing import Any, Dict, List
+
+from src.config.settings import settings, AgentLLMConfig
+from src.agents.topic_agent import TopicAgent
+from src.agents.persona_creator_agent import PersonaCreatorAgent
+from src.agents.orchestrator_agent import OrchestratorAgent
+from src.agents.evaluator_agent import EvaluatorAgent
+from src.agents.direct_human_response_agent import DirectHumanResponseAgent
+from src.agents.executor_agent import ExecutorAgent
+from src.agents.summarizer_agent import SummarizerAgent
+from test_workflow import TEST_CASE, HUMAN_PARTICIPANT
+
+PERSONA_ID = str(uuid.uuid4())
+PERSONA = {
+    "uuid": PERSONA_ID,
+    "name": "Orion",
+    "role": "Product Manager",
+    "background": "Ten years launching B2B SaaS products",
+    "expertise": "Pricing and go-to-market",
+    "personality": "Pragmatic and direct",
+    "is_human": False,
+    "voice": "aura-orion-en",
+}
+DISCUSSION = [
+    {"role": "assistant", "speaker": "Orion", "content": "I think like... freemium gets us adoption fast."},
+    {"role": "user", "content": "But the beta users already pay, why give it away?"},
+]
+
+AGENT_STATES: Dict[Any, Dict[str, Any]] = {
+    TopicAgent: {"case_content": TEST_CASE},
+    PersonaCreatorAgent: {"case_content": TEST_CASE, "human_participant": dict(HUMAN_PARTICIPANT)},
+    OrchestratorAgent: {"current_step": "execute_discussion", "discussion_plan": {}, "messages": []},
+    EvaluatorAgent: {"current_discussion": DISCUSSION, "personas": {PERSONA_ID: PERSONA}},
+    DirectHumanResponseAgent: {"case_content": TEST_CASE, "user_inputs": DISCUSSION[-1:]},
+    ExecutorAgent: {
+        "assignments": [{"professor_statement": "Orion, how should TechCo price this?", "assigned_persona": PERSONA_ID}],
+        "personas": {PERSONA_ID: PERSONA},
+        "current_discussion": DISCUSSION,
+    },
+    SummarizerAgent: {"current_discussion": DISCUSSION},
+}
+
+
+def usage_of(response: Any) -> Dict[str, int]:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return {"input": usage.get("input_tokens", 0), "output": usage.get("output_tokens", 0)}
+
+
+async def run_agent(agent_cls, config: AgentLLMConfig, runs: int) -> Dict[str, Any]:
+    agent = agent_cls()
+    agent.llm_config = config
+    agent.llm = agent._build_llm()
+    agent.transport.policy.timeout = config.timeout or settings.llm_timeout_seconds
+
+    usages: List[Dict[str, int]] = []
+    original_invoke = agent._invoke
+
+    async def recording_invoke(messages, **kwargs):
+        response = await original_invoke(messages, **kwargs)
+        usages.append(usage_of(response))
+        return response
+
+    agent._invoke = recording_invoke
+    latencies, failures = [], 0
+    for _ in range(runs):
+        started = time.monotonic()
+        try:
+            await agent.process(dict(AGENT_STATES[agent_cls]))
+        except Exception as e:
+            failures += 1
+            print(f"  {agent.agent_name}: {e}")
+        latencies.append(time.monotonic() - started)
+
+    return {
+        "model": config.model,
+        "p50": statistics.median(latencies),
+        "max": max(latencies),
+        "in": statistics.mean(u["input"] for u in usages) if usages else 0,
+        "out": statistics.mean(u["output"] for u in usages) if usages else 0,
+        "failures": failures,
+    }
+
+
+async def main(runs: int):
+    print(f"{'agent':<24}{'setup':<8}{'model':<22}{'p50 s':>8}{'max s':>8}{'in tok':>9}{'out tok':>9}{'fail':>6}")
+    for agent_cls in AGENT_STATES:
+        name = agent_cls.agent_name
+        legacy = AgentLLMConfig(model=settings.openai_model, temperature=0.7)
+        tiered = settings.agent_config(name)
+        for label, config in (("legacy", legacy), ("tiered", tiered)):
+            r = await run_agent(agent_cls, config, runs)
+            print(
+                f"{name:<24}{label:<8}{r['model']:<22}{r['p50']:>8.2f}{r['max']:>8.2f}"
+                f"{r['in']:>9.0f}{r['out']:>9.0f}{r['failures']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
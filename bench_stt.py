@@ -0,0 +1,120 @@
+"""Measure how speech-to-text work affects other requests on the same worker.
+
+Runs the app in-process with a fake STT backend. N websocket clients keep
+sending clips while a prober times GET /metrics; the probe latency is
+reported for each backend mode:
+
+  async     - non-blocking backend (like AsyncOpenAI)
+  thread    - synchronous backend, offloaded to a thread by the endpoint
+  blocking  - synchronous work inside the coroutine, as the old handler
+              did with the sync OpenAI client (stalls the event loop)
+
+Usage: python bench_stt.py [connections] [clips_per_connection] [stt_latency_seconds]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import aiohttp
+import uvicorn
+
+from src.speech.stt import STTBackend, set_stt_backend
+from src.main import app
+
+PORT = 8765
+AUDIO_CLIP = b"\x00" * 32000  # ~1s of 16 kHz PCM16 silence; the fake backend ignores the content
+
+
+class FakeAsyncTranscriber(STTBackend):
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def transcribe(self, audio: bytes, filename: str = "audio.mp3") -> str:
+        await asyncio.sleep(self.latency)
+        return f"fake transcript of {len(audio)} bytes"
+
+
+class FakeSyncTranscriber(STTBackend):
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def transcribe(self, audio: bytes, filename: str = "audio.mp3") -> str:
+        time.sleep(self.latency)
+        return f"fake transcript of {len(audio)} bytes"
+
+
+class FakeBlockingTranscriber(FakeAsyncTranscriber):
+    async def transcribe(self, audio: bytes, filename: str = "audio.mp3") -> str:
+        time.sleep(self.latency)  # Blocking call inside the event loop
+        return f"fake transcript of {len(audio)} bytes"
+
+
+MODES = {
+    "async": FakeAsyncTranscriber,
+    "thread": FakeSyncTranscriber,
+    "blocking": FakeBlockingTranscriber,
+}
+
+
+async def speaker(session: aiohttp.ClientSession, clips: int) -> None:
+    async with session.ws_connect(f"http://127.0.0.1:{PORT}/ws/speech-to-text") as ws:
+        for _ in range(clips):
+            await ws.send_bytes(AUDIO_CLIP)
+            # Wait for the transcript; errors from the DB write (no database in a local run) are ignored
+            while "text" not in await ws.receive_json():
+                pass
+
+
+async def prober(session: aiohttp.ClientSession, stop: asyncio.Event, samples: List[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with session.get(f"http://127.0.0.1:{PORT}/metrics") as response:
+            await response.read()
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.02)
+
+
+async def run_mode(mode: str, connections: int, clips: int, latency: float) -> Dict[str, float]:
+    set_stt_backend(MODES[mode](latency))
+    samples: List[float] = []
+    stop = asyncio.Event()
+    async with aiohttp.ClientSession() as session:
+        probe = asyncio.create_task(prober(session, stop, samples))
+        started = time.perf_counter()
+        await asyncio.gather(*(speaker(session, clips) for _ in range(connections)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+    samples.sort()
+    return {
+        "probe_p50_ms": statistics.median(samples) * 1000,
+        "probe_p95_ms": samples[int(len(samples) * 0.95) - 1] * 1000 if len(samples) > 1 else samples[0] * 1000,
+        "probe_max_ms": samples[-1] * 1000,
+        "wall_s": elapsed,
+    }
+
+
+async def main(connections: int, clips: int, latency: float) -> None:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning", lifespan="off"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    print(f"{connections} connections x {clips} clips, STT latency {latency}s")
+    print(f"{'mode':<10}{'probe p50 ms':>14}{'probe p95 ms':>14}{'probe max ms':>14}{'wall s':>10}")
+    for mode in MODES:
+        result = await run_mode(mode, connections, clips, latency)
+        print(f"{mode:<10}{result['probe_p50_ms']:>14.1f}{result['probe_p95_ms']:>14.1f}"
+              f"{result['probe_max_ms']:>14.1f}{result['wall_s']:>10.2f}")
+
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    clips = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    asyncio.run(main(connections, clips, latency))
@@ -0,0 +1,85 @@
+"""Load-test the voice path end to end: websocket -> STT -> messages table -> workflow wakeup.
+
+Uses the scripted STT backend (no network STT) against the configured
+database. For each of N simulated students a CaseDiscussionWorkflow
+waits in handle_user_input for its own started_case_id while a websocket
+client sends a clip tagged with that id. Reported per stage:
+
+  transcript  - clip sent -> transcript received on the socket
+  wakeup      - clip sent -> handle_user_input returned with the message
+
+Usage: python bench_voice.py [connections] [stt_latency_seconds]
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+import aiohttp
+import uvicorn
+
+from src.config.settings import settings
+from src.speech.stt import ScriptedSTTBackend, set_stt_backend
+from src.workflow.case_discussion_workflow import CaseDiscussionWorkflow
+from src.main import app
+
+PORT = 8766
+AUDIO_CLIP = b"\x00" * 32000
+
+
+async def student(session: aiohttp.ClientSession, index: int) -> Dict[str, float]:
+    workflow = CaseDiscussionWorkflow()
+    started_case_id = str(workflow.started_case_id)
+    waiting = asyncio.create_task(workflow.handle_user_input({"human_participant": {"name": f"Student {index}"}}))
+
+    url = f"http://127.0.0.1:{PORT}/ws/speech-to-text?started_case_id={started_case_id}"
+    async with session.ws_connect(url) as ws:
+        sent = time.perf_counter()
+        await ws.send_bytes(AUDIO_CLIP)
+        reply = await ws.receive_json()
+        transcript = time.perf_counter() - sent
+        if "text" not in reply:
+            raise RuntimeError(f"Student {index}: {reply}")
+        result = await waiting
+        wakeup = time.perf_counter() - sent
+    if result.get("awaiting_user_input"):
+        raise RuntimeError(f"Student {index}: workflow never saw the message")
+    return {"transcript": transcript, "wakeup": wakeup}
+
+
+def summarize(values: List[float]) -> str:
+    values = sorted(values)
+    p95 = values[max(0, int(len(values) * 0.95) - 1)]
+    return f"p50 {statistics.median(values) * 1000:8.1f} ms   p95 {p95 * 1000:8.1f} ms   max {values[-1] * 1000:8.1f} ms"
+
+
+async def main(connections: int, latency: float) -> None:
+    set_stt_backend(ScriptedSTTBackend(settings.stt_scripted_transcripts, latency=latency, jitter=0.2))
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning", lifespan="off"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        results = await asyncio.gather(*(student(session, i) for i in range(connections)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if isinstance(r, dict)]
+    for failure in (r for r in results if isinstance(r, Exception)):
+        print(f"failed: {failure}")
+    print(f"{connections} concurrent connections, scripted STT latency {latency}s, wall {elapsed:.2f}s, {len(ok)} ok")
+    if ok:
+        print(f"transcript  {summarize([r['transcript'] for r in ok])}")
+        print(f"wakeup      {summarize([r['wakeup'] for r in ok])}")
+
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    asyncio.run(main(connections, latency))
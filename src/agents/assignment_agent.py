@@ -1,6 +1,6 @@
 from typing import Dict, Any
 from src.agents.base_agent import BaseAgent
-from langchain.schema import SystemMessage, HumanMessage
+from src.llm.scheduler import PRIORITY_EVALUATION
 from src.models.discussion_models import Assignment, AssignmentResponse, PersonaInfo
 
 class AssignmentAgent(BaseAgent):
@@ -8,6 +8,8 @@ class AssignmentAgent(BaseAgent):
     Agent responsible for acting as a professor and assigning questions/transitions
     for the discussion participants.
     """
+    agent_name = "assignment"
+    priority = PRIORITY_EVALUATION
     
     def __init__(self):
         super().__init__()  # Call parent class's __init__
@@ -56,16 +58,18 @@ class AssignmentAgent(BaseAgent):
                 return response.model_dump()
         
         # Otherwise, fall back to generating a new question
-        response = await self.llm.ainvoke([
-            SystemMessage(content=self._get_system_prompt()),
-            HumanMessage(content=self._create_prompt(
+        response = await self._invoke(self._assemble(
+            static_prefix=self._get_system_prompt(),
+            session_context={
+                "Available Topics": topics,
+                "Available Personas": personas
+            },
+            turn_suffix=self._create_prompt(
                 current_step=current_step,
                 discussion_plan=discussion_plan,
-                current_discussion=current_discussion,
-                topics=topics,
-                personas=personas
-            ))
-        ])
+                current_discussion=current_discussion
+            )
+        ))
 
         try:
             cleaned_content = response.content.strip()
@@ -95,12 +99,9 @@ class AssignmentAgent(BaseAgent):
         Do not include any other text, explanations, or formatting - only the JSON object."""
 
     def _create_prompt(self, current_step: str, discussion_plan: Dict[str, Any],
-                      current_discussion: list, topics: Dict[str, Any],
-                      personas: Dict[str, Any]) -> str:
+                      current_discussion: list) -> str:
         return f"""Based on the current discussion state, determine the next logical question or transition needed.
 
                 Current Step: {current_step}
                 Discussion Plan: {discussion_plan}
-                Current Discussion History: {current_discussion}
-                Available Topics: {topics}
-                Available Personas: {personas}"""
\ No newline at end of file
+                Current Discussion History: {current_discussion}"""
\ No newline at end of file
@@ -1,20 +1,125 @@
-from typing import Dict, Any, TypeVar, Type
+from typing import Dict, Any, List, Optional, TypeVar, Type
 from pydantic import BaseModel
 from langchain_openai import ChatOpenAI
 from langchain.schema import SystemMessage, HumanMessage
 from src.config.settings import settings
+from src.llm.transport import LLMTransport, LLMCallPolicy, model_name_of
+from src.llm.scheduler import PRIORITY_BOOTSTRAP
+from src.llm.latency import get_model_router
+from src.llm.singleflight import bootstrap_flight, prompt_key
+from src.llm.streaming import JsonStringField
+from src.prompts.assembly import assemble_prompt
+from src.sessions.channels import channel_hub
 import json
 import re
 
 T = TypeVar('T', bound=BaseModel)
 
 class BaseAgent:
+    # Name used for metrics and per-agent configuration (settings.agent_llm)
+    agent_name: str = "base"
+    # Scheduler priority class (see src/llm/scheduler.py)
+    priority: int = PRIORITY_BOOTSTRAP
+    # Human-facing agents whose calls may be hedged (settings.llm_hedging_enabled)
+    latency_critical: bool = False
+    # Share one in-flight call between sessions sending a byte-identical prompt (case bootstrap)
+    coalesce_identical_calls: bool = False
+
     def __init__(self, llm=None):
-        self.llm = llm or ChatOpenAI(
-            temperature=0.7,
-            model=settings.openai_model,
-            api_key=settings.openai_api_key
+        self.llm_config = settings.agent_config(self.agent_name)
+        self.llm = llm or self._build_llm()
+        # Lazily built clients for fallback models, keyed by model name
+        self._fallback_llms: Dict[str, Any] = {}
+        # Set by the workflow so the scheduler can share capacity fairly across sessions
+        self.session_id = "default"
+        self.transport = LLMTransport(self.agent_name, LLMCallPolicy(
+            timeout=self.llm_config.timeout or settings.llm_timeout_seconds,
+            max_retries=settings.llm_max_retries,
+            backoff_base=settings.llm_backoff_base_seconds,
+            backoff_max=settings.llm_backoff_max_seconds,
+            hedge=self.latency_critical and settings.llm_hedging_enabled,
+            hedge_percentile=settings.llm_hedge_percentile,
+            hedge_delay=settings.llm_hedge_delay_seconds,
+            max_prompt_tokens=self.llm_config.max_prompt_tokens or settings.llm_max_prompt_tokens,
+            budget_mode=settings.llm_budget_mode,
+            max_tokens_ceiling=settings.llm_max_tokens_ceiling
+        ))
+
+    def _build_llm(self, model: Optional[str] = None) -> ChatOpenAI:
+        """Create the chat model from this agent's config; retries are left to the transport."""
+        return ChatOpenAI(
+            model=model or self.llm_config.model,
+            temperature=self.llm_config.temperature,
+            max_tokens=self.llm_config.max_tokens,
+            stop=self.llm_config.stop,
+            api_key=settings.openai_api_key,
+            max_retries=0
+        )
+
+    def _select_llm(self) -> Any:
+        """Pick the primary client, or the fallback while the primary breaches its latency SLO."""
+        primary = model_name_of(self.llm)
+        model = get_model_router().choose(
+            self.agent_name,
+            primary,
+            self.llm_config.fallback_model,
+            self.llm_config.latency_slo_p95
         )
+        if model == primary:
+            return self.llm
+        if model not in self._fallback_llms:
+            self._fallback_llms[model] = self._build_llm(model=model)
+        return self._fallback_llms[model]
+
+    def _assemble(
+        self,
+        static_prefix: str,
+        turn_suffix: str,
+        session_context: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """Build messages as static prefix -> session context -> per-turn suffix (see src/prompts/assembly.py)."""
+        return assemble_prompt(self.agent_name, self.session_id, static_prefix, session_context, turn_suffix)
+
+    async def _invoke(
+        self,
+        messages: List[Any],
+        token_event: Optional[Dict[str, Any]] = None,
+        stream_field: Optional[str] = None
+    ) -> Any:
+        """Call the LLM through the shared transport (scheduler, deadline, retries, circuit breaker).
+
+        With `token_event`, the completion is streamed to the session's
+        websocket subscribers as {"type": "token", "delta": ..., **token_event}
+        events while it is generated (only if someone is listening). For a
+        JSON completion, `stream_field` names the string field whose decoded
+        text is sent instead of the raw JSON fragments.
+        """
+        llm = self._select_llm()
+        on_token = None
+        channel = channel_hub.find(self.session_id) if token_event is not None else None
+        if channel is not None and channel.has_subscribers:
+            def publish(delta: str) -> None:
+                channel.publish({"type": "token", "agent": self.agent_name, "delta": delta, **token_event})
+
+            if stream_field is None:
+                on_token = publish
+            else:
+                field = JsonStringField(stream_field)
+
+                def on_token(delta: str) -> None:
+                    text = field.feed(delta)
+                    if text:
+                        publish(text)
+
+        def call():
+            return self.transport.ainvoke(
+                llm, messages, priority=self.priority, session_id=self.session_id, on_token=on_token
+            )
+
+        if not self.coalesce_identical_calls:
+            return await call()
+        key = prompt_key(self.agent_name, model_name_of(llm), messages)
+        return await bootstrap_flight.do(key, call, agent=self.agent_name)
     
     def _clean_and_parse_response(self, response: str, model_class: Type[T]) -> T:
         """Clean LLM response and parse it with a Pydantic model.
@@ -1,22 +1,20 @@
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
 from src.config.settings import settings
 from .base_agent import BaseAgent
+from src.llm.scheduler import PRIORITY_EVALUATION
 from src.models.discussion_models import EvaluationResponse
 
 
 class EvaluatorAgent(BaseAgent):
+    agent_name = "evaluator"
+    priority = PRIORITY_EVALUATION
+
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            api_key=settings.openai_api_key,
-            temperature=0.5
-        )
+        super().__init__()  # Call parent class's __init__
 
     async def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        response = await self.llm.ainvoke([
-            SystemMessage(content="""You are the Harvard Business School case professor), known for your Socratic method and ability to push students to deeper critical thinking. Your role is to:
+        response = await self._invoke(self._assemble(
+            static_prefix="""You are the Harvard Business School case professor), known for your Socratic method and ability to push students to deeper critical thinking. Your role is to:
 
             1. Challenge assumptions and probe deeper:
                - Question the underlying assumptions in students' responses
@@ -61,9 +59,10 @@ class EvaluatorAgent(BaseAgent):
             - Set sequence_complete when current speakers have contributed
             - Set current_topic_complete when you feel like it
             
-            Do not include any other text, explanations, or formatting - only the JSON object."""),
-            HumanMessage(content=str(state))
-        ])
+            Do not include any other text, explanations, or formatting - only the JSON object.""",
+            session_context={"Personas": state.get("personas")},
+            turn_suffix=str({key: value for key, value in state.items() if key != "personas"})
+        ))
         
         # Parse response using Pydantic model
         try:
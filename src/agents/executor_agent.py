@@ -1,23 +1,20 @@
 # src/agents/executor_agent.py
 from typing import Dict, Any, List
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
 from src.prompts.agent_prompts import EXECUTOR_PROMPT
 from src.config.settings import settings
 from src.agents.base_agent import BaseAgent
+from src.llm.scheduler import PRIORITY_LIVE
 import json
 from src.models.discussion_models import ExecutorResponse, PersonaInfo, Assignment
 
 class ExecutorAgent(BaseAgent):
     """Agent responsible for executing the case study discussion."""
+    agent_name = "executor"
+    priority = PRIORITY_LIVE
+    latency_critical = True
     
     def __init__(self):
         super().__init__()  # Call parent class's __init__
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            temperature=0.7,
-            api_key=settings.openai_api_key
-        )
     
     async def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Generate the next part of the discussion."""
@@ -123,21 +120,23 @@ class ExecutorAgent(BaseAgent):
         # Add this debug print
         print(f"UUID being passed to system prompt: {assigned_persona_data.get('uuid', 'No UUID found')}")
 
-        response = await self.llm.ainvoke([
-            SystemMessage(content=self._get_system_prompt({
-                "name": persona_name,
-                "background": background,
-                "expertise": expertise,
-                "personality": personality,
-                "role": role,
-                "uuid": assigned_persona_data.get('uuid', '')  # Ensure we're getting the UUID
-            })),
-            HumanMessage(content=self._create_prompt(
+        persona = {
+            "name": persona_name,
+            "background": background,
+            "expertise": expertise,
+            "personality": personality,
+            "role": role,
+            "uuid": assigned_persona_data.get('uuid', '')  # Ensure we're getting the UUID
+        }
+        response = await self._invoke(self._assemble(
+            static_prefix=self._get_system_prompt(),
+            session_context={"Participants": self._format_participants(personas)},
+            turn_suffix=self._create_prompt(
                 professor_statement=professor_statement,
                 current_discussion=state.get("current_discussion", []),
-                persona_data=assigned_persona_data
-            ))
-        ])
+                persona_data=persona
+            )
+        ), token_event={"persona_id": persona["uuid"]}, stream_field="message")
         
         try:
             print(f"response: {response}")
@@ -150,33 +149,31 @@ class ExecutorAgent(BaseAgent):
         except Exception as e:
             raise ValueError(f"Failed to parse LLM response: {e}")
 
-    def _get_system_prompt(self, persona_data: Dict[str, Any]) -> str:
-        return f"""You are {persona_data['name']}, with the following characteristics:
-        Background: {persona_data['background']}
-        Expertise: {persona_data['expertise']}
-        Personality: {persona_data['personality']}
-        Role: {persona_data['role']}
-
-        IMPORTANT: You MUST use this exact UUID in your response: {persona_data['uuid']}
+    def _get_system_prompt(self) -> str:
+        # Static across every turn and session: persona details live in the
+        # session context and the per-turn prompt so this prefix stays cacheable
+        return """You play one participant in a case discussion. The participant you are
+        speaking as for this turn, including their exact UUID, is given at the start of the user message;
+        every participant's characteristics are listed under Participants below.
 
         Respond in character to the discussion prompt. Your response must be in this EXACT JSON format:
-        {{
-            "response": {{
+        {
+            "response": {
                 "message": "Your response text",
-                "speaker": "{persona_data['name']}",
-                "uuid": "{persona_data['uuid']}",
+                "speaker": "the name of the participant you are speaking as",
+                "uuid": "the exact UUID of the participant you are speaking as",
                 "references_to_others": ["names of other participants you reference"],
                 "questions_raised": ["questions you pose to others"],
                 "key_points": ["main points you make"]
-            }}
-        }}
+            }
+        }
 
         Guidelines:
         - MOST IMPORTANT: Talk like a human.
         - Use '...', "hmm", "um", "like", etc.
         - Say things that people say in real life (use the word 'like' when giving examples).
         - No responses should be more than 2-3 sentences.
-        - The UUID field must contain exactly: {persona_data['uuid']}
+        - The UUID field must contain exactly the UUID given for this turn
         - Stay in character
         - Reference others' points 
         - Be concise straight to the point
@@ -184,6 +181,24 @@ class ExecutorAgent(BaseAgent):
         
         Do not include any other text, explanations, or formatting - only the JSON object."""
 
+    def _format_participants(self, personas: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Session-stable participant list, ordered by UUID so it renders identically every turn."""
+        participants = []
+        for persona_id in sorted(personas):
+            persona = personas[persona_id]
+            if hasattr(persona, 'model_dump'):
+                persona = persona.model_dump()
+            participants.append({
+                "uuid": persona.get("uuid", persona_id),
+                "name": persona.get("name", ""),
+                "role": persona.get("role", ""),
+                "background": persona.get("background", ""),
+                "expertise": persona.get("expertise", ""),
+                "personality": persona.get("personality", ""),
+                "is_human": persona.get("is_human", False)
+            })
+        return participants
+
     def _create_prompt(self, professor_statement: str, current_discussion: list, persona_data: Dict[str, Any]) -> str:
         # Convert AIMessages to dict format
         formatted_discussion = []
@@ -201,10 +216,12 @@ class ExecutorAgent(BaseAgent):
             else:  # It's already a dict
                 formatted_discussion.append(entry)
 
-        return f"""Professor's Question: {professor_statement}
+        return f"""You are speaking as {persona_data['name']} (UUID: {persona_data['uuid']}), the {persona_data['role']} described under Participants.
+
+Professor's Question: {professor_statement}
 
 Current Discussion:
-{json.dumps(formatted_discussion, indent=2)}
+{json.dumps(formatted_discussion, default=str)}
 
 Respond as {persona_data['name']} to the professor's question, taking into account the current discussion context."""
 
@@ -1,22 +1,18 @@
 # src/agents/orchestrator_agent.py
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
 from src.prompts.agent_prompts import ORCHESTRATOR_PROMPT
 from src.config.settings import settings
 from src.models.discussion_models import OrchestratorResponse, DiscussionState
 from src.agents.base_agent import BaseAgent
+from src.llm.scheduler import PRIORITY_EVALUATION
 
 class OrchestratorAgent(BaseAgent):
     """Agent responsible for orchestrating the case study discussion."""
+    agent_name = "orchestrator"
+    priority = PRIORITY_EVALUATION
     
     def __init__(self):
         super().__init__()  # Call parent class's __init__
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            api_key=settings.openai_api_key,
-            temperature=0.7
-        )
     
     async def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Process the current state and determine next steps."""
@@ -24,8 +20,8 @@ class OrchestratorAgent(BaseAgent):
         # Format state for prompt
         state_summary = self._format_state(state)
         
-        response = await self.llm.ainvoke([
-            SystemMessage(content="""You are the orchestrator of a case study discussion.
+        response = await self._invoke(self._assemble(
+            static_prefix="""You are the orchestrator of a case study discussion.
             Your role is to determine the next logical step in the discussion process.
             
             You must respond with ONLY valid JSON in the following format:
@@ -36,9 +32,9 @@ class OrchestratorAgent(BaseAgent):
                 }
             }
             
-            Do not include any other text, explanations, or formatting - only the JSON object."""),
-            HumanMessage(content=f"Based on the current state, what should be the next step?\n\n{state_summary}")
-        ])
+            Do not include any other text, explanations, or formatting - only the JSON object.""",
+            turn_suffix=f"Based on the current state, what should be the next step?\n\n{state_summary}"
+        ))
         
         try:
             parsed_data = self._clean_and_parse_response(response.content, OrchestratorResponse)
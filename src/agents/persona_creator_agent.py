@@ -1,6 +1,4 @@
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
 from src.agents.base_agent import BaseAgent
 from src.config.settings import settings
 from src.models.discussion_models import PersonaResponse, PersonaInfo
@@ -8,13 +6,11 @@ import json
 import uuid
 
 class PersonaCreatorAgent(BaseAgent):
+    agent_name = "persona_creator"
+    coalesce_identical_calls = True
+
     def __init__(self):
         super().__init__()
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            temperature=0.7,
-            api_key=settings.openai_api_key
-        )
 
     def _get_system_prompt(self) -> str:
         return """You are responsible for creating AI personas for a case discussion. 
@@ -88,16 +84,18 @@ class PersonaCreatorAgent(BaseAgent):
         ai_uuids = [str(uuid.uuid4()) for _ in range(3)]
         professor_uuid = str(uuid.uuid4())  # Add UUID for professor
 
-        response = await self.llm.ainvoke([
-            SystemMessage(content=self._get_system_prompt()),
-            HumanMessage(content=f"""Create AI personas for this case, starting with participant_2 
-            (participant_1 is reserved for the human participant): {case_content}
+        response = await self._invoke(self._assemble(
+            static_prefix=self._get_system_prompt(),
+            session_context={"Case content": case_content},
+            # Only the role shapes the AI cast; leaving the student's name out keeps the
+            # prompt identical for everyone starting this case, so the call can be shared
+            turn_suffix=f"""Create AI personas for the case above, starting with participant_2 
+            (participant_1 is reserved for the human participant).
             
             Human participant info (for context):
-            Name: {human_persona.name}
             Role: {human_persona.role}
-            """)
-        ])
+            """
+        ))
 
         try:
             parsed_data = self._clean_and_parse_response(response.content, PersonaResponse)
@@ -1,21 +1,35 @@
 # src/agents/planner_agent.py
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+from typing import Dict, Any, Tuple
 from src.config.settings import settings
 from src.models.discussion_models import PlannerResponse, DiscussionPlanSequence
 from src.agents.base_agent import BaseAgent
 
 class PlannerAgent(BaseAgent):
     """Agent responsible for planning the case study discussion."""
+    agent_name = "planner"
+    coalesce_identical_calls = True
     
     def __init__(self):
         super().__init__()  # Call parent class's __init__
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            api_key=settings.openai_api_key,
-            temperature=0.7
-        )
+
+    @staticmethod
+    def _alias_personas(personas: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Replace per-session persona UUIDs with stable aliases (participant_1 is the human).
+
+        The human participant is reduced to their role, so every session of the
+        same case sends the planner an identical prompt. Returns the aliased
+        personas and the alias -> UUID map used to translate the plan back.
+        """
+        aliased, alias_to_uuid = {}, {}
+        ordered = sorted(personas.items(), key=lambda item: not item[1].get("is_human", False))
+        for index, (persona_uuid, persona) in enumerate(ordered, 1):
+            alias = f"participant_{index}"
+            alias_to_uuid[alias] = persona_uuid
+            if persona.get("is_human"):
+                aliased[alias] = {"role": persona.get("role"), "is_human": True}
+            else:
+                aliased[alias] = {k: v for k, v in persona.items() if k != "uuid"}
+        return aliased, alias_to_uuid
     
     async def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Create or update the discussion plan."""
@@ -28,9 +42,10 @@ class PlannerAgent(BaseAgent):
         personas = state.get('personas', {})
         if hasattr(personas, 'model_dump'):
             personas = personas.model_dump()
+        personas, alias_to_uuid = self._alias_personas(personas)
 
-        response = await self.llm.ainvoke([
-            SystemMessage(content="""You are the Planner, responsible for determining the sequence of personas in the discussion of each topic.
+        response = await self._invoke(self._assemble(
+            static_prefix="""You are the Planner, responsible for determining the sequence of personas in the discussion of each topic.
             Your role is to create an engaging discussion flow by ordering the personas in a way that builds meaningful dialogue and insights.
             DO NOT include the professor in the sequence, but make sure to include all other personas.
             You must respond with ONLY valid JSON in the following format:
@@ -39,7 +54,7 @@ class PlannerAgent(BaseAgent):
                     "sequences": [
                         {
                             "topic_index": int,
-                            "persona_sequence": ["uuid1", "uuid2", "uuid3"],
+                            "persona_sequence": ["participant_2", "participant_1", "participant_3"],
                             "follow_up_question": "string"
                         }
                     ],
@@ -47,13 +62,15 @@ class PlannerAgent(BaseAgent):
                 }
             }
             
-            The persona_sequence should list the IDs of personas in the order they should speak.
-            Do not include any other text, explanations, or formatting - only the JSON object."""),
-            HumanMessage(content=f"""Create a discussion sequence for each topic.
-                Case content: {state['case_content']}
-                Topics: {topics}
-                Available personas: {personas}""")
-        ])
+            The persona_sequence should list the IDs (e.g. "participant_2") of personas in the order they should speak.
+            Do not include any other text, explanations, or formatting - only the JSON object.""",
+            session_context={
+                "Case content": state['case_content'],
+                "Topics": topics,
+                "Available personas": personas
+            },
+            turn_suffix="Create a discussion sequence for each topic."
+        ))
         
         try:
             parsed_data = self._clean_and_parse_response(response.content, PlannerResponse)
@@ -64,6 +81,7 @@ class PlannerAgent(BaseAgent):
                     raise ValueError(f"Invalid sequence format: {sequence}")
                 if not sequence.persona_sequence:
                     raise ValueError("Empty persona sequence not allowed")
+                sequence.persona_sequence = [alias_to_uuid.get(p, p) for p in sequence.persona_sequence]
             
             return {
                 "plan": parsed_data.plan.model_dump(),
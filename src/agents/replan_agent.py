@@ -1,19 +1,16 @@
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
 from src.config.settings import settings
 from .base_agent import BaseAgent
+from src.llm.scheduler import PRIORITY_EVALUATION
 from src.models.discussion_models import ReplanResponse, PersonaInfo
 
 
 class ReplanAgent(BaseAgent):
+    agent_name = "replan"
+    priority = PRIORITY_EVALUATION
+
     def __init__(self):
         super().__init__()  # Call parent class's __init__
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            api_key=settings.openai_api_key,
-            temperature=0.7
-        )
 
     async def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
         suggested_next_speaker = state.get("suggested_next_speaker", "")
@@ -68,8 +65,8 @@ class ReplanAgent(BaseAgent):
             else persona_data.get("name", participant_id)
         )
 
-        response = await self.llm.ainvoke([
-            SystemMessage(content="""You are the Replanner. Your role is to:
+        response = await self._invoke(self._assemble(
+            static_prefix="""You are the Replanner. Your role is to:
             1. Replan the discussion sequence
             2. Ensure the specified next speaker is first
             3. Maintain logical flow of conversation
@@ -95,13 +92,13 @@ class ReplanAgent(BaseAgent):
                 ]
             }
             
-            Do not include any other text, explanations, or formatting - only the JSON object."""),
-            HumanMessage(content=f"""Replan the discussion sequence with:
+            Do not include any other text, explanations, or formatting - only the JSON object.""",
+            turn_suffix=f"""Replan the discussion sequence with:
                 Current plan: {state['discussion_plan']}
                 Required first speaker (participant_id): {participant_id} (Name: {speaker_name})
                 Follow-up question: {follow_up_question}
-                Current discussion: {state.get('current_discussion', [])}""")
-        ])
+                Current discussion: {state.get('current_discussion', [])}"""
+        ))
         
         try:
             parsed_data = self._clean_and_parse_response(response.content, ReplanResponse)
@@ -1,26 +1,23 @@
 from typing import Dict, Any, List
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
 from src.agents.base_agent import BaseAgent
+from src.llm.scheduler import PRIORITY_SUMMARIZATION
 from src.config.settings import settings
 from src.models.discussion_models import SummaryResponse, DiscussionResponse
 
 class SummarizerAgent(BaseAgent):
+    agent_name = "summarizer"
+    priority = PRIORITY_SUMMARIZATION
+
     def __init__(self):
         super().__init__()  # Call parent class's __init__
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            temperature=0.7,
-            api_key=settings.openai_api_key
-        )
 
     async def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
         # Format the discussion history for summarization
         current_discussion = state.get("current_discussion", [])
         formatted_discussion = self._format_discussion_entries(current_discussion)
         
-        response = await self.llm.ainvoke([
-            SystemMessage(content="""You are the discussion summarizer. Your role is to:
+        response = await self._invoke(self._assemble(
+            static_prefix="""You are the discussion summarizer. Your role is to:
             1. Synthesize key points from the discussion
             2. Highlight important insights
             3. Track evolving perspectives
@@ -37,9 +34,9 @@ class SummarizerAgent(BaseAgent):
                 }
             }
             
-            Do not include any other text, explanations, or formatting - only the JSON object."""),
-            HumanMessage(content=f"Summarize the following discussion:\n\n{formatted_discussion}")
-        ])
+            Do not include any other text, explanations, or formatting - only the JSON object.""",
+            turn_suffix=f"Summarize the following discussion:\n\n{formatted_discussion}"
+        ))
         
         try:
             parsed_data = self._clean_and_parse_response(response.content, SummaryResponse)
@@ -1,21 +1,16 @@
 # src/agents/planner_agent.py
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
 from src.config.settings import settings
 from src.models.discussion_models import TopicResponse
 from src.agents.base_agent import BaseAgent
 
 class TopicAgent(BaseAgent):
     """Agent responsible for topic selection for the case study discussion."""
+    agent_name = "topic"
+    coalesce_identical_calls = True
     
     def __init__(self):
         super().__init__()  # Call parent class's __init__
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            api_key=settings.openai_api_key,
-            temperature=0.7
-        )
     
     async def process(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Create or update the discussion plan."""
@@ -23,8 +18,8 @@ class TopicAgent(BaseAgent):
         if not case_content:
             raise ValueError("No case content provided")
 
-        response = await self.llm.ainvoke([
-            SystemMessage(content="""You are the Topic Planner, responsible for identifying the 3 most critical topics or core insights for this Harvard Business School case study discussion.
+        response = await self._invoke(self._assemble(
+            static_prefix="""You are the Topic Planner, responsible for identifying the 3 most critical topics or core insights for this Harvard Business School case study discussion.
             Your role is to create a focused roadmap covering the 3 most important aspects that will lead to meaningful learning outcomes.
             For each of the 3 topics, you will:
             1. Identify a key aspect of the case that warrants deep discussion
@@ -47,9 +42,10 @@ class TopicAgent(BaseAgent):
             }
             
             Ensure you provide exactly 3 topics in the response.
-            Do not include any other text, explanations, or formatting - only the JSON object."""),
-            HumanMessage(content=f"Develop a focused three-topic discussion plan. Include cold-call opportunities, debate questions, and key moments for insight evaluation. Create a discussion plan for this case: {case_content}")
-        ])
+            Do not include any other text, explanations, or formatting - only the JSON object.""",
+            session_context={"Case content": case_content},
+            turn_suffix="Develop a focused three-topic discussion plan. Include cold-call opportunities, debate questions, and key moments for insight evaluation. Create a discussion plan for the case above."
+        ))
         
         try:
             parsed_data = self._clean_and_parse_response(response.content, TopicResponse)
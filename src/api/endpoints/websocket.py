@@ -1,59 +1,329 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from openai import OpenAI
 from src.db.database import create_message as db_create_message
+from src.sessions.registry import registry
+from src.config.settings import settings
+from src.metrics import metrics
+from src.sessions.channels import channel_hub
+from src.speech.vad import EnergyVAD, pcm16_to_wav
+from src.speech.stt import transcribe
+from typing import Any, Dict, Iterable, List, Optional
+import asyncio
 import json
+import time
 
 router = APIRouter()
-client = OpenAI()
+
+# Used when a client does not say which started case it belongs to
+DEFAULT_STARTED_CASE_ID = '56196549-7527-4d86-a20e-9636b472a98e'
+
+
+async def _persist_human_message(app, started_case_id: str, text: str) -> None:
+    """Hand a finished human turn to the workflow on this worker, then store it."""
+    channel = channel_hub.get(started_case_id)
+    delivered = channel.deliver_input(text)
+    channel.publish({"type": "message", "content": text, "is_human": True, "awaiting_user_input": False})
+
+    # The row is the transcript of record; undelivered turns are what workflows elsewhere poll for
+    print("Saving message to database...")
+    await db_create_message(app, {
+        "started_case_id": started_case_id,
+        "content": text,
+        "is_user_message": True,
+        "awaiting_user_input": False,
+        "consumed": delivered
+    })
+    print("Message saved successfully")
+
+
+def _socket_sender(websocket: WebSocket):
+    send_lock = asyncio.Lock()
+
+    async def send(payload: Dict[str, Any]) -> None:
+        # The receive loop and the transcription worker both reply on this socket
+        async with send_lock:
+            try:
+                await websocket.send_text(json.dumps(payload))
+            except Exception as e:
+                # The client may be gone while queued audio is still being transcribed;
+                # the reply is lost but the turn must still be persisted
+                print(f"Could not send to client: {e}")
+    return send
+
+
+async def _report_error(send, e: Exception) -> None:
+    print(f"Error occurred: {str(e)}")
+    metrics.increment("stt_errors_total")
+    try:
+        await send({"error": str(e)})
+    except Exception:
+        print("Failed to send error message to client")
+
+
+def _on_disconnect(session_id: Optional[str]) -> None:
+    print("WebSocket disconnected")
+    if session_id:
+        # Leave the graph running so a reconnect with last_event_id picks up where it left off;
+        # if the client never comes back, the reaper's heartbeat timeout cancels and checkpoints it
+        registry.touch(session_id)
+
+
+async def _close_worker(worker: asyncio.Task, queue: asyncio.Queue, tail: Iterable[Any] = ()) -> None:
+    """Let a connection's transcription worker finish its queued audio, then stop it.
+
+    `tail` is what the VAD still held when the client went away. It is
+    queued behind the rest, followed by the None that tells the worker to
+    exit; whatever is not done after `stt_drain_timeout_seconds` is cancelled.
+    """
+    async def finish() -> None:
+        for item in tail:
+            await queue.put(item)
+        await queue.put(None)
+        await worker
+
+    try:
+        await asyncio.wait_for(finish(), timeout=settings.stt_drain_timeout_seconds)
+    except asyncio.TimeoutError:
+        metrics.increment("stt_drain_timeouts_total")
+        print(f"Transcription worker still busy after {settings.stt_drain_timeout_seconds}s; cancelled")
+    except Exception as e:
+        print(f"Transcription worker failed while draining: {e}")
+    finally:
+        worker.cancel()
+
+
+async def _transcribe_clips(app, started_case_id: str, clips: asyncio.Queue, send) -> None:
+    """Per-connection worker: transcribe queued clips in order, reply, then persist; None ends it."""
+    while True:
+        audio_data = await clips.get()
+        if audio_data is None:
+            clips.task_done()
+            return
+        try:
+            print("Starting transcription...")
+            text = await transcribe(audio_data)
+            print(f"Transcription completed: {text}")
+
+            # The client gets its transcript without waiting for the DB write
+            await send({"text": text})
+            await _persist_human_message(app, started_case_id, text)
+        except Exception as e:
+            await _report_error(send, e)
+        finally:
+            clips.task_done()
+
+
+async def _transcribe_turns(app, started_case_id: str, segments: asyncio.Queue, send) -> None:
+    """Per-connection worker for streamed audio.
+
+    Segments are transcribed as soon as the VAD cuts them, while the student
+    may still be talking; the joined turn is persisted once its end-of-turn
+    marker arrives, so the workflow only ever sees complete turns. None ends it.
+    """
+    turn: List[str] = []
+    while True:
+        item = await segments.get()
+        if item is None:
+            segments.task_done()
+            return
+        segment, detected_at = item
+        try:
+            if segment.pcm:
+                text = (await transcribe(pcm16_to_wav(segment.pcm, segment.sample_rate), "segment.wav")).strip()
+                if text:
+                    turn.append(text)
+                    await send({"partial": text})
+            if segment.end_of_turn and turn:
+                text = " ".join(turn)
+                turn = []
+                await send({"text": text, "end_of_turn": True})
+                await _persist_human_message(app, started_case_id, text)
+                metrics.observe("speech_end_of_turn_to_persist_seconds", time.monotonic() - detected_at)
+        except Exception as e:
+            await _report_error(send, e)
+        finally:
+            segments.task_done()
+
 
 @router.websocket("/ws/speech-to-text")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    started_case_id: str = DEFAULT_STARTED_CASE_ID
+):
+    """One complete audio clip per message; each clip is one human turn."""
+    await websocket.accept()
+    print("WebSocket connection accepted")
+    send = _socket_sender(websocket)
+
+    clips: asyncio.Queue = asyncio.Queue(maxsize=settings.stt_queue_size)
+    worker = asyncio.create_task(_transcribe_clips(websocket.app, started_case_id, clips, send))
     try:
-        await websocket.accept()
-        print("WebSocket connection accepted")
-        
         while True:
-            print("Waiting for audio data...")
             audio_data = await websocket.receive_bytes()
+            if session_id:
+                registry.touch(session_id)
             print(f"Received audio data of size: {len(audio_data)} bytes")
-            
-            print("Writing audio data to temporary file...")
-            temp_file_path = "/tmp/temp_audio.mp3"
-            with open(temp_file_path, "wb") as audio_file:
-                audio_file.write(audio_data)
-            
-            print("Starting transcription with Whisper...")
-            with open(temp_file_path, "rb") as audio_file:
-                transcription = client.audio.translations.create(
-                    model="whisper-1",
-                    file=audio_file
-                )
-            print(f"Transcription completed: {transcription.text}")
-            
-            print("Saving message to database...")
-            await db_create_message(websocket.app, {
-                "started_case_id": '56196549-7527-4d86-a20e-9636b472a98e',
-                "content": transcription.text,
-                "is_user_message": True,
-                "awaiting_user_input": False
-            })
-            print("Message saved successfully")
-            
-            print("Sending transcription back to client...")
-            await websocket.send_text(json.dumps({
-                "text": transcription.text
-            }))
-            print("Response sent to client")
-            
+            try:
+                clips.put_nowait(audio_data)
+            except asyncio.QueueFull:
+                # Bounded backlog: shed the clip rather than let a fast client queue unbounded work
+                metrics.increment("stt_clips_rejected_total")
+                await send({"error": "Transcription backlog is full; clip dropped", "dropped": True})
+            metrics.observe("stt_queue_depth", clips.qsize())
+
     except WebSocketDisconnect:
-        print("WebSocket disconnected")  
+        _on_disconnect(session_id)
     except Exception as e:
-        print(f"Error occurred: {str(e)}")
-        try:
-            print("Attempting to send error message to client...")
-            await websocket.send_text(json.dumps({
-                "error": str(e)
-            }))
-            print("Error message sent to client")
-        except:
-            print("Failed to send error message to client")
\ No newline at end of file
+        await _report_error(send, e)
+    finally:
+        # Clips already accepted are still transcribed and stored as unread turns
+        await _close_worker(worker, clips)
+
+
+@router.websocket("/ws/speech-stream")
+async def speech_stream_endpoint(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    started_case_id: str = DEFAULT_STARTED_CASE_ID,
+    sample_rate: int = 16000
+):
+    """Continuous PCM16 mono audio in small binary chunks, segmented server-side.
+
+    Replies with {"partial": ...} per transcribed segment and
+    {"text": ..., "end_of_turn": true} when the speaker pauses long enough.
+    A text message "end_of_turn" (e.g. push-to-talk released) ends the turn
+    immediately.
+    """
+    await websocket.accept()
+    print("Streaming WebSocket connection accepted")
+    send = _socket_sender(websocket)
+
+    vad = EnergyVAD(
+        sample_rate=sample_rate,
+        min_rms=settings.stt_vad_min_rms,
+        segment_pause_ms=settings.stt_segment_pause_ms,
+        end_of_turn_ms=settings.stt_end_of_turn_ms,
+        max_segment_seconds=settings.stt_max_segment_seconds
+    )
+    segments: asyncio.Queue = asyncio.Queue(maxsize=settings.stt_queue_size)
+    worker = asyncio.create_task(_transcribe_turns(websocket.app, started_case_id, segments, send))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if session_id:
+                registry.touch(session_id)
+
+            if message.get("bytes"):
+                cut = vad.feed(message["bytes"])
+            elif message.get("text") == "end_of_turn":
+                cut = vad.flush()
+            else:
+                continue
+            for segment in cut:
+                # Backpressure instead of shedding: a dropped segment would corrupt the turn
+                await segments.put((segment, time.monotonic()))
+            metrics.observe("stt_queue_depth", segments.qsize())
+
+    except WebSocketDisconnect:
+        _on_disconnect(session_id)
+    except Exception as e:
+        await _report_error(send, e)
+    finally:
+        # Speech still buffered in the VAD ends the turn, so nothing said before the drop is lost
+        now = time.monotonic()
+        await _close_worker(worker, segments, [(segment, now) for segment in vad.flush()])
+
+
+async def _forward_events(websocket: WebSocket, events: asyncio.Queue) -> None:
+    """Drain one subscriber queue of the session channel onto the socket."""
+    while True:
+        event = await events.get()
+        await websocket.send_text(json.dumps(event))
+
+
+async def _stop_forwarder(forwarder: asyncio.Task) -> None:
+    """Stop the event forwarder and collect its outcome, so a failed send is logged rather than lost."""
+    forwarder.cancel()
+    (outcome,) = await asyncio.gather(forwarder, return_exceptions=True)
+    if isinstance(outcome, Exception):
+        print(f"Session event forwarder failed: {outcome}")
+
+
+@router.websocket("/ws/session/{started_case_id}")
+async def session_channel_endpoint(
+    websocket: WebSocket,
+    started_case_id: str,
+    session_id: Optional[str] = None,
+    sample_rate: int = 16000,
+    last_event_id: Optional[int] = None
+):
+    """One duplex socket per session.
+
+    Outbound, everything published on the session channel: {"type": "message"},
+    {"type": "state"} node transitions, streamed {"type": "token"} deltas and
+    {"type": "awaiting_input"} prompts. Logged events carry an "id"; reconnect
+    with ?last_event_id=<id> to receive only the events missed meanwhile.
+    Inbound, binary frames are PCM16 mono audio segmented as on
+    /ws/speech-stream, {"type": "text", "content": ...} is a typed turn and
+    {"type": "end_of_turn"} ends the spoken turn immediately.
+    """
+    await websocket.accept()
+    print(f"Session WebSocket connection accepted for {started_case_id}")
+    channel = channel_hub.get(started_case_id)
+    events = channel.subscribe(after=last_event_id)
+    forwarder = asyncio.create_task(_forward_events(websocket, events))
+
+    async def send(payload: Dict[str, Any]) -> None:
+        # Speech replies go through the channel so they stay ordered with other events
+        channel.publish({"type": "speech", **payload})
+
+    vad = EnergyVAD(
+        sample_rate=sample_rate,
+        min_rms=settings.stt_vad_min_rms,
+        segment_pause_ms=settings.stt_segment_pause_ms,
+        end_of_turn_ms=settings.stt_end_of_turn_ms,
+        max_segment_seconds=settings.stt_max_segment_seconds
+    )
+    segments: asyncio.Queue = asyncio.Queue(maxsize=settings.stt_queue_size)
+    worker = asyncio.create_task(_transcribe_turns(websocket.app, started_case_id, segments, send))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if session_id:
+                registry.touch(session_id)
+
+            if message.get("bytes"):
+                cut = vad.feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    frame = json.loads(message["text"])
+                except ValueError:
+                    await send({"error": "Text frames must be JSON"})
+                    continue
+                if frame.get("type") == "text" and frame.get("content"):
+                    await _persist_human_message(websocket.app, started_case_id, frame["content"])
+                    continue
+                if frame.get("type") != "end_of_turn":
+                    continue
+                cut = vad.flush()
+            else:
+                continue
+            for segment in cut:
+                await segments.put((segment, time.monotonic()))
+            metrics.observe("stt_queue_depth", segments.qsize())
+
+    except WebSocketDisconnect:
+        _on_disconnect(session_id)
+    except Exception as e:
+        await _report_error(send, e)
+    finally:
+        # Speech still buffered in the VAD ends the turn, so nothing said before the drop is lost
+        now = time.monotonic()
+        await _close_worker(worker, segments, [(segment, now) for segment in vad.flush()])
+        await _stop_forwarder(forwarder)
+        channel.unsubscribe(events)
+        channel_hub.release(started_case_id)
@@ -0,0 +1,37 @@
+# src/db/queries.py
+"""SQL for the hot read paths, shared by the code that runs it and the plan check.
+
+src/db/database.py and src/sessions/store.py execute these statements;
+`python -m src.db.schema check` EXPLAINs the very same text, so an index
+change that breaks one of them shows up there.
+"""
+
+# Claim the oldest unread human turn after a message id ($1 case, $2 id)
+CLAIM_NEXT_HUMAN_MESSAGE = """
+    UPDATE messages SET consumed_at = NOW()
+    WHERE id = (
+        SELECT id FROM messages
+        WHERE started_case_id = $1
+        AND is_human IS TRUE AND consumed_at IS NULL
+        AND id > $2
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, content
+"""
+
+# One transcript page after a message id ($1 case, $2 id, $3 limit)
+TRANSCRIPT_PAGE = """
+    SELECT id, persona_id, content, is_human, awaiting_user_input, time_sent
+    FROM messages
+    WHERE started_case_id = $1
+    AND id > $2
+    ORDER BY id
+    LIMIT $3
+"""
+
+# A session checkpoint ($1 session id)
+LOAD_SESSION_CHECKPOINT = """
+    SELECT state, metadata FROM session_checkpoints WHERE session_id = $1
+"""
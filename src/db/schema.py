@@ -0,0 +1,249 @@
+# src/db/schema.py
+"""Versioned schema for the tables the app reads and writes.
+
+Migrations are applied in order and recorded in `schema_migrations`; each
+runs once per database. Workers apply pending ones at startup (under an
+advisory lock, so concurrent workers do not race), or run them by hand:
+
+    python -m src.db.schema migrate   # apply pending migrations
+    python -m src.db.schema status    # list applied / pending versions
+    python -m src.db.schema check     # EXPLAIN the hot queries, fail unless each uses its index
+
+Statements are idempotent (IF NOT EXISTS) so databases created before this
+module existed can be adopted as they are.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import os
+import sys
+import uuid
+
+import asyncpg
+
+from src.db.queries import CLAIM_NEXT_HUMAN_MESSAGE, LOAD_SESSION_CHECKPOINT, TRANSCRIPT_PAGE
+
+# Arbitrary key for pg_advisory_xact_lock, shared by every worker
+MIGRATION_LOCK_ID = 7303554
+
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS cases (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            title TEXT,
+            content TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS started_cases (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            case_id UUID NOT NULL,
+            status TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS personas (
+            id BIGSERIAL PRIMARY KEY,
+            started_case_id UUID NOT NULL,
+            persona_id UUID NOT NULL,
+            name TEXT,
+            role TEXT,
+            background TEXT,
+            personality TEXT,
+            expertise TEXT,
+            is_human BOOLEAN NOT NULL DEFAULT FALSE,
+            voice TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS topics (
+            id BIGSERIAL PRIMARY KEY,
+            started_case_id UUID NOT NULL,
+            topic_id INTEGER NOT NULL,
+            title TEXT,
+            expected_insights TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            id BIGSERIAL PRIMARY KEY,
+            started_case_id UUID NOT NULL,
+            persona_id UUID,
+            content TEXT NOT NULL,
+            is_human BOOLEAN NOT NULL DEFAULT FALSE,
+            awaiting_user_input BOOLEAN NOT NULL DEFAULT FALSE,
+            time_sent TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+    ]),
+    (2, "session checkpoints", [
+        """
+        CREATE TABLE IF NOT EXISTS session_checkpoints (
+            session_id TEXT PRIMARY KEY,
+            started_case_id TEXT NOT NULL,
+            state JSONB NOT NULL,
+            metadata JSONB NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+    ]),
+    (3, "message read marker", [
+        "ALTER TABLE messages ADD COLUMN IF NOT EXISTS consumed_at TIMESTAMPTZ",
+        # Turns written before there was a read marker were all read by the old poll
+        "UPDATE messages SET consumed_at = time_sent WHERE is_human IS TRUE AND consumed_at IS NULL",
+    ]),
+    (4, "hot query indexes", [
+        # Transcript pages: keyset order within one discussion. time_sent is set
+        # before commit, so rows can land out of time order; pages go by the serial id
+        "CREATE INDEX IF NOT EXISTS messages_started_case_id_idx ON messages (started_case_id, id)",
+        # Next unread human turn: only unconsumed rows are indexed, so it stays small
+        """
+        CREATE INDEX IF NOT EXISTS messages_unconsumed_human_id_idx
+        ON messages (started_case_id, id)
+        WHERE is_human IS TRUE AND consumed_at IS NULL
+        """,
+        "CREATE INDEX IF NOT EXISTS personas_started_case_persona_idx ON personas (started_case_id, persona_id)",
+        "CREATE INDEX IF NOT EXISTS topics_started_case_topic_idx ON topics (started_case_id, topic_id)",
+        "CREATE INDEX IF NOT EXISTS started_cases_case_id_idx ON started_cases (case_id)",
+        "CREATE INDEX IF NOT EXISTS session_checkpoints_updated_at_idx ON session_checkpoints (updated_at)",
+    ]),
+]
+
+# (name, table, index the plan must use on it, query, sample parameters). Naming the
+# index matters: messages_pkey alone would also avoid a Seq Scan on messages, while
+# still reading every message of every discussion.
+_SAMPLE_CASE = uuid.UUID(int=0)
+HOT_QUERIES: List[Tuple[str, str, str, str, List[Any]]] = [
+    ("next unread human message", "messages", "messages_unconsumed_human_id_idx",
+     CLAIM_NEXT_HUMAN_MESSAGE, [_SAMPLE_CASE, 0]),
+    ("transcript page", "messages", "messages_started_case_id_idx", TRANSCRIPT_PAGE, [_SAMPLE_CASE, 0, 51]),
+    ("session checkpoint load", "session_checkpoints", "session_checkpoints_pkey",
+     LOAD_SESSION_CHECKPOINT, ["sample"]),
+]
+
+
+async def _ensure_migrations_table(conn) -> None:
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+async def applied_versions(conn) -> List[int]:
+    await _ensure_migrations_table(conn)
+    return [row["version"] for row in await conn.fetch("SELECT version FROM schema_migrations ORDER BY version")]
+
+
+async def migrate(conn) -> List[int]:
+    """Apply pending migrations in one transaction; returns the versions applied."""
+    applied = []
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATION_LOCK_ID)
+        done = set(await applied_versions(conn))
+        for version, name, statements in MIGRATIONS:
+            if version in done:
+                continue
+            print(f"Applying schema migration {version}: {name}")
+            for statement in statements:
+                await conn.execute(statement)
+            await conn.execute("INSERT INTO schema_migrations (version, name) VALUES ($1, $2)", version, name)
+            applied.append(version)
+    return applied
+
+
+async def connect(dsn: Optional[str] = None):
+    """A dedicated connection for schema work, outside the app pool.
+
+    No command timeout: a migration (or waiting for another worker's
+    migration lock) may legitimately outlast the pool's per-query limit.
+    """
+    from src.config.settings import settings
+
+    return await asyncpg.connect(
+        dsn or settings.database_url,
+        statement_cache_size=0 if settings.db_pgbouncer_mode else settings.db_statement_cache_size,
+        command_timeout=None
+    )
+
+
+async def migrate_database(dsn: Optional[str] = None) -> List[int]:
+    conn = await connect(dsn)
+    try:
+        return await migrate(conn)
+    finally:
+        await conn.close()
+
+
+def _plan_nodes(plan: Dict[str, Any]):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+async def check_query_plans(conn) -> List[Dict[str, Any]]:
+    """EXPLAIN each hot query and report whether its table is read through the expected index.
+
+    Sequential scans are disabled for the check, so a small or empty table
+    (where the planner would rightly prefer one) still proves that the index
+    fits the query; a plan that reaches the table any other way fails.
+    """
+    results = []
+    for name, table, index, query, params in HOT_QUERIES:
+        async with conn.transaction():
+            await conn.execute("SET LOCAL enable_seqscan = off")
+            raw = await conn.fetchval("EXPLAIN (FORMAT JSON) " + query, *params)
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+        nodes = list(_plan_nodes(plan))
+        scans = [
+            node["Node Type"] for node in nodes
+            if node.get("Relation Name") == table and "Scan" in node["Node Type"]
+        ]
+        # Bitmap Index Scan nodes name the index but not the table, so collect indexes plan-wide
+        indexes = [node["Index Name"] for node in nodes if "Index Name" in node]
+        results.append({
+            "query": name,
+            "table": table,
+            "index": index,
+            "scans": scans,
+            "indexes": indexes,
+            "uses_index": index in indexes and "Seq Scan" not in scans,
+        })
+    return results
+
+
+async def _main(command: str, dsn: Optional[str]) -> int:
+    conn = await connect(dsn)
+    try:
+        if command == "migrate":
+            applied = await migrate(conn)
+            print(f"Applied {applied}" if applied else "Schema is up to date")
+        elif command == "status":
+            done = set(await applied_versions(conn))
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:4d}  {'applied' if version in done else 'pending':8s}  {name}")
+        elif command == "check":
+            failures = 0
+            for result in await check_query_plans(conn):
+                status = "ok" if result["uses_index"] else "MISSING"
+                failures += not result["uses_index"]
+                used = ", ".join(result["indexes"]) or ", ".join(result["scans"])
+                print(f"{status:8s}  {result['query']} (wants {result['index']}, plan uses {used})")
+            return 1 if failures else 0
+        else:
+            print(f"Unknown command {command!r}; expected migrate, status or check")
+            return 2
+    finally:
+        await conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    dsn = sys.argv[2] if len(sys.argv) > 2 else os.getenv("DATABASE_URL")
+    sys.exit(asyncio.run(_main(command, dsn)))
@@ -6,12 +6,15 @@ import ssl
 timeout = 6000
 max_requests = 1000
 max_requests_jitter = 50
+# Recycled/stopped workers drain open requests, then checkpoint sessions (src/workers.py, src/main.py lifespan).
+# Must cover both phases of SHUTDOWN_DRAIN_SECONDS plus the checkpoint writes.
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "90"))
  
 log_file = "-"
  
 bind = "0.0.0.0:8000"
  
-worker_class = "uvicorn.workers.UvicornWorker"
+worker_class = "src.workers.DrainingUvicornWorker"
 workers = (multiprocessing.cpu_count() * 2) + 1
  
 forwarded_allow_ips = "*"
@@ -0,0 +1,73 @@
+# src/llm/fake.py
+from typing import Any, AsyncIterator, List, Optional, Sequence
+import asyncio
+import random
+
+from langchain.schema import AIMessage
+from langchain.schema.messages import AIMessageChunk
+
+
+class FakeChatModel:
+    """Local stand-in for `ChatOpenAI` that injects latency and errors.
+
+    Pass it as `llm=` to any agent (or assign `agent.llm`) to exercise the
+    transport without network access.
+
+    Args:
+        responses: Contents returned in order (the last one repeats).
+        latency: Seconds to sleep before every answer.
+        latency_jitter: Extra uniformly distributed latency in seconds.
+        errors: Exceptions raised by the first calls, one per call.
+        error_rate: Probability of raising `error_factory()` on any later call.
+        error_factory: Builds the exception raised for `error_rate` failures.
+        model_name: Reported model name (used for breakers and metrics).
+        max_tokens: Output cap, counted in characters; longer answers are cut
+            off and reported with finish_reason "length" (a `max_tokens`
+            call argument overrides it, as with ChatOpenAI).
+    """
+
+    def __init__(
+        self,
+        responses: Sequence[str] = ("{}",),
+        *,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        errors: Optional[List[BaseException]] = None,
+        error_rate: float = 0.0,
+        error_factory=lambda: asyncio.TimeoutError(),
+        model_name: str = "fake-model",
+        max_tokens: Optional[int] = None,
+    ):
+        self.responses = list(responses)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.errors = list(errors or [])
+        self.error_rate = error_rate
+        self.error_factory = error_factory
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.calls: List[List[Any]] = []
+
+    async def ainvoke(self, messages: List[Any], **kwargs) -> AIMessage:
+        self.calls.append(messages)
+        delay = self.latency + random.uniform(0, self.latency_jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        if self.error_rate and random.random() < self.error_rate:
+            raise self.error_factory()
+        index = min(len(self.calls) - 1, len(self.responses) - 1)
+        content = self.responses[index]
+        cap = kwargs.get("max_tokens") or self.max_tokens
+        if cap and len(content) > cap:
+            return AIMessage(content=content[:cap], response_metadata={"finish_reason": "length"})
+        return AIMessage(content=content, response_metadata={"finish_reason": "stop"})
+
+    async def astream(self, messages: List[Any], **kwargs) -> AsyncIterator[AIMessageChunk]:
+        """Same answer as `ainvoke`, yielded a few characters at a time."""
+        response = await self.ainvoke(messages, **kwargs)
+        for start in range(0, len(response.content), 8):
+            yield AIMessageChunk(content=response.content[start:start + 8])
+        # As with OpenAI, the finish reason arrives on a final empty chunk
+        yield AIMessageChunk(content="", response_metadata=response.response_metadata)
@@ -0,0 +1,129 @@
+# src/llm/latency.py
+from typing import Deque, Dict, Optional, Tuple
+from collections import deque
+import math
+import time
+
+from src.metrics import metrics
+
+
+class LatencyTracker:
+    """Rolling per-(model, agent) latency samples with percentile queries.
+
+    Samples older than `window_seconds` are dropped, and at most
+    `max_samples` are kept per key, so percentiles follow the provider's
+    current behaviour rather than the whole worker lifetime.
+    """
+
+    def __init__(self, window_seconds: float = 300.0, max_samples: int = 200):
+        self.window_seconds = window_seconds
+        self.max_samples = max_samples
+        self._samples: Dict[Tuple[str, str], Deque[Tuple[float, float]]] = {}
+
+    def _prune(self, key: Tuple[str, str]) -> Deque[Tuple[float, float]]:
+        samples = self._samples.setdefault(key, deque(maxlen=self.max_samples))
+        cutoff = time.monotonic() - self.window_seconds
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        return samples
+
+    def record(self, model: str, agent: str, seconds: float) -> None:
+        key = (model, agent)
+        samples = self._prune(key)
+        samples.append((time.monotonic(), seconds))
+        metrics.set_gauge("llm_latency_p50_seconds", self.percentile(model, agent, 50) or 0, agent=agent, model=model)
+        metrics.set_gauge("llm_latency_p95_seconds", self.percentile(model, agent, 95) or 0, agent=agent, model=model)
+
+    def count(self, model: str, agent: str) -> int:
+        return len(self._prune((model, agent)))
+
+    def percentile(self, model: str, agent: str, q: float) -> Optional[float]:
+        """Nearest-rank percentile of the current window, or None without samples."""
+        values = sorted(seconds for _, seconds in self._prune((model, agent)))
+        if not values:
+            return None
+        rank = max(1, math.ceil(q / 100 * len(values)))
+        return values[rank - 1]
+
+
+class ModelRouter:
+    """Switches latency-sensitive agents to a fallback model while the primary breaches its SLO.
+
+    While on the fallback, one probe request every `probe_interval` seconds
+    still goes to the primary so its window keeps filling; once the
+    primary's p95 is back under `recovery_ratio * slo` the agent fails back.
+    Every switch is counted in `llm_model_switches_total`.
+    """
+
+    def __init__(
+        self,
+        tracker: LatencyTracker,
+        min_samples: int = 5,
+        probe_interval: float = 15.0,
+        recovery_ratio: float = 0.8,
+    ):
+        self.tracker = tracker
+        self.min_samples = min_samples
+        self.probe_interval = probe_interval
+        self.recovery_ratio = recovery_ratio
+        self._on_fallback: Dict[str, bool] = {}
+        self._last_probe: Dict[str, float] = {}
+
+    def _switch(self, agent: str, to_fallback: bool, source: str, target: str, p95: float) -> None:
+        self._on_fallback[agent] = to_fallback
+        reason = "slo_breach" if to_fallback else "recovered"
+        print(f"ModelRouter: {agent} {source} -> {target} ({reason}, primary p95={p95:.2f}s)")
+        metrics.increment("llm_model_switches_total", agent=agent, source=source, target=target, reason=reason)
+        metrics.set_gauge("llm_agent_on_fallback", 1 if to_fallback else 0, agent=agent)
+
+    def choose(self, agent: str, primary: str, fallback: Optional[str], slo_p95: Optional[float]) -> str:
+        """Return the model `agent` should call right now."""
+        if not fallback or not slo_p95 or fallback == primary:
+            return primary
+
+        enough = self.tracker.count(primary, agent) >= self.min_samples
+        p95 = self.tracker.percentile(primary, agent, 95)
+
+        if not self._on_fallback.get(agent):
+            if enough and p95 > slo_p95:
+                self._switch(agent, True, primary, fallback, p95)
+                self._last_probe[agent] = time.monotonic()
+                return fallback
+            return primary
+
+        if p95 is not None and p95 <= slo_p95 * self.recovery_ratio:
+            self._switch(agent, False, fallback, primary, p95)
+            return primary
+
+        now = time.monotonic()
+        if now - self._last_probe.get(agent, 0.0) >= self.probe_interval:
+            self._last_probe[agent] = now
+            metrics.increment("llm_primary_probes_total", agent=agent, model=primary)
+            return primary
+        return fallback
+
+
+_tracker: Optional[LatencyTracker] = None
+_router: Optional[ModelRouter] = None
+
+
+def get_latency_tracker() -> LatencyTracker:
+    global _tracker
+    if _tracker is None:
+        from src.config.settings import settings
+
+        _tracker = LatencyTracker(window_seconds=settings.llm_latency_window_seconds)
+    return _tracker
+
+
+def get_model_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        from src.config.settings import settings
+
+        _router = ModelRouter(
+            get_latency_tracker(),
+            min_samples=settings.llm_latency_min_samples,
+            probe_interval=settings.llm_fallback_probe_seconds,
+        )
+    return _router
@@ -0,0 +1,213 @@
+# src/llm/scheduler.py
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+import asyncio
+import time
+
+from src.metrics import metrics
+
+# Priority classes, lower value is served first
+PRIORITY_LIVE = 0            # human-facing turns (executor, direct response)
+PRIORITY_EVALUATION = 1      # evaluate / assign / replan between turns
+PRIORITY_SUMMARIZATION = 2   # topic summaries
+PRIORITY_BOOTSTRAP = 3       # persona / topic / plan generation at session start
+
+PRIORITY_NAMES = {
+    PRIORITY_LIVE: "live",
+    PRIORITY_EVALUATION: "evaluation",
+    PRIORITY_SUMMARIZATION: "summarization",
+    PRIORITY_BOOTSTRAP: "bootstrap",
+}
+
+
+class TokenBucket:
+    """Request token bucket: `rate` tokens per second, bursting up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_available(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class _Waiter:
+    __slots__ = ("model", "priority", "session_id", "future", "enqueued_at")
+
+    def __init__(self, model: str, priority: int, session_id: str, future: asyncio.Future):
+        self.model = model
+        self.priority = priority
+        self.session_id = session_id
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class LLMScheduler:
+    """Worker-wide gate that every agent LLM call passes through.
+
+    Waiting calls are served strictly by priority class, round-robin across
+    sessions within a class, subject to a global concurrency cap and a
+    per-model token bucket. Queue depth, in-flight calls and wait times are
+    published to `src.metrics`.
+    """
+
+    def __init__(self, max_concurrency: int, rate_limits: Dict[str, Tuple[float, float]]):
+        self.max_concurrency = max_concurrency
+        self.rate_limits = rate_limits
+        self.in_flight = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._queues: Dict[int, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _bucket(self, model: str) -> Optional[TokenBucket]:
+        if model not in self.rate_limits:
+            return None
+        if model not in self._buckets:
+            rate, burst = self.rate_limits[model]
+            self._buckets[model] = TokenBucket(rate, burst)
+        return self._buckets[model]
+
+    def queue_depth(self, priority: Optional[int] = None) -> int:
+        priorities = [priority] if priority is not None else list(self._queues)
+        return sum(len(q) for p in priorities for q in self._queues[p].values())
+
+    def _publish_gauges(self) -> None:
+        for priority, name in PRIORITY_NAMES.items():
+            metrics.set_gauge("llm_scheduler_queue_depth", self.queue_depth(priority), priority=name)
+        metrics.set_gauge("llm_scheduler_in_flight", self.in_flight)
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch_loop())
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: int, session_id: str):
+        """Wait for a turn to call `model`, then hold a concurrency slot for the block."""
+        self._ensure_dispatcher()
+        waiter = _Waiter(model, priority, session_id, asyncio.get_running_loop().create_future())
+        self._queues[priority].setdefault(session_id, deque()).append(waiter)
+        self._publish_gauges()
+        self._notify()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release()  # granted just as we were cancelled
+            else:
+                self._discard(waiter)
+            raise
+
+        metrics.observe(
+            "llm_scheduler_wait_seconds",
+            time.monotonic() - waiter.enqueued_at,
+            priority=PRIORITY_NAMES[priority],
+        )
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _discard(self, waiter: _Waiter) -> None:
+        sessions = self._queues[waiter.priority]
+        queue = sessions.get(waiter.session_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del sessions[waiter.session_id]
+        self._publish_gauges()
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._publish_gauges()
+        self._notify()
+
+    def _dispatch_ready(self) -> Optional[float]:
+        """Grant as many waiters as capacity allows.
+
+        Returns the number of seconds until a rate-limited waiter could be
+        served, or None when nothing is waiting on a token bucket.
+        """
+        retry_in: Optional[float] = None
+        while self.in_flight < self.max_concurrency:
+            granted = False
+            for priority in sorted(self._queues):
+                sessions = self._queues[priority]
+                for session_id in list(sessions):
+                    queue = sessions[session_id]
+                    waiter = queue[0]
+                    bucket = self._bucket(waiter.model)
+                    if bucket is not None and not bucket.try_take():
+                        wait = bucket.seconds_until_available()
+                        retry_in = wait if retry_in is None else min(retry_in, wait)
+                        continue
+                    queue.popleft()
+                    if queue:
+                        sessions.move_to_end(session_id)  # round-robin across sessions
+                    else:
+                        del sessions[session_id]
+                    if waiter.future.done():
+                        continue  # cancelled while queued
+                    self.in_flight += 1
+                    waiter.future.set_result(None)
+                    granted = True
+                    break
+                if granted:
+                    break
+            if not granted:
+                break
+        self._publish_gauges()
+        return retry_in
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            retry_in = self._dispatch_ready()
+            if retry_in is None:
+                await self._wakeup.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=retry_in)
+                except asyncio.TimeoutError:
+                    pass
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_scheduler() -> LLMScheduler:
+    """Return the worker-wide scheduler configured from settings."""
+    global _scheduler
+    if _scheduler is None:
+        from src.config.settings import settings
+
+        _scheduler = LLMScheduler(
+            max_concurrency=settings.llm_max_concurrency,
+            rate_limits={
+                model: (per_minute / 60.0, max(1.0, per_minute / 60.0 * settings.llm_rate_burst_seconds))
+                for model, per_minute in settings.llm_rate_limits.items()
+            },
+        )
+    return _scheduler
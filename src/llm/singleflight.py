@@ -0,0 +1,65 @@
+# src/llm/singleflight.py
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+import asyncio
+import hashlib
+import json
+
+from src.metrics import metrics
+
+
+def prompt_key(agent: str, model: str, messages: List[Any]) -> str:
+    """Content hash identifying an LLM call: same agent, model and prompt text give the same key."""
+    payload = json.dumps(
+        [agent, model, [[type(m).__name__, str(getattr(m, "content", m))] for m in messages]],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Coalesces concurrent identical async calls into one in-flight computation.
+
+    The first caller for a key starts `fn()` as its own task; callers that
+    arrive while it runs await the same task and receive its result (or
+    exception). Nothing is cached once the task finishes. A caller that is
+    cancelled detaches without cancelling the shared work unless it was the
+    last one waiting for it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], **labels: str) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+            metrics.increment("singleflight_calls_total", flight=self.name, **labels)
+        else:
+            metrics.increment("singleflight_coalesced_total", flight=self.name, **labels)
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+# Shared by the bootstrap agents (personas, topics, plan): students starting the same case together
+bootstrap_flight = SingleFlight("bootstrap")
@@ -0,0 +1,98 @@
+# src/llm/streaming.py
+"""Pull one string field out of a JSON completion while it is streamed.
+
+Agents answer with JSON such as {"response": {"message": "..."}}; listeners
+only want the message text, so the raw deltas are fed through a
+JsonStringField that yields the decoded characters of the first string
+value stored under the given key, and nothing else.
+"""
+from typing import Optional
+import json
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonStringField:
+    """Incremental extractor for the string value of `key` in a streamed JSON document."""
+
+    def __init__(self, key: str):
+        self._marker = json.dumps(key)
+        # Text not yet consumed; before the value starts it is scanned for the key
+        self._buffer = ""
+        self._state = "key"  # key -> colon -> quote -> value -> done
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, delta: str) -> str:
+        """Consume the next raw delta; returns the newly decoded value text (may be empty)."""
+        self._buffer += delta
+        out = []
+        while self._buffer and self._state != "done":
+            if self._state == "key":
+                index = self._buffer.find(self._marker)
+                if index < 0:
+                    # Keep a tail long enough to hold a marker split across deltas
+                    self._buffer = self._buffer[-(len(self._marker) - 1):] if len(self._marker) > 1 else ""
+                    break
+                self._buffer = self._buffer[index + len(self._marker):]
+                self._state = "colon"
+            elif self._state in ("colon", "quote"):
+                stripped = self._buffer.lstrip()
+                if not stripped:
+                    self._buffer = ""
+                    break
+                expected = ":" if self._state == "colon" else '"'
+                if stripped[0] != expected:
+                    # The key matched something other than an object key with a string value
+                    self._buffer = stripped
+                    self._state = "key"
+                    continue
+                self._buffer = stripped[1:]
+                self._state = "quote" if self._state == "colon" else "value"
+            else:
+                decoded = self._decode()
+                if decoded is None:
+                    break
+                out.append(decoded)
+        return "".join(out)
+
+    def _decode(self) -> Optional[str]:
+        """Decode as much of the buffered value as is complete; None when more input is needed."""
+        buffer = self._buffer
+        out = []
+        i = 0
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self._state = "done"
+                self._buffer = ""
+                return "".join(out)
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+            if i + 1 >= len(buffer):
+                break
+            escape = buffer[i + 1]
+            if escape == "u":
+                if i + 6 > len(buffer):
+                    break
+                code = int(buffer[i + 2:i + 6], 16)
+                if 0xD800 <= code < 0xDC00:
+                    # High surrogate: wait for its low half
+                    if i + 12 > len(buffer):
+                        break
+                    if buffer[i + 6:i + 8] == "\\u":
+                        low = int(buffer[i + 8:i + 12], 16)
+                        out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        i += 12
+                        continue
+                out.append(chr(code))
+                i += 6
+            else:
+                out.append(_ESCAPES.get(escape, escape))
+                i += 2
+        self._buffer = buffer[i:]
+        return "".join(out) if out else None
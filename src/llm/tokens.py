@@ -0,0 +1,137 @@
+# src/llm/tokens.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from contextvars import ContextVar
+import asyncio
+import threading
+
+from src.metrics import metrics
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character heuristic
+    tiktoken = None
+
+# Name of the workflow node currently executing (set by CaseDiscussionWorkflow)
+current_node: ContextVar[str] = ContextVar("current_node", default="none")
+
+# Per-message overhead of the chat format (role markers etc.)
+MESSAGE_OVERHEAD_TOKENS = 4
+CHARS_PER_TOKEN = 4
+
+_encodings: Dict[str, Any] = {}
+
+
+class TokenBudgetExceeded(ValueError):
+    """Raised when a prompt exceeds its token budget and the budget mode is 'refuse'."""
+
+
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # tiktoken fetches its BPE files on first use; offline, estimate from characters instead
+            print(f"tiktoken encoding for {model} unavailable ({e}); using the character estimate")
+            metrics.increment("token_encoding_load_failures_total", model=model)
+            _encodings[model] = None
+    return _encodings[model]
+
+
+async def preload_encodings(models: Iterable[str]) -> None:
+    """Load tiktoken encodings in a thread at startup, so no request blocks the event loop on the download."""
+    for model in set(models):
+        await asyncio.to_thread(_encoding, model)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count tokens locally with tiktoken, or estimate ~4 characters per token without it."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_prompt_tokens(messages: List[Any], model: str) -> int:
+    return sum(count_tokens(str(getattr(m, "content", m)), model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def trim_text(text: str, max_tokens: int, model: str) -> str:
+    """Cut the middle out of `text` so it fits in `max_tokens`, keeping the head and the most recent tail."""
+    marker = "\n...[earlier content trimmed to fit the token budget]...\n"
+    candidate = text
+    keep_chars = len(text)
+    while keep_chars > 0 and count_tokens(candidate, model) > max_tokens:
+        keep_chars = int(keep_chars * max_tokens / count_tokens(candidate, model) * 0.9)
+        head = keep_chars // 4
+        tail = keep_chars - head
+        candidate = text[:head] + marker + (text[-tail:] if tail else "")
+    return candidate
+
+
+def usage_from_response(response: Any) -> Optional[Tuple[int, int]]:
+    """Return (prompt_tokens, completion_tokens) reported by the provider, if any."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage")
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None
+
+
+class TokenLedger:
+    """Per-worker token accounting keyed by session, agent and workflow node."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+
+    def record(
+        self,
+        session_id: str,
+        agent: str,
+        node: str,
+        estimated_prompt: int,
+        usage: Optional[Tuple[int, int]],
+    ) -> None:
+        prompt, completion = usage if usage else (estimated_prompt, 0)
+        with self._lock:
+            entry = self._entries.setdefault(
+                (session_id, agent, node),
+                {"calls": 0, "estimated_prompt_tokens": 0, "prompt_tokens": 0, "completion_tokens": 0},
+            )
+            entry["calls"] += 1
+            entry["estimated_prompt_tokens"] += estimated_prompt
+            entry["prompt_tokens"] += prompt
+            entry["completion_tokens"] += completion
+        metrics.increment("llm_tokens_total", prompt, agent=agent, node=node, kind="prompt")
+        metrics.increment("llm_tokens_total", completion, agent=agent, node=node, kind="completion")
+
+    def totals(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Aggregate usage, optionally for one session, broken down by agent and by node."""
+        total = {"calls": 0, "estimated_prompt_tokens": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        by_agent: Dict[str, Dict[str, int]] = {}
+        by_node: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            for (session, agent, node), entry in self._entries.items():
+                if session_id is not None and session != session_id:
+                    continue
+                for bucket in (total, by_agent.setdefault(agent, dict.fromkeys(total, 0)),
+                               by_node.setdefault(node, dict.fromkeys(total, 0))):
+                    for field, value in entry.items():
+                        bucket[field] += value
+        total["total_tokens"] = total["prompt_tokens"] + total["completion_tokens"]
+        return {"total": total, "by_agent": by_agent, "by_node": by_node}
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == session_id]:
+                del self._entries[key]
+
+
+token_ledger = TokenLedger()
@@ -0,0 +1,328 @@
+# src/llm/transport.py
+from typing import Any, Callable, Dict, List, Optional
+from pydantic import BaseModel
+import asyncio
+import random
+import time
+
+import openai
+
+from src.metrics import metrics
+from src.llm.scheduler import get_scheduler, PRIORITY_BOOTSTRAP
+from src.llm.latency import get_latency_tracker
+from src.llm.tokens import (
+    MESSAGE_OVERHEAD_TOKENS, TokenBudgetExceeded, current_node, estimate_prompt_tokens, token_ledger,
+    trim_text, usage_from_response
+)
+
+
+class LLMCallPolicy(BaseModel):
+    """Deadline and retry policy applied to a single agent's LLM calls."""
+    timeout: float = 60.0
+    max_retries: int = 2
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    jitter: float = 0.25
+    # Hedging: fire a duplicate request if the first is slower than the
+    # rolling `hedge_percentile` latency (or `hedge_delay` without history)
+    hedge: bool = False
+    hedge_percentile: float = 90.0
+    hedge_delay: float = 3.0
+    hedge_min_delay: float = 0.5
+    # Preflight prompt budget: "trim" the per-turn message or "refuse" the call
+    max_prompt_tokens: Optional[int] = None
+    budget_mode: str = "trim"
+    # A completion cut off by its output cap is retried with the cap doubled, up to this
+    max_tokens_ceiling: Optional[int] = None
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the circuit breaker for a model is open and calls fail fast."""
+
+
+class LLMCallError(RuntimeError):
+    """Raised when an LLM call fails after exhausting its retries."""
+
+
+class CompletionTruncatedError(LLMCallError):
+    """Raised when a completion still hits its output cap at `max_tokens_ceiling`."""
+
+
+RETRYABLE_EXCEPTIONS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for transient provider errors that are worth retrying."""
+    if isinstance(exc, RETRYABLE_EXCEPTIONS):
+        return True
+    status_code = getattr(exc, "status_code", None)
+    return status_code in (408, 429) or (isinstance(status_code, int) and status_code >= 500)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker shared by every agent using a model.
+
+    closed -> open after `failure_threshold` consecutive failures,
+    open -> half_open once `reset_timeout` seconds have passed,
+    half_open -> closed on the first success (or back to open on failure).
+    While half open only one probe call is let through; if it never
+    reports back (e.g. it was cancelled), another is allowed after
+    `reset_timeout`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if self.state == "open":
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self._transition("half_open")
+        if self.probe_started_at is not None and now - self.probe_started_at < self.reset_timeout:
+            return False
+        self.probe_started_at = now
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.probe_started_at = None
+        if self.state != "closed":
+            self._transition("closed")
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_started_at = None
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            if self.state != "open":
+                self._transition("open")
+
+    def _transition(self, state: str) -> None:
+        print(f"Circuit breaker {self.name}: {self.state} -> {state}")
+        self.state = state
+        metrics.increment("llm_circuit_transitions_total", model=self.name, state=state)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(model: str) -> CircuitBreaker:
+    """Return the process-wide breaker for a model, creating it on first use."""
+    if model not in _breakers:
+        from src.config.settings import settings
+
+        _breakers[model] = CircuitBreaker(
+            model,
+            failure_threshold=settings.llm_circuit_failure_threshold,
+            reset_timeout=settings.llm_circuit_reset_seconds,
+        )
+    return _breakers[model]
+
+
+def finish_reason_of(response: Any) -> Optional[str]:
+    """Why the provider stopped generating ("stop", "length", ...), if it said."""
+    return (getattr(response, "response_metadata", None) or {}).get("finish_reason")
+
+
+def model_name_of(llm: Any) -> str:
+    """Best-effort model name for a LangChain chat model (or a fake)."""
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or "unknown"
+
+
+class LLMTransport:
+    """Wraps `llm.ainvoke` with a deadline, retries with backoff and a circuit breaker.
+
+    Every `BaseAgent` owns one transport; outcomes are counted in
+    `llm_calls_total{agent,model,outcome}`. Each attempt first waits for a
+    slot from the worker-wide `LLMScheduler`; the deadline only covers the
+    provider call itself, not time spent queued.
+    """
+
+    def __init__(self, agent_name: str, policy: LLMCallPolicy):
+        self.agent_name = agent_name
+        self.policy = policy
+
+    def _hedge_delay(self, model: str) -> float:
+        tracker = get_latency_tracker()
+        delay = None
+        if tracker.count(model, self.agent_name) >= 5:
+            delay = tracker.percentile(model, self.agent_name, self.policy.hedge_percentile)
+        return max(self.policy.hedge_min_delay, delay or self.policy.hedge_delay)
+
+    async def _stream(self, llm: Any, messages: List[Any], on_token: Callable[[str], None], **kwargs) -> Any:
+        """Stream the completion, passing each content delta to `on_token`; returns the aggregated message.
+
+        Usage is requested explicitly: without it the provider reports no
+        token counts for streamed calls and the ledger would see 0 completion tokens.
+        """
+        response = None
+        async for chunk in llm.astream(messages, stream_usage=True, **kwargs):
+            response = chunk if response is None else response + chunk
+            if chunk.content:
+                on_token(chunk.content)
+        return response
+
+    async def _call(
+        self,
+        llm: Any,
+        messages: List[Any],
+        model: str,
+        on_token: Optional[Callable[[str], None]] = None,
+        **kwargs
+    ) -> Any:
+        """Single provider call, hedged with a duplicate request when enabled.
+
+        The hedge shares the caller's scheduler slot; whichever request
+        finishes first successfully wins and the other is cancelled.
+        Streamed calls are never hedged: tokens already passed on cannot be
+        taken back.
+        """
+        if on_token is not None:
+            return await self._stream(llm, messages, on_token, **kwargs)
+        if not self.policy.hedge:
+            return await llm.ainvoke(messages, **kwargs)
+
+        first = asyncio.ensure_future(llm.ainvoke(messages, **kwargs))
+        done, _ = await asyncio.wait({first}, timeout=self._hedge_delay(model))
+        if done:
+            metrics.increment("llm_hedge_total", agent=self.agent_name, model=model, outcome="not_needed")
+            return first.result()
+
+        metrics.increment("llm_hedge_total", agent=self.agent_name, model=model, outcome="fired")
+        second = asyncio.ensure_future(llm.ainvoke(messages, **kwargs))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = "hedge_won" if task is second else "primary_won"
+                        metrics.increment("llm_hedge_total", agent=self.agent_name, model=model, outcome=winner)
+                        # The loser is cancelled, but it was still sent: count it as extra cost
+                        metrics.increment("llm_hedge_extra_requests_total", agent=self.agent_name, model=model)
+                        return task.result()
+            raise first.exception()
+        finally:
+            for task in (first, second):
+                if not task.done():
+                    task.cancel()
+
+    def _enforce_budget(self, messages: List[Any], model: str) -> List[Any]:
+        """Trim the final (per-turn) message, or refuse, when the prompt exceeds its budget."""
+        budget = self.policy.max_prompt_tokens
+        estimated = estimate_prompt_tokens(messages, model)
+        if not budget or estimated <= budget:
+            return messages
+
+        # Tokens that cannot be trimmed: earlier messages plus the last message's overhead
+        fixed = estimate_prompt_tokens(messages[:-1], model) + MESSAGE_OVERHEAD_TOKENS
+        if self.policy.budget_mode == "refuse" or fixed >= budget:
+            metrics.increment("llm_budget_refused_total", agent=self.agent_name)
+            raise TokenBudgetExceeded(
+                f"{self.agent_name} prompt is ~{estimated} tokens, over its budget of {budget}"
+            )
+
+        last = messages[-1]
+        trimmed = type(last)(content=trim_text(last.content, budget - fixed, model))
+        metrics.increment("llm_budget_trimmed_total", agent=self.agent_name)
+        print(f"{self.agent_name}: prompt trimmed from ~{estimated} tokens to fit budget of {budget}")
+        return messages[:-1] + [trimmed]
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.policy.backoff_max, self.policy.backoff_base * (2 ** attempt))
+        return delay * (1 + random.uniform(-self.policy.jitter, self.policy.jitter))
+
+    async def ainvoke(
+        self,
+        llm: Any,
+        messages: List[Any],
+        *,
+        priority: int = PRIORITY_BOOTSTRAP,
+        session_id: str = "default",
+        on_token: Optional[Callable[[str], None]] = None,
+        **kwargs
+    ) -> Any:
+        model = model_name_of(llm)
+        breaker = get_circuit_breaker(model)
+        scheduler = get_scheduler()
+        messages = self._enforce_budget(messages, model)
+        estimated_prompt = estimate_prompt_tokens(messages, model)
+        attempt = 0
+
+        while True:
+            if not breaker.allow():
+                metrics.increment("llm_calls_total", agent=self.agent_name, model=model, outcome="circuit_open")
+                raise CircuitOpenError(f"LLM provider for {model} is unavailable (circuit open)")
+
+            started = None
+            try:
+                async with scheduler.slot(model, priority, session_id):
+                    started = time.monotonic()
+                    response = await asyncio.wait_for(
+                        self._call(llm, messages, model, on_token, **kwargs), timeout=self.policy.timeout
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    breaker.record_failure()
+                elif getattr(e, "status_code", None) is not None:
+                    # The provider answered (e.g. a 400 for this request), so it is up
+                    breaker.record_success()
+                outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                if outcome == "timeout" and started is not None:
+                    # A timeout is the slowest possible tail; let it count towards the SLO
+                    get_latency_tracker().record(model, self.agent_name, time.monotonic() - started)
+                metrics.increment("llm_calls_total", agent=self.agent_name, model=model, outcome=outcome)
+
+                if not retryable or attempt >= self.policy.max_retries:
+                    raise LLMCallError(
+                        f"{self.agent_name} LLM call failed after {attempt + 1} attempt(s): {e!r}"
+                    ) from e
+
+                delay = self._backoff(attempt)
+                print(f"{self.agent_name}: retryable LLM error ({e!r}), retrying in {delay:.2f}s")
+                metrics.increment("llm_calls_total", agent=self.agent_name, model=model, outcome="retry")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            metrics.increment("llm_calls_total", agent=self.agent_name, model=model, outcome="success")
+            elapsed = time.monotonic() - started
+            metrics.observe("llm_call_seconds", elapsed, agent=self.agent_name, model=model)
+            get_latency_tracker().record(model, self.agent_name, elapsed)
+            token_ledger.record(
+                session_id, self.agent_name, current_node.get(), estimated_prompt, usage_from_response(response)
+            )
+            if finish_reason_of(response) != "length":
+                return response
+
+            # Cut off by the output cap: parsing half a JSON answer would only fail later
+            metrics.increment("llm_truncated_total", agent=self.agent_name, model=model)
+            cap = kwargs.get("max_tokens") or getattr(llm, "max_tokens", None)
+            ceiling = self.policy.max_tokens_ceiling
+            if not cap or not ceiling or cap >= ceiling:
+                raise CompletionTruncatedError(
+                    f"{self.agent_name} completion was cut off at its output cap of {cap} tokens"
+                )
+            kwargs["max_tokens"] = min(ceiling, cap * 2)
+            print(f"{self.agent_name}: completion truncated at {cap} tokens, retrying with {kwargs['max_tokens']}")
+            # Listeners already saw the start of the cut-off answer; the retry is not streamed again
+            on_token = None
@@ -1,17 +1,61 @@
 # main.py
-from fastapi import FastAPI, HTTPException, Form
+from fastapi import FastAPI, HTTPException, Form, Request, Header, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from src.workflow.case_discussion_workflow import CaseDiscussionWorkflow
 import json
 import asyncpg
-from src.db.database import get_db_pool
+from src.db.schema import migrate_database
+from src.db.database import create_message as db_create_message
+from src.db.database import create_db_pool, warm_db_pool, get_db_pool, get_transcript_page, decode_message_cursor, consume_human_message, release_human_message
 from src.api.endpoints.websocket import router as websocket_router
+from src.metrics import metrics
+from src.llm.tokens import token_ledger, preload_encodings
+from src.sessions.registry import registry
+from src.sessions.store import SessionStore
+from src.sessions.admission import AdmissionController, AdmissionRejected
+from src.sessions.channels import channel_hub
+from src.sessions.views import etag_stable, make_etag, parse_fields, project_state, session_status, state_delta, unknown_fields
+from src.config.settings import settings
+import asyncio
+import hashlib
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 import os
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await preload_encodings([settings.openai_model, settings.openai_fast_model])
+    # Open and warm the pool before the worker takes traffic
+    app.state.pool = await create_db_pool()
+    await warm_db_pool(app.state.pool)
+    if settings.db_migrate_on_startup:
+        # Every worker runs this; the advisory lock in migrate() lets only one apply each version.
+        # It runs on its own connection: the pool's command timeout would cut long migrations short
+        await migrate_database()
+    app.state.session_reaper = asyncio.create_task(registry.run_reaper(
+        heartbeat_timeout=settings.session_heartbeat_timeout_seconds,
+        interval=settings.session_reaper_interval_seconds
+    ))
+    yield
+    # Shutdown (SIGTERM, worker recycle): stop admitting, let in-flight nodes finish, checkpoint everything
+    print(f"Shutting down: draining {len(registry.sessions)} session(s)")
+    await admission.stop_accepting()
+    app.state.session_reaper.cancel()
+    await registry.drain(settings.shutdown_drain_seconds)
+    if hasattr(app.state, "pool"):
+        # close() waits for acquired connections, so pending message writes are flushed first
+        try:
+            await asyncio.wait_for(app.state.pool.close(), timeout=settings.shutdown_drain_seconds)
+        except asyncio.TimeoutError:
+            print("Timed out waiting for database writes; terminating pool")
+            app.state.pool.terminate()
+    print("Shutdown complete")
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(websocket_router, tags=["websocket"])
 
@@ -34,73 +78,182 @@ class HumanInputRequest(BaseModel):
     input_type: str  
     options: Optional[List[str]] = None
 
-# Store active sessions
-active_sessions: Dict[str, Dict[str, Any]] = {}
+# Largest page the transcript endpoint serves
+TRANSCRIPT_PAGE_MAX = 200
+
+# Store active sessions (memory-bounded; evicted sessions are reloaded from the session store)
+active_sessions: Dict[str, Dict[str, Any]] = registry.sessions
+registry.store = SessionStore(app)
+registry.configure(
+    idle_ttl_seconds=settings.session_idle_ttl_seconds,
+    max_resident=settings.session_max_resident,
+    max_resident_bytes=settings.session_max_resident_bytes,
+    workflow_overhead_bytes=settings.session_workflow_overhead_bytes
+)
+channel_hub.configure(
+    log_size=settings.session_event_log_size,
+    retain_seconds=settings.session_event_retain_seconds
+)
+
+# Admission control for new sessions; requests for existing sessions are never gated
+admission = AdmissionController(
+    max_active_sessions=settings.admission_max_active_sessions,
+    max_inflight_bootstraps=settings.admission_max_inflight_bootstraps,
+    queue_size=settings.admission_queue_size,
+    queue_timeout=settings.admission_queue_timeout_seconds,
+    active_sessions=lambda: len(registry.sessions)
+)
+
+
+async def run_until_disconnected(request: Request, session_id: str, coro=None, key: Optional[str] = None):
+    """Drive `coro` as the session's task, cancelling and checkpointing it if the client goes away.
+
+    With `coro=None` the request joins the session's running task instead;
+    the task is only cancelled once no joined request is still waiting.
+    """
+    session = registry.get(session_id)
+    task = registry.start(session_id, coro, key=key) if coro is not None else session["task"]
+    session["waiters"] += 1
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.disconnect_poll_seconds)
+            if done:
+                if task.cancelled():
+                    # Stopped by another path (heartbeat reaper, shutdown drain), not by this client
+                    raise HTTPException(status_code=409, detail="Session was cancelled and checkpointed; resume it to continue")
+                return task.result()
+            registry.touch(session_id)
+            if await request.is_disconnected():
+                if session["waiters"] == 1:
+                    await registry.cancel(session_id, reason="client_disconnect")
+                raise HTTPException(status_code=499, detail="Client disconnected; session checkpointed")
+    finally:
+        session["waiters"] -= 1
+
+
+def _requested_fields(fields: Optional[str], state: Dict[str, Any], extra=()) -> Optional[List[str]]:
+    requested = parse_fields(fields)
+    if requested is not None:
+        unknown = [field for field in unknown_fields(requested, state) if field not in extra]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def _project_result(result: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+    """Apply `fields=` to the state carried in a start/submit response."""
+    for key in ("result", "state"):
+        if fields and isinstance(result.get(key), dict):
+            result = {**result, key: project_state(result[key], _requested_fields(fields, result[key]))}
+    return result
 
 
 @app.post("/start-discussion")
 async def start_discussion(
+    request: Request,
     case_content: str = Form(...),
     human_participant: str = Form(...),
-    case_id: str = Form(...)
+    case_id: str = Form(...),
+    fields: Optional[str] = None
 ):
     try:
-        # Parse the form data
-        input_data = SimulationInput(
-            case_content=case_content,
-            human_participant=json.loads(human_participant)
-        )
-        pool = await get_db_pool(app)
-        async with pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO started_cases (
-                    case_id, status
-                ) VALUES ($1, $2)
-                """, case_id, "in_progress")
+        # New sessions wait for a bootstrap slot; under overload they are shed with Retry-After
+        async with admission.bootstrap() as release_bootstrap_slot:
+            # Parse the form data
+            input_data = SimulationInput(
+                case_content=case_content,
+                human_participant=json.loads(human_participant)
+            )
+            pool = await get_db_pool(app)
+            async with pool.acquire() as conn:
+                await conn.execute("""
+                    INSERT INTO started_cases (
+                        case_id, status
+                    ) VALUES ($1, $2)
+                    """, case_id, "in_progress")
             
-        # Create a new workflow instance
-        workflow = CaseDiscussionWorkflow()
+            # Create a new workflow instance
+            workflow = CaseDiscussionWorkflow()
         
-        # Generate a session ID
-        import uuid
-        session_id = str(uuid.uuid4())
+            # Generate a session ID
+            import uuid
+            session_id = str(uuid.uuid4())
         
-        # Start the workflow
-        state = await workflow.run(
-            case_content=input_data.case_content,
-            human_participant=input_data.human_participant,
-        )
+            # Store the workflow instance before running so it can be cancelled or checkpointed
+            registry.add(session_id, workflow)
+
+            def on_state(state: Dict[str, Any]) -> None:
+                # Publish every step so status polls and since= deltas follow the live discussion
+                registry.update_state(session_id, state)
+                # Personas, topics and plan exist: what follows is the discussion, not its bootstrap
+                if state.get("discussion_plan"):
+                    release_bootstrap_slot()
+
+            # Start the workflow
+            state = await run_until_disconnected(request, session_id, workflow.run(
+                case_content=input_data.case_content,
+                human_participant=input_data.human_participant,
+                on_state=on_state
+            ))
+            registry.update_state(session_id, state)
         
-        # Store the workflow instance and state
-        active_sessions[session_id] = {
-            "workflow": workflow,
-            "state": state
-        }
+            # If we're awaiting user input, return the prompt
+            if state.get("awaiting_user_input"):
+                return {
+                    "status": "awaiting_input",
+                    "session_id": session_id,
+                    "message": state.get("messages", [])[-1]["content"] if state.get("messages") else "Your response?"
+                }
         
-        # If we're awaiting user input, return the prompt
-        if state.get("awaiting_user_input"):
-            return {
-                "status": "awaiting_input",
+            # Otherwise return the complete state (or the fields asked for)
+            return _project_result({
+                "status": "complete",
                 "session_id": session_id,
-                "message": state.get("messages", [])[-1]["content"] if state.get("messages") else "Your response?"
-            }
-        
-        # Otherwise return the complete state
-        return {
-            "status": "complete",
-            "session_id": session_id,
-            "result": state
-        }
+                "result": state
+            }, fields)
         
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Server is at capacity ({e.reason}); retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/submit-response")
-async def submit_response(response: UserResponse):
+async def submit_response(
+    response: UserResponse,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    fields: Optional[str] = None
+):
     try:
-        session = active_sessions.get(response.session_id)
+        session = await registry.acquire(response.session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
+
+        # A retry of a request that already completed gets the same result back
+        if idempotency_key:
+            cached = registry.cached_response(response.session_id, idempotency_key)
+            if cached is not None:
+                metrics.increment("submit_response_coalesced_total", outcome="replayed")
+                return _project_result(cached, fields)
+
+        # Only one run per session: a retry of the in-flight request joins it, anything else is rejected.
+        # Without an idempotency key, an identical response text counts as the same request.
+        key = idempotency_key or "text:" + hashlib.sha256(response.response.encode("utf-8")).hexdigest()
+        if registry.busy(session):
+            if session["inflight_key"] != key:
+                metrics.increment("submit_response_coalesced_total", outcome="rejected")
+                raise HTTPException(
+                    status_code=409,
+                    detail="Session is already processing another response; retry once it completes"
+                )
+            metrics.increment("submit_response_coalesced_total", outcome="joined")
+            return _project_result(await run_until_disconnected(request, response.session_id), fields)
         
         workflow = session["workflow"]
         current_state = session["state"]
@@ -115,43 +268,74 @@ async def submit_response(response: UserResponse):
         # Update the state with user response
         current_state["user_response"] = response.response
         
-        # Continue the workflow from the current state
-        async for new_state in workflow.graph.astream(current_state):
-            # Update session state
-            active_sessions[response.session_id]["state"] = new_state
-            
-            # If we're awaiting more user input, return the prompt
-            if new_state.get("awaiting_user_input"):
-                return {
-                    "status": "awaiting_input",
-                    "session_id": response.session_id,
-                    "message": new_state.get("messages", [])[-1]["content"] if new_state.get("messages") else "Your response?",
-                    "input_type": new_state.get("input_type", "text"),
-                    "options": new_state.get("options")
-                }
-            
-            # If workflow is complete, clean up the session
-            if new_state.get("complete"):
-                del active_sessions[response.session_id]
-                return {
-                    "status": "complete",
-                    "result": new_state
-                }
-        
-        # Return the final state if we exit the loop
-        return {
-            "status": "processing",
-            "session_id": response.session_id,
-            "state": new_state
-        }
+        result = await run_until_disconnected(
+            request, response.session_id, _continue_session(response.session_id, workflow, current_state), key=key
+        )
+        if idempotency_key:
+            registry.cache_response(response.session_id, idempotency_key, result)
+        return _project_result(result, fields)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _continue_session(session_id: str, workflow: CaseDiscussionWorkflow, current_state: Dict[str, Any]):
+    """Continue the workflow from the current state until it needs input or completes.
+
+    Runs inside the session task started by `run_until_disconnected`, so a
+    disconnect or drain cancels and checkpoints it like any other run.
+    """
+    # The submitted text is handed to handle_user_input through the state; the row is only the transcript
+    await db_create_message(app, {
+        "started_case_id": workflow.started_case_id,
+        "content": current_state["user_response"],
+        "is_user_message": True,
+        "awaiting_user_input": False,
+        "consumed": True
+    })
+    channel_hub.publish(workflow.started_case_id, {
+        "type": "message",
+        "content": current_state["user_response"],
+        "is_human": True,
+        "awaiting_user_input": False
+    })
+
+    new_state = await workflow.resume(
+        current_state,
+        on_state=lambda state: registry.update_state(session_id, state),
+        stop_when_awaiting_input=True
+    )
+
+    # If we're awaiting more user input, return the prompt
+    if new_state.get("awaiting_user_input"):
+        return {
+            "status": "awaiting_input",
+            "session_id": session_id,
+            "message": new_state.get("messages", [])[-1]["content"] if new_state.get("messages") else "Your response?",
+            "input_type": new_state.get("input_type", "text"),
+            "options": new_state.get("options")
+        }
+
+    # If workflow is complete, clean up the session
+    if new_state.get("complete"):
+        registry.remove(session_id)
+        return {
+            "status": "complete",
+            "result": new_state
+        }
+
+    # Return the final state if the graph stopped without either
+    return {
+        "status": "processing",
+        "session_id": session_id,
+        "state": new_state
+    }
+
 @app.post("/request-human-input")
 async def request_human_input(request: HumanInputRequest):
     try:
-        session = active_sessions.get(request.session_id)
+        session = await registry.acquire(request.session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
 
@@ -170,15 +354,153 @@ async def request_human_input(request: HumanInputRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/session/{session_id}")
-async def get_session_status(session_id: str):
-    session = active_sessions.get(session_id)
+async def get_session_status(
+    session_id: str,
+    response: Response,
+    fields: Optional[str] = None,
+    since: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Session status, by default with the whole state.
+
+    `fields=awaiting_user_input,last_message` projects the state (plus the
+    `status`, `last_message`, `token_usage` and `budget` pseudo-fields);
+    `since=<version>` returns only the keys changed after that version, with
+    grown transcripts reduced to their new tail. Responses carry the state
+    `version` and an ETag, so an unchanged poll costs a bodiless 304.
+    """
+    session = await registry.acquire(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    return {
-        "status": "awaiting_input" if session["state"].get("awaiting_user_input") else "processing",
-        "state": session["state"]
-    }
+
+    workflow = session["workflow"]
+    state = session["state"]
+    version = workflow.state_version
+    requested = _requested_fields(fields, state, extra=("token_usage", "budget"))
+    extras = {}
+    if requested is None or "token_usage" in requested:
+        extras["token_usage"] = token_ledger.totals(str(workflow.started_case_id))
+    if requested is None or "budget" in requested:
+        extras["budget"] = workflow.budget.status()
+
+    etag = make_etag(session_id, version, requested, since, etag_stable(extras))
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        metrics.increment("session_status_responses_total", kind="not_modified")
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    body = {"status": session_status(state), "version": version, **extras}
+    if since is not None:
+        delta = state_delta(state, version, session["changes"], since, requested)
+        if delta is not None:
+            metrics.increment("session_status_responses_total", kind="delta")
+            return {**body, "delta": delta}
+    metrics.increment("session_status_responses_total", kind="projected" if requested else "full")
+    body["state"] = project_state(state, requested)
+    return body
+
+
+@app.get("/session/{session_id}/events")
+async def session_events(
+    session_id: str,
+    request: Request,
+    last_event_id: Optional[int] = Header(None),
+    after: Optional[int] = None
+):
+    """Server-sent events for one session instead of polling /session/{session_id}.
+
+    Emits only deltas: new messages, node transitions, awaiting-input prompts
+    and streamed tokens. Browsers resume with the Last-Event-ID header on
+    reconnect (other clients may pass `after`) and receive just the events
+    they missed, or a single "resync" event if those are no longer held.
+    """
+    session = await registry.acquire(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    channel = channel_hub.get(session["workflow"].started_case_id)
+    resume_from = last_event_id if last_event_id is not None else after
+    events = channel.subscribe(after=resume_from)
+
+    async def stream():
+        try:
+            if resume_from is None:
+                # Fresh subscribers get a snapshot header to diff against
+                yield f"id: {channel.last_event_id}\nevent: hello\ndata: {json.dumps({'awaiting_user_input': bool(session['state'].get('awaiting_user_input'))})}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=settings.session_event_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    registry.touch(session_id)
+                    yield ": keep-alive\n\n"
+                    continue
+                frame = f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, default=str)}\n\n"
+                if "id" in event and event.get("type") != "resync":
+                    frame = f"id: {event['id']}\n" + frame
+                yield frame
+        finally:
+            channel.unsubscribe(events)
+            channel_hub.release(channel.started_case_id)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/started-cases/{started_case_id}/transcript")
+async def get_transcript(started_case_id: str, limit: int = 50, cursor: Optional[str] = None):
+    """Messages of a discussion, oldest first, one keyset page at a time.
+
+    Pass the returned `next_cursor` back as `cursor` for the following page;
+    it is null on the last page. Works for finished or evicted sessions too,
+    since it reads the messages table rather than in-memory state.
+    """
+    if not 1 <= limit <= TRANSCRIPT_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {TRANSCRIPT_PAGE_MAX}")
+    if cursor is not None:
+        try:
+            decode_message_cursor(cursor)
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    messages, next_cursor = await get_transcript_page(app, started_case_id, limit, cursor)
+    return {"messages": messages, "next_cursor": next_cursor}
+
+
+@app.post("/session/{session_id}/heartbeat")
+async def session_heartbeat(session_id: str):
+    if not await registry.acquire(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "ok", "session_id": session_id}
+
+@app.post("/session/{session_id}/resume")
+async def resume_session(session_id: str, request: Request):
+    """Reload a checkpointed session (e.g. after the student left) and continue its graph."""
+    try:
+        if session_id in active_sessions:
+            raise HTTPException(status_code=409, detail="Session is already active")
+        checkpoint = await registry.store.load(session_id)
+        if not checkpoint:
+            raise HTTPException(status_code=404, detail="No checkpoint found for session")
+        state, metadata = checkpoint
+
+        workflow = CaseDiscussionWorkflow.from_checkpoint(metadata)
+        registry.add(session_id, workflow, state)
+        state = await run_until_disconnected(request, session_id, workflow.resume(
+            state, on_state=lambda new_state: registry.update_state(session_id, new_state)
+        ))
+        registry.update_state(session_id, state)
+        return {
+            "status": "awaiting_input" if state.get("awaiting_user_input") else "processing",
+            "session_id": session_id
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 async def create_personas(data: Dict[str, Any]):
@@ -219,20 +541,22 @@ async def create_message(data: Dict[str, Any]):
         """, data["started_case_id"], data['persona_id'],
             data["content"],
             data["is_user_message"], data["awaiting_user_input"])
+    channel_hub.publish(data["started_case_id"], {
+        "type": "message",
+        "persona_id": str(data["persona_id"]),
+        "content": data["content"],
+        "is_human": data["is_user_message"],
+        "awaiting_user_input": data["awaiting_user_input"]
+    })
     return {"status": "success"}
 
-async def get_unread_messages(started_case_id: int):
-    pool = await get_db_pool(app)
-    async with pool.acquire() as conn:
-        messages = await conn.fetch("""
-            SELECT content
-            FROM messages 
-            WHERE started_case_id = $1 
-            AND is_human IS TRUE
-            ORDER BY time_sent ASC
-        """, started_case_id)
-        
-        return [dict(msg) for msg in messages]
+async def get_unread_message(started_case_id, cursor: Optional[str] = None):
+    """Next human message not yet read by the workflow (consumed atomically), or None."""
+    return await consume_human_message(app, started_case_id, cursor)
+
+async def release_unread_message(message_id: int):
+    """Hand a claimed human message back as unread (its reader was cancelled before using it)."""
+    await release_human_message(app, message_id)
 
 @app.get("/health")
 async def health_check():
@@ -257,6 +581,11 @@ async def health_check():
                     "stats": {
                         "total_cases": case_count,
                         "total_messages": message_count
+                    },
+                    "pool": {
+                        "size": pool.get_size(),
+                        "idle": pool.get_idle_size(),
+                        "max_size": pool.get_max_size()
                     }
                 }
             }
@@ -270,6 +599,14 @@ async def health_check():
             }
         }
 
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+@app.get("/usage")
+async def get_token_usage():
+    return token_ledger.totals()
+
 @app.get("/")
 async def root():
     return FileResponse(os.path.join(static_dir, "test.html"))
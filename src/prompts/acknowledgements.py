@@ -0,0 +1,96 @@
+# src/prompts/acknowledgements.py
+from typing import Dict, List, Optional
+import random
+
+# Short professor acknowledgements emitted instantly after a human turn,
+# while the substantive LLM reply is still being generated.
+ACKNOWLEDGEMENT_TEMPLATES: Dict[str, List[str]] = {
+    "warm": [
+        "Hmm... I see, that's super interesting, {name}!",
+        "Oh, I like that, {name}. Give me a second...",
+        "That's a really thoughtful point, {name}.",
+        "Okay, yeah... thanks for jumping in, {name}.",
+    ],
+    "challenging": [
+        "Hmm... interesting, {name}. Let me push on that a bit.",
+        "Okay {name}, bold take... let's see if it holds up.",
+        "Right... I'm not sure everyone will agree with that, {name}.",
+        "Hmm, {name}, that's a strong claim...",
+    ],
+    "analytical": [
+        "Okay, {name}, let's unpack that for a second.",
+        "Hmm... so what you're saying is interesting, {name}.",
+        "Right, {name}, let's think about the numbers behind that...",
+        "Interesting framing, {name}. Let me think about that.",
+    ],
+    "default": [
+        "Hmm... I see, that's interesting, {name}.",
+        "Okay, {name}, good point...",
+        "Right... thanks, {name}.",
+        "Mm-hmm, I hear you, {name}...",
+    ],
+}
+
+# Used when the human participant has no name to address
+UNNAMED_ACKNOWLEDGEMENT_TEMPLATES: Dict[str, List[str]] = {
+    "warm": [
+        "Hmm... I see, that's super interesting!",
+        "Oh, I like that. Give me a second...",
+        "That's a really thoughtful point.",
+        "Okay, yeah... thanks for jumping in.",
+    ],
+    "challenging": [
+        "Hmm... interesting. Let me push on that a bit.",
+        "Okay, bold take... let's see if it holds up.",
+        "Right... I'm not sure everyone will agree with that.",
+        "Hmm, that's a strong claim...",
+    ],
+    "analytical": [
+        "Okay, let's unpack that for a second.",
+        "Hmm... so what you're saying is interesting.",
+        "Right, let's think about the numbers behind that...",
+        "Interesting framing. Let me think about that.",
+    ],
+    "default": [
+        "Hmm... I see, that's interesting.",
+        "Okay, good point...",
+        "Right... thanks.",
+        "Mm-hmm, I hear you...",
+    ],
+}
+
+# Personality keywords (lowercase) mapped to a template style
+STYLE_KEYWORDS: Dict[str, List[str]] = {
+    "warm": ["warm", "friendly", "supportive", "encouraging", "empathetic", "approachable"],
+    "challenging": ["challenging", "socratic", "provocative", "demanding", "tough", "skeptical"],
+    "analytical": ["analytical", "data", "rigorous", "quantitative", "methodical", "logical"],
+}
+
+
+def acknowledgement_style(personality: Optional[str]) -> str:
+    """Pick the template style matching a professor's personality description."""
+    text = (personality or "").lower()
+    for style, keywords in STYLE_KEYWORDS.items():
+        if any(keyword in text for keyword in keywords):
+            return style
+    return "default"
+
+
+def pick_acknowledgement(
+    personality: Optional[str],
+    name: Optional[str],
+    exclude: Optional[str] = None
+) -> str:
+    """Return a filled-in acknowledgement, avoiding `exclude` (the previous one) when possible.
+
+    Without a usable name the unnamed variants are used, so nothing renders as "Okay, , good point".
+    """
+    style = acknowledgement_style(personality)
+    name = (name or "").strip()
+    if not name:
+        choices = list(UNNAMED_ACKNOWLEDGEMENT_TEMPLATES[style])
+    else:
+        choices = [t.format(name=name) for t in ACKNOWLEDGEMENT_TEMPLATES[style]]
+    if exclude in choices and len(choices) > 1:
+        choices.remove(exclude)
+    return random.choice(choices)
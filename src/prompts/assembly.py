@@ -0,0 +1,102 @@
+# src/prompts/assembly.py
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+
+from langchain.schema import SystemMessage, HumanMessage
+
+from src.metrics import metrics
+
+
+def render_value(value: Any) -> str:
+    """Deterministic text for prompt context: strings as-is, everything else as sorted JSON."""
+    if isinstance(value, str):
+        return value
+    if hasattr(value, "model_dump"):
+        value = value.model_dump()
+    return json.dumps(value, sort_keys=True, default=str, indent=1)
+
+
+def render_sections(sections: Dict[str, Any]) -> str:
+    """Render named context sections in the given order, skipping empty ones."""
+    blocks = [f"## {title}\n{render_value(value)}" for title, value in sections.items() if value]
+    return "\n\n".join(blocks)
+
+
+class PrefixStabilityTracker:
+    """Tracks how often an agent's cacheable prefix is byte-identical to its previous call.
+
+    The prefix is everything before the per-turn suffix (static instructions
+    plus session context). A ratio near 1.0 means provider prefix caching can
+    hit on every call after the first one of a session.
+    """
+
+    def __init__(self):
+        self._last_prefix: Dict[Tuple[str, str], str] = {}
+        self._static_prefix: Dict[str, str] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent: str, session_id: str, static_prefix: str, prefix: str) -> bool:
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        key = (agent, session_id)
+        counts = self._counts.setdefault(agent, {"stable": 0, "changed": 0, "first": 0})
+
+        previous = self._last_prefix.get(key)
+        if previous is None:
+            outcome = "first"
+        elif previous == digest:
+            outcome = "stable"
+        else:
+            outcome = "changed"
+        counts[outcome] += 1
+        self._last_prefix[key] = digest
+
+        static_digest = hashlib.sha256(static_prefix.encode("utf-8")).hexdigest()
+        if self._static_prefix.setdefault(agent, static_digest) != static_digest:
+            # The static part must never vary; if it does the prompt template is leaking state
+            metrics.increment("prompt_static_prefix_drift_total", agent=agent)
+            self._static_prefix[agent] = static_digest
+
+        metrics.increment("prompt_prefix_total", agent=agent, outcome=outcome)
+        metrics.set_gauge("prompt_prefix_stability", self.stability(agent), agent=agent)
+        return outcome != "changed"
+
+    def stability(self, agent: str) -> float:
+        """Share of repeat calls (same agent and session) whose prefix did not change."""
+        counts = self._counts.get(agent)
+        if not counts:
+            return 1.0
+        repeats = counts["stable"] + counts["changed"]
+        return counts["stable"] / repeats if repeats else 1.0
+
+    def forget(self, session_id: str) -> None:
+        """Drop the remembered prefixes of a session that left this worker."""
+        for key in [k for k in self._last_prefix if k[1] == session_id]:
+            del self._last_prefix[key]
+
+    def reset(self) -> None:
+        self._last_prefix.clear()
+        self._static_prefix.clear()
+        self._counts.clear()
+
+
+prefix_tracker = PrefixStabilityTracker()
+
+
+def assemble_prompt(
+    agent: str,
+    session_id: str,
+    static_prefix: str,
+    session_context: Optional[Dict[str, Any]] = None,
+    turn_suffix: str = "",
+) -> List[Any]:
+    """Build chat messages ordered static prefix -> session context -> per-turn suffix.
+
+    The system message holds the static instructions followed by the
+    session-stable context, so it is byte-identical across turns of a
+    session; everything that changes per turn goes into the human message.
+    """
+    context = render_sections(session_context or {})
+    system = f"{static_prefix}\n\n{context}" if context else static_prefix
+    prefix_tracker.record(agent, session_id, static_prefix, system)
+    return [SystemMessage(content=system), HumanMessage(content=turn_suffix)]
@@ -0,0 +1,141 @@
+# src/sessions/admission.py
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque
+import asyncio
+import math
+import time
+
+from src.metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    """A new session was shed; `status_code` is 429 (queue full) or 503 (waited too long)."""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Gates new sessions on active-session and in-flight-bootstrap limits.
+
+    Requests that cannot start immediately wait in a bounded FIFO queue.
+    When the queue is full they are rejected with 429, and when they wait
+    longer than `queue_timeout` they get 503. Both carry a Retry-After
+    estimate based on recent bootstrap durations. Requests for sessions
+    that already exist never go through here, so live sessions are never
+    queued behind new ones.
+    """
+
+    def __init__(
+        self,
+        max_active_sessions: int,
+        max_inflight_bootstraps: int,
+        queue_size: int,
+        queue_timeout: float,
+        active_sessions: Callable[[], int],
+    ):
+        self.max_active_sessions = max_active_sessions
+        self.max_inflight_bootstraps = max_inflight_bootstraps
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active_sessions = active_sessions
+        self.inflight = 0
+        self.accepting = True
+        self._queue: Deque[object] = deque()
+        self._changed = asyncio.Condition()
+        self._avg_bootstrap_seconds = 30.0
+
+    def _has_capacity(self) -> bool:
+        return (
+            self.inflight < self.max_inflight_bootstraps
+            and self.active_sessions() < self.max_active_sessions
+        )
+
+    def retry_after(self) -> int:
+        # Roughly how long until the queue ahead drains through the bootstrap slots
+        waves = 1 + len(self._queue) // max(self.max_inflight_bootstraps, 1)
+        return max(1, math.ceil(waves * self._avg_bootstrap_seconds))
+
+    def _record_queue(self) -> None:
+        metrics.set_gauge("admission_queue_depth", len(self._queue))
+        metrics.set_gauge("admission_inflight_bootstraps", self.inflight)
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        metrics.increment("admission_decisions_total", outcome=reason)
+        return AdmissionRejected(status_code, self.retry_after(), reason)
+
+    async def _admit(self) -> None:
+        """Wait for and claim a bootstrap slot, or raise AdmissionRejected."""
+        if not self.accepting:
+            raise self._reject(503, "shutting_down")
+        if not self._queue and self._has_capacity():
+            self.inflight += 1
+            metrics.increment("admission_decisions_total", outcome="admitted")
+            return
+        if len(self._queue) >= self.queue_size:
+            raise self._reject(429, "queue_full")
+
+        ticket = object()
+        self._queue.append(ticket)
+        self._record_queue()
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        try:
+            async with self._changed:
+                while not (self._queue[0] is ticket and self._has_capacity()):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.accepting:
+                        raise self._reject(503, "queue_timeout" if self.accepting else "shutting_down")
+                    try:
+                        # Sessions also end without a release (completion, eviction), so re-check periodically
+                        await asyncio.wait_for(self._changed.wait(), timeout=min(remaining, 1.0))
+                    except asyncio.TimeoutError:
+                        pass
+                self.inflight += 1  # Claimed before anyone else can see the freed capacity
+        finally:
+            self._queue.remove(ticket)
+            self._record_queue()
+            metrics.observe("admission_wait_seconds", time.monotonic() - started)
+            await self._notify()  # The next ticket may now be at the head of the queue
+        metrics.increment("admission_decisions_total", outcome="admitted_after_wait")
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    @asynccontextmanager
+    async def bootstrap(self):
+        """Hold a bootstrap slot for a new session's setup.
+
+        Yields `release`, which frees the slot as soon as setup is done while
+        the request carries on running the session; otherwise the slot is
+        freed when the block exits.
+        """
+        await self._admit()
+        self._record_queue()
+        started = time.monotonic()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            self.inflight -= 1
+            self._avg_bootstrap_seconds = 0.8 * self._avg_bootstrap_seconds + 0.2 * (time.monotonic() - started)
+            self._record_queue()
+            asyncio.get_running_loop().create_task(self._notify())
+
+        try:
+            yield release
+        finally:
+            release()
+
+    async def stop_accepting(self) -> None:
+        """Shed every queued and future request (used on shutdown)."""
+        self.accepting = False
+        await self._notify()
@@ -0,0 +1,177 @@
+# src/sessions/channels.py
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+import asyncio
+import time
+
+from src.metrics import metrics
+
+# Outbound events a slow websocket may fall behind by before events are dropped for it
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class SessionChannel:
+    """In-process duplex channel for one started case.
+
+    Inbound, human turns are handed straight to the workflow waiting in
+    `handle_user_input` (the DB write is only a side effect). Outbound,
+    events such as new messages, streamed tokens and awaiting-input prompts
+    fan out to every websocket or SSE stream subscribed to the session.
+
+    Every outbound event gets a per-channel sequence `id`, and the last
+    `log_size` events are kept so a reconnecting client can pass the last id
+    it saw and receive only what it missed. Streamed tokens are not logged:
+    the finished message that follows them carries the same text.
+    """
+
+    def __init__(self, started_case_id: str, log_size: int = 512):
+        self.started_case_id = started_case_id
+        self._inbox: Deque[str] = deque()
+        self._input_ready = asyncio.Event()
+        self.waiters = 0  # Workflows on this worker inside handle_user_input for this case
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._seq = 0
+        self._log: Deque[Dict[str, Any]] = deque(maxlen=log_size)
+        self.last_activity = time.monotonic()
+
+    # Inbound: human input for the workflow
+    def deliver_input(self, text: str) -> bool:
+        """Hand a turn to a workflow waiting on this worker; False if none is, so it must be polled from the DB."""
+        if not self.waiters:
+            return False
+        self._inbox.append(text)
+        self._input_ready.set()
+        return True
+
+    def take_input(self) -> Optional[str]:
+        if not self._inbox:
+            return None
+        text = self._inbox.popleft()
+        if not self._inbox:
+            self._input_ready.clear()
+        return text
+
+    async def wait_for_input(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._input_ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    # Outbound: events for connected clients
+    @property
+    def last_event_id(self) -> int:
+        return self._seq
+
+    def replay(self, after: int) -> Optional[List[Dict[str, Any]]]:
+        """Logged events with an id above `after`, or None if some of them are no longer held."""
+        if after > self._seq:
+            # The id comes from an earlier incarnation of this channel (evicted, other worker)
+            return None
+        missed = [event for event in self._log if event["id"] > after]
+        oldest = self._log[0]["id"] if self._log else self._seq + 1
+        if after + 1 < oldest:
+            return None
+        return missed
+
+    def subscribe(self, after: Optional[int] = None) -> asyncio.Queue:
+        """Register a subscriber; with `after`, events it missed are queued first.
+
+        When the gap cannot be filled from the log, a single "resync" event is
+        queued instead and the client should refetch the session state once.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        if after is not None:
+            missed = self.replay(after)
+            if missed is None:
+                queue.put_nowait({"id": self._seq, "type": "resync"})
+                metrics.increment("session_channel_resumes_total", outcome="resync")
+            else:
+                # Keep the newest ones if the backlog does not fit the queue
+                for event in missed[-SUBSCRIBER_QUEUE_SIZE:]:
+                    queue.put_nowait(event)
+                metrics.increment("session_channel_resumes_total", outcome="replayed")
+                metrics.observe("session_channel_replayed_events", len(missed))
+        self._subscribers.add(queue)
+        self.last_activity = time.monotonic()
+        metrics.increment("session_channel_subscriptions_total")
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+        self.last_activity = time.monotonic()
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.last_activity = time.monotonic()
+        if event.get("type") == "token":
+            if not self._subscribers:
+                return
+        else:
+            self._seq += 1
+            event = {"id": self._seq, **event}
+            self._log.append(event)
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                metrics.increment("session_channel_events_dropped_total", type=event.get("type", "unknown"))
+
+    def idle(self, retain_seconds: float = 0.0) -> bool:
+        """Nobody connected, no input pending and no activity for `retain_seconds`."""
+        if self._subscribers or self._inbox:
+            return False
+        return time.monotonic() - self.last_activity >= retain_seconds
+
+
+class ChannelHub:
+    """Session channels of this worker, keyed by started_case_id.
+
+    A channel outlives its last subscriber by `retain_seconds` so that a
+    client reconnecting after a network blip can still resume from its log;
+    `sweep` (run by the session reaper) drops the ones left behind.
+    """
+
+    def __init__(self):
+        self._channels: Dict[str, SessionChannel] = {}
+        self.log_size = 512
+        self.retain_seconds = 0.0
+
+    def configure(self, log_size: int = 512, retain_seconds: float = 0.0) -> None:
+        self.log_size = log_size
+        self.retain_seconds = retain_seconds
+
+    def get(self, started_case_id) -> SessionChannel:
+        key = str(started_case_id)
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = SessionChannel(key, log_size=self.log_size)
+            metrics.set_gauge("session_channels", len(self._channels))
+        return channel
+
+    def find(self, started_case_id) -> Optional[SessionChannel]:
+        return self._channels.get(str(started_case_id))
+
+    def publish(self, started_case_id, event: Dict[str, Any]) -> None:
+        channel = self.find(started_case_id)
+        if channel is not None:
+            channel.publish(event)
+
+    def release(self, started_case_id) -> None:
+        """Forget a channel once nobody is connected, no input is pending and its log has expired."""
+        key = str(started_case_id)
+        channel = self._channels.get(key)
+        if channel is not None and channel.idle(self.retain_seconds):
+            del self._channels[key]
+            metrics.set_gauge("session_channels", len(self._channels))
+
+    def sweep(self) -> None:
+        for key in [key for key, channel in self._channels.items() if channel.idle(self.retain_seconds)]:
+            del self._channels[key]
+        metrics.set_gauge("session_channels", len(self._channels))
+
+
+channel_hub = ChannelHub()
@@ -0,0 +1,335 @@
+# src/sessions/registry.py
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Dict, Optional
+import asyncio
+import json
+import resource
+import sys
+import time
+
+from src.metrics import metrics
+from src.sessions.store import serialize_state
+from src.sessions.channels import channel_hub
+from src.sessions.views import STATE_HISTORY_SIZE, state_changes
+
+# Completed /submit-response results remembered per session for idempotent retries
+RESPONSE_CACHE_SIZE = 16
+
+
+def approximate_bytes(value: Any) -> int:
+    """Rough in-memory size of a state value, taken as the size of its JSON checkpoint form."""
+    try:
+        return len(json.dumps(serialize_state(value), default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class SessionRegistry:
+    """Memory-bounded, LRU-ordered table of resident sessions and the tasks driving their graphs.
+
+    Each entry holds the `workflow`, its latest `state`, the running `task`
+    (if any), `last_seen` (the client's latest request or heartbeat),
+    `bytes`, the approximate footprint of the entry (tracked per state key
+    in `field_bytes`, so a graph step only measures what it changed), and
+    `changes`, the keys touched by each recent state version (the version
+    number itself lives on the workflow so it survives checkpoints). Idle
+    sessions past the TTL, or the least recently used ones once the count or
+    byte cap is exceeded, are checkpointed to `store` and dropped from
+    memory; `acquire` reloads them lazily on the next request. Abandoned
+    sessions are cancelled and checkpointed the same way.
+    """
+
+    def __init__(self):
+        self.sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.store = None  # SessionStore, configured by src.main
+        self.idle_ttl_seconds: Optional[float] = None
+        self.max_resident: Optional[int] = None
+        self.max_resident_bytes: Optional[int] = None
+        self.workflow_overhead_bytes = 0
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._enforcing: Optional[asyncio.Task] = None
+
+    def configure(
+        self,
+        idle_ttl_seconds: Optional[float] = None,
+        max_resident: Optional[int] = None,
+        max_resident_bytes: Optional[int] = None,
+        workflow_overhead_bytes: int = 0,
+    ) -> None:
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_resident = max_resident
+        self.max_resident_bytes = max_resident_bytes
+        self.workflow_overhead_bytes = workflow_overhead_bytes
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.sessions.get(session_id)
+
+    def touch(self, session_id: str) -> None:
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session["last_seen"] = time.monotonic()
+            self.sessions.move_to_end(session_id)
+
+    def add(self, session_id: str, workflow: Any, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Make a session resident, evicting others if this pushes the table over its caps."""
+        field_bytes = {key: approximate_bytes(value) for key, value in (state or {}).items()}
+        self.sessions[session_id] = {
+            "workflow": workflow,
+            "state": state or {},
+            "task": None,
+            "inflight_key": None,
+            "waiters": 0,
+            "responses": OrderedDict(),
+            "changes": deque(maxlen=STATE_HISTORY_SIZE),
+            "last_seen": time.monotonic(),
+            "field_bytes": field_bytes,
+            "bytes": self.workflow_overhead_bytes + sum(field_bytes.values()),
+        }
+        self.sessions.move_to_end(session_id)
+        self._schedule_enforce(keep=session_id)
+        return self.sessions[session_id]
+
+    def update_state(self, session_id: str, state: Dict[str, Any]) -> None:
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+        changes = state_changes(session["state"], state)
+        if changes:
+            session["workflow"].state_version += 1
+            session["changes"].append((session["workflow"].state_version, changes))
+        session["state"] = state
+        # Re-measure only what changed: the appended tail of a grown list, or a replaced value
+        field_bytes = session["field_bytes"]
+        for key, previous_length in changes.items():
+            if key not in state:
+                field_bytes.pop(key, None)
+            elif previous_length is None:
+                field_bytes[key] = approximate_bytes(state[key])
+            else:
+                field_bytes[key] = field_bytes.get(key, 0) + approximate_bytes(state[key][previous_length:])
+        session["bytes"] = self.workflow_overhead_bytes + sum(field_bytes.values())
+        self._schedule_enforce(keep=session_id)
+
+    def remove(self, session_id: str) -> None:
+        """Drop a session and the per-session bookkeeping kept for it elsewhere in this worker."""
+        from src.llm.tokens import token_ledger
+        from src.prompts.assembly import prefix_tracker
+
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            started_case_id = session["workflow"].started_case_id
+            channel_hub.release(started_case_id)
+            # Usage lives on in the checkpoint (budget_usage); the ledger entries would only leak
+            token_ledger.forget(str(started_case_id))
+            prefix_tracker.forget(str(started_case_id))
+        self._record_footprint()
+
+    async def acquire(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return the resident session, reloading it from its checkpoint if it was evicted."""
+        session = self.sessions.get(session_id)
+        if session is not None:
+            self.touch(session_id)
+            return session
+        if self.store is None:
+            return None
+
+        # Concurrent requests for the same evicted session share one reload
+        loading = self._loading.get(session_id)
+        if loading is not None:
+            return await asyncio.shield(loading)
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[session_id] = loading
+        try:
+            session = await self._reload(session_id)
+            loading.set_result(session)
+            return session
+        except Exception as e:
+            loading.set_exception(e)
+            raise
+        finally:
+            self._loading.pop(session_id, None)
+
+    async def _reload(self, session_id: str) -> Optional[Dict[str, Any]]:
+        from src.workflow.case_discussion_workflow import CaseDiscussionWorkflow
+
+        checkpoint = await self.store.load(session_id)
+        if not checkpoint:
+            return None
+        state, metadata = checkpoint
+        workflow = CaseDiscussionWorkflow.from_checkpoint(metadata)
+        workflow.current_state = state
+        metrics.increment("sessions_reloaded_total")
+        print(f"Session {session_id} reloaded from checkpoint")
+        return self.add(session_id, workflow, state)
+
+    def start(self, session_id: str, coro: Awaitable[Any], key: Optional[str] = None) -> asyncio.Task:
+        """Run `coro` as the session's task so it can be cancelled on abandonment.
+
+        `key` identifies the request driving the run so that retries of the
+        same request can join it instead of starting a second one.
+        """
+        session = self.sessions[session_id]
+        if self.busy(session):
+            raise RuntimeError(f"Session {session_id} already has a running graph")
+        task = asyncio.create_task(coro)
+        session["task"] = task
+        session["inflight_key"] = key
+        self.touch(session_id)
+        return task
+
+    def cached_response(self, session_id: str, key: str) -> Optional[Any]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        return session["responses"].get(key)
+
+    def cache_response(self, session_id: str, key: str, result: Any) -> None:
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+        responses = session["responses"]
+        responses[key] = result
+        responses.move_to_end(key)
+        while len(responses) > RESPONSE_CACHE_SIZE:
+            responses.popitem(last=False)
+
+    async def checkpoint(self, session_id: str) -> bool:
+        session = self.sessions.get(session_id)
+        if session is None or self.store is None:
+            return False
+        workflow = session["workflow"]
+        state = getattr(workflow, "current_state", None) or session.get("state") or {}
+        try:
+            await self.store.save(session_id, state, workflow.checkpoint_metadata())
+            metrics.increment("session_checkpoints_total")
+            return True
+        except Exception as e:
+            print(f"Failed to checkpoint session {session_id}: {e}")
+            return False
+
+    async def cancel(self, session_id: str, reason: str) -> None:
+        """Cancel the session's running graph (in-flight LLM calls, input polling), checkpoint it and drop it."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+        task = session.get("task")
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        await self.checkpoint(session_id)
+        self.remove(session_id)
+        metrics.increment("sessions_cancelled_total", reason=reason)
+        print(f"Session {session_id} cancelled ({reason}), checkpoint saved")
+
+    @staticmethod
+    def busy(session: Dict[str, Any]) -> bool:
+        task = session.get("task")
+        return task is not None and not task.done()
+
+    async def evict(self, session_id: str, reason: str) -> bool:
+        """Spill an idle session to the store and drop it from memory; busy sessions are left alone."""
+        session = self.sessions.get(session_id)
+        if session is None or self.busy(session):
+            return False
+        # Only drop the session once its state is safely persisted
+        if not await self.checkpoint(session_id):
+            return False
+        if self.sessions.get(session_id) is not session or self.busy(session):
+            return False  # Picked up again while the checkpoint was being written
+        self.remove(session_id)
+        metrics.increment("sessions_evicted_total", reason=reason)
+        print(f"Session {session_id} evicted ({reason})")
+        return True
+
+    def resident_bytes(self) -> int:
+        return sum(session.get("bytes", 0) for session in self.sessions.values())
+
+    def _over_limits(self) -> bool:
+        if self.max_resident is not None and len(self.sessions) > self.max_resident:
+            return True
+        return self.max_resident_bytes is not None and self.resident_bytes() > self.max_resident_bytes
+
+    async def enforce_limits(self, keep: Optional[str] = None) -> None:
+        """Evict least recently used idle sessions until the count and byte caps hold."""
+        for session_id in list(self.sessions):
+            if not self._over_limits():
+                break
+            if session_id == keep:
+                continue
+            reason = "max_resident" if self.max_resident is not None and len(self.sessions) > self.max_resident else "max_bytes"
+            await self.evict(session_id, reason=reason)
+        if self._over_limits():
+            metrics.increment("session_table_over_limit_total")
+        self._record_footprint()
+
+    def _schedule_enforce(self, keep: Optional[str] = None) -> None:
+        self._record_footprint()
+        if not self._over_limits():
+            return
+        if self._enforcing is not None and not self._enforcing.done():
+            return
+        try:
+            self._enforcing = asyncio.get_running_loop().create_task(self.enforce_limits(keep=keep))
+        except RuntimeError:
+            pass  # No running loop; the reaper will enforce the caps
+
+    async def evict_idle(self) -> None:
+        if self.idle_ttl_seconds is None:
+            return
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if now - session.get("last_seen", now) > self.idle_ttl_seconds:
+                await self.evict(session_id, reason="idle_ttl")
+
+    def _record_footprint(self) -> None:
+        metrics.set_gauge("sessions_resident", len(self.sessions))
+        metrics.set_gauge("sessions_resident_bytes", self.resident_bytes())
+        # ru_maxrss is the peak resident set of this worker, in KiB on Linux
+        metrics.set_gauge("process_max_rss_bytes", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+    async def drain(self, timeout: float, interruptible_nodes=("handle_user_input",)) -> None:
+        """Shutdown: give running graphs up to `timeout` to reach a pause, then checkpoint every session.
+
+        A graph counts as paused when it is done or sits in one of
+        `interruptible_nodes` (waiting for the student), which is cheap to
+        re-run after a resume. Whatever is still running afterwards is
+        cancelled and resumes from its last completed step.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            running = [
+                session["task"] for session in self.sessions.values()
+                if self.busy(session) and getattr(session["workflow"], "active_node", None) not in interruptible_nodes
+            ]
+            remaining = deadline - time.monotonic()
+            if not running or remaining <= 0:
+                break
+            await asyncio.wait(running, timeout=min(remaining, 0.5))
+        if running:
+            print(f"Drain timed out with {len(running)} graph(s) still running; cancelling them")
+        for session_id in list(self.sessions):
+            await self.cancel(session_id, reason="shutdown")
+
+    async def reap_abandoned(self, heartbeat_timeout: float) -> None:
+        """Cancel graphs still running for clients that stopped polling; idle sessions are left to the TTL."""
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            if self.busy(session) and now - session.get("last_seen", now) > heartbeat_timeout:
+                await self.cancel(session_id, reason="heartbeat_timeout")
+
+    async def run_reaper(self, heartbeat_timeout: float, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reap_abandoned(heartbeat_timeout)
+                await self.evict_idle()
+                await self.enforce_limits()
+                channel_hub.sweep()
+            except Exception as e:
+                print(f"Session reaper error: {e}")
+
+
+registry = SessionRegistry()
@@ -0,0 +1,70 @@
+# src/sessions/store.py
+from typing import Any, Dict, Optional, Tuple
+import json
+import uuid
+
+from langchain.schema import BaseMessage, messages_from_dict, messages_to_dict
+
+from src.db.database import get_db_pool
+from src.db.queries import LOAD_SESSION_CHECKPOINT
+
+
+def serialize_state(value: Any) -> Any:
+    """Convert workflow state into JSON-compatible data (LangChain messages included)."""
+    if isinstance(value, BaseMessage):
+        return {"__message__": messages_to_dict([value])[0]}
+    if isinstance(value, dict):
+        return {str(k): serialize_state(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [serialize_state(v) for v in value]
+    if hasattr(value, "model_dump"):
+        return serialize_state(value.model_dump())
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def deserialize_state(value: Any) -> Any:
+    """Inverse of `serialize_state`."""
+    if isinstance(value, dict):
+        if "__message__" in value and len(value) == 1:
+            return messages_from_dict([value["__message__"]])[0]
+        return {k: deserialize_state(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [deserialize_state(v) for v in value]
+    return value
+
+
+class SessionStore:
+    """Persists session checkpoints (workflow state + workflow metadata) in Postgres.
+
+    The session_checkpoints table is created by src/db/schema.py.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def save(self, session_id: str, state: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+        pool = await get_db_pool(self.app)
+        async with pool.acquire() as conn:
+            await conn.execute("""
+                INSERT INTO session_checkpoints (session_id, started_case_id, state, metadata, updated_at)
+                VALUES ($1, $2, $3::jsonb, $4::jsonb, NOW())
+                ON CONFLICT (session_id) DO UPDATE
+                SET state = EXCLUDED.state, metadata = EXCLUDED.metadata, updated_at = NOW()
+            """, session_id, str(metadata.get("started_case_id", "")),
+                json.dumps(serialize_state(state), default=str),
+                json.dumps(serialize_state(metadata), default=str))
+
+    async def load(self, session_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        pool = await get_db_pool(self.app)
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(LOAD_SESSION_CHECKPOINT, session_id)
+        if not row:
+            return None
+        return deserialize_state(json.loads(row["state"])), json.loads(row["metadata"])
+
+    async def delete(self, session_id: str) -> None:
+        pool = await get_db_pool(self.app)
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM session_checkpoints WHERE session_id = $1", session_id)
@@ -0,0 +1,128 @@
+# src/sessions/views.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+
+# Fields computed from the state rather than stored in it
+VIRTUAL_FIELDS = ("status", "last_message")
+
+# State versions whose changed keys are remembered per session for `since=` deltas
+STATE_HISTORY_SIZE = 64
+
+
+def session_status(state: Dict[str, Any]) -> str:
+    if state.get("complete"):
+        return "complete"
+    return "awaiting_input" if state.get("awaiting_user_input") else "processing"
+
+
+def parse_fields(raw: Optional[str]) -> Optional[List[str]]:
+    """Split a `fields=a,b,c` query parameter; None means the whole state."""
+    if not raw:
+        return None
+    return [field.strip() for field in raw.split(",") if field.strip()]
+
+
+def unknown_fields(fields: Iterable[str], state: Dict[str, Any]) -> List[str]:
+    from src.workflow.case_discussion_workflow import DiscussionState
+
+    known = set(DiscussionState.__annotations__) | set(state) | set(VIRTUAL_FIELDS)
+    return [field for field in fields if field not in known]
+
+
+def project_state(state: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """The requested subset of the state, e.g. `awaiting_user_input` plus `last_message`."""
+    if fields is None:
+        return state
+    projected = {}
+    for field in fields:
+        if field == "status":
+            projected["status"] = session_status(state)
+        elif field == "last_message":
+            discussion = state.get("current_discussion") or []
+            projected["last_message"] = discussion[-1] if discussion else None
+        elif field in state:
+            projected[field] = state[field]
+    return projected
+
+
+def state_changes(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Optional[int]]:
+    """Top-level keys that differ between two states.
+
+    For a list that only grew (the add_messages channels), the value is the
+    previous length so a delta can carry just the appended tail; otherwise
+    it is None and the whole value has to be resent.
+    """
+    changes: Dict[str, Optional[int]] = {}
+    for key in set(previous) | set(current):
+        before, after = previous.get(key), current.get(key)
+        if before is after:
+            continue
+        if isinstance(before, list) and isinstance(after, list) and len(after) >= len(before):
+            if after[:len(before)] == before:
+                if len(after) > len(before):
+                    changes[key] = len(before)
+                continue
+        elif before == after:
+            continue
+        changes[key] = None
+    return changes
+
+
+def state_delta(
+    state: Dict[str, Any],
+    version: int,
+    history: Iterable[Tuple[int, Dict[str, Optional[int]]]],
+    since: int,
+    fields: Optional[List[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """What changed after version `since`, or None if the history no longer reaches back that far."""
+    if since > version:
+        return None
+    newer = [(v, changes) for v, changes in history if v > since]
+    if len(newer) != version - since:
+        return None
+
+    replaced: Dict[str, Any] = {}
+    appended: Dict[str, Any] = {}
+    grown_from: Dict[str, int] = {}
+    for _, changes in newer:
+        for key, previous_length in changes.items():
+            if fields is not None and key not in fields:
+                continue
+            if previous_length is None or key in replaced:
+                replaced[key] = state.get(key)
+                grown_from.pop(key, None)
+            else:
+                grown_from.setdefault(key, previous_length)
+    for key, start in grown_from.items():
+        appended[key] = (state.get(key) or [])[start:]
+
+    delta: Dict[str, Any] = {"version": version, "since": since, "set": replaced, "append": appended}
+    if fields is not None and any(field in VIRTUAL_FIELDS for field in fields):
+        delta["set"].update(project_state(state, [field for field in fields if field in VIRTUAL_FIELDS]))
+    return delta
+
+
+# Clock-driven values count towards the ETag only in buckets this wide
+ETAG_CLOCK_BUCKET_SECONDS = 30
+
+
+def etag_stable(extras: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a status response that feed its ETag.
+
+    The budget's topic clock advances continuously; hashing it as is would
+    make every poll a cache miss, so it is rounded down to a coarse bucket.
+    """
+    budget = extras.get("budget")
+    if not budget or "topic" not in budget:
+        return extras
+    topic = dict(budget["topic"])
+    topic["elapsed_seconds"] = int(topic.get("elapsed_seconds", 0) // ETAG_CLOCK_BUCKET_SECONDS)
+    return {**extras, "budget": {**budget, "topic": topic}}
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak validator over the version and whatever else shapes the response body."""
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    return f'W/"{digest}"'
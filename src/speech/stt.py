@@ -0,0 +1,114 @@
+# src/speech/stt.py
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import asyncio
+import inspect
+import io
+import itertools
+import random
+import time
+
+from src.metrics import metrics
+
+
+class STTBackend(ABC):
+    """Speech-to-text engine used by the speech websockets.
+
+    Subclasses implement `transcribe` either as a coroutine or as a plain
+    blocking method; blocking backends are run in a worker thread by
+    `transcribe()` below.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def transcribe(self, audio: bytes, filename: str = "audio.mp3") -> str:
+        """Return the (English) transcript of one audio clip."""
+
+
+class OpenAISTTBackend(STTBackend):
+    """Whisper through the async OpenAI client; clips are uploaded from memory, never from disk."""
+
+    name = "openai"
+
+    def __init__(self, model: str = "whisper-1"):
+        self.model = model
+        self._client = None
+
+    async def transcribe(self, audio: bytes, filename: str = "audio.mp3") -> str:
+        if self._client is None:
+            from openai import AsyncOpenAI
+            from src.config.settings import settings
+            self._client = AsyncOpenAI(api_key=settings.openai_api_key)
+        buffer = io.BytesIO(audio)
+        buffer.name = filename  # The API infers the audio format from the file name
+        transcription = await self._client.audio.translations.create(
+            model=self.model,
+            file=buffer
+        )
+        return transcription.text
+
+
+class ScriptedSTTBackend(STTBackend):
+    """Local stand-in: returns scripted transcripts in order, after a configurable latency.
+
+    No network or model is involved, so the voice path can be load-tested
+    offline. With `jitter`, latency varies uniformly by +/- that fraction,
+    drawn from a seeded generator so runs are reproducible.
+    """
+
+    name = "scripted"
+
+    def __init__(self, transcripts: List[str], latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        if not transcripts:
+            raise ValueError("ScriptedSTTBackend needs at least one transcript")
+        self.transcripts = transcripts
+        self.latency = latency
+        self.jitter = jitter
+        self._next = itertools.cycle(transcripts)
+        self._random = random.Random(seed)
+
+    async def transcribe(self, audio: bytes, filename: str = "audio.mp3") -> str:
+        text = next(self._next)
+        delay = self.latency * (1 + self.jitter * (2 * self._random.random() - 1))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return text
+
+
+_backend: Optional[STTBackend] = None
+
+
+def get_stt_backend() -> STTBackend:
+    """Backend selected by settings.stt_backend, created on first use."""
+    global _backend
+    if _backend is None:
+        from src.config.settings import settings
+
+        if settings.stt_backend == "scripted":
+            _backend = ScriptedSTTBackend(
+                settings.stt_scripted_transcripts,
+                latency=settings.stt_scripted_latency_seconds,
+                jitter=settings.stt_scripted_latency_jitter
+            )
+        else:
+            _backend = OpenAISTTBackend(model=settings.stt_openai_model)
+    return _backend
+
+
+def set_stt_backend(backend: Optional[STTBackend]) -> None:
+    """Replace the process-wide backend (benchmarks); None goes back to the configured one."""
+    global _backend
+    _backend = backend
+
+
+async def transcribe(audio: bytes, filename: str = "audio.mp3") -> str:
+    """Transcribe with the configured backend without ever blocking the event loop."""
+    backend = get_stt_backend()
+    started = time.monotonic()
+    if inspect.iscoroutinefunction(backend.transcribe):
+        text = await backend.transcribe(audio, filename)
+    else:
+        text = await asyncio.to_thread(backend.transcribe, audio, filename)
+    metrics.observe("stt_transcription_seconds", time.monotonic() - started, backend=getattr(backend, "name", "custom"))
+    return text
@@ -0,0 +1,147 @@
+# src/speech/vad.py
+from dataclasses import dataclass
+from typing import List, Optional
+import array
+import io
+import math
+import sys
+import wave
+
+SAMPLE_WIDTH = 2  # PCM16
+
+
+@dataclass
+class SpeechSegment:
+    """A stretch of speech cut at a pause; `end_of_turn` is set when the pause was long enough to end the turn."""
+    pcm: bytes
+    sample_rate: int
+    end_of_turn: bool = False
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / (SAMPLE_WIDTH * self.sample_rate)
+
+
+def frame_rms(frame: bytes) -> float:
+    """Root-mean-square amplitude of little-endian PCM16 mono audio."""
+    samples = array.array("h")
+    samples.frombytes(frame[: len(frame) - len(frame) % SAMPLE_WIDTH])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def pcm16_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """Wrap raw PCM16 mono audio in an in-memory WAV container."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class EnergyVAD:
+    """Energy-based voice activity segmentation of a PCM16 mono stream.
+
+    Audio is cut into fixed frames; a frame is voiced when its RMS exceeds
+    both `min_rms` and `noise_ratio` times an adaptive noise floor. The
+    floor starts at `min_rms / noise_ratio` (so a stream that opens with
+    speech is still segmented), follows unvoiced frames only and never
+    rises above `max_noise_floor` (default `min_rms`), so a loud room
+    cannot raise the threshold out of reach of speech. A segment is emitted after `segment_pause_ms` of
+    silence so it can be transcribed while the student keeps talking; once
+    the silence reaches `end_of_turn_ms` the turn is over. Segments are
+    also cut at `max_segment_seconds` so long monologues still stream.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = 30,
+        min_rms: float = 500.0,
+        noise_ratio: float = 3.0,
+        segment_pause_ms: int = 300,
+        end_of_turn_ms: int = 800,
+        max_segment_seconds: float = 15.0,
+        min_speech_ms: int = 90,
+        max_noise_floor: Optional[float] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * SAMPLE_WIDTH
+        self.frame_ms = frame_ms
+        self.min_rms = min_rms
+        self.noise_ratio = noise_ratio
+        self.segment_pause_frames = max(1, segment_pause_ms // frame_ms)
+        self.end_of_turn_frames = max(self.segment_pause_frames, end_of_turn_ms // frame_ms)
+        self.max_segment_bytes = int(max_segment_seconds * sample_rate) * SAMPLE_WIDTH
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+
+        self.max_noise_floor = max_noise_floor if max_noise_floor is not None else min_rms
+        self.noise_floor = min(min_rms / noise_ratio, self.max_noise_floor)
+        self._pending = b""
+        self._segment = bytearray()
+        self._voiced_frames = 0
+        self._silent_frames = 0
+        self._in_turn = False
+
+    def _is_voiced(self, rms: float) -> bool:
+        voiced = rms >= self.min_rms and rms >= self.noise_floor * self.noise_ratio
+        if not voiced:
+            # Slowly track the background level so a noisy room does not count as speech
+            self.noise_floor = min(0.95 * self.noise_floor + 0.05 * rms, self.max_noise_floor)
+        return voiced
+
+    def _emit(self, end_of_turn: bool) -> Optional[SpeechSegment]:
+        segment = None
+        if self._voiced_frames >= self.min_speech_frames:
+            segment = SpeechSegment(bytes(self._segment), self.sample_rate, end_of_turn)
+        self._segment = bytearray()
+        self._voiced_frames = 0
+        return segment
+
+    def feed(self, chunk: bytes) -> List[SpeechSegment]:
+        """Consume audio and return completed segments (possibly an empty end-of-turn marker)."""
+        segments: List[SpeechSegment] = []
+        data = self._pending + chunk
+        offset = 0
+        while offset + self.frame_bytes <= len(data):
+            frame = data[offset: offset + self.frame_bytes]
+            offset += self.frame_bytes
+
+            if self._is_voiced(frame_rms(frame)):
+                self._in_turn = True
+                self._silent_frames = 0
+                self._voiced_frames += 1
+                self._segment += frame
+            elif self._in_turn:
+                self._silent_frames += 1
+                if self._segment:
+                    self._segment += frame  # Keep short pauses so words are not clipped
+                if self._silent_frames == self.segment_pause_frames and self._segment:
+                    segment = self._emit(end_of_turn=False)
+                    if segment:
+                        segments.append(segment)
+                if self._silent_frames >= self.end_of_turn_frames:
+                    # The turn ends even if its last segment was already emitted
+                    segments.append(self._emit(end_of_turn=True) or SpeechSegment(b"", self.sample_rate, True))
+                    self._in_turn = False
+                    self._silent_frames = 0
+
+            if len(self._segment) >= self.max_segment_bytes:
+                segment = self._emit(end_of_turn=False)
+                if segment:
+                    segments.append(segment)
+        self._pending = data[offset:]
+        return segments
+
+    def flush(self) -> List[SpeechSegment]:
+        """End the stream: emit whatever speech is buffered as the end of the turn."""
+        if not self._in_turn:
+            return []
+        self._in_turn = False
+        self._silent_frames = 0
+        return [self._emit(end_of_turn=True) or SpeechSegment(b"", self.sample_rate, True)]
@@ -0,0 +1,20 @@
+# src/workers.py
+from uvicorn.workers import UvicornWorker
+
+from src.config.settings import settings
+
+
+class DrainingUvicornWorker(UvicornWorker):
+    """Uvicorn worker that bounds how long shutdown waits for open requests.
+
+    Uvicorn only runs the lifespan shutdown (drain + checkpoint, see
+    src/main.py) once open connections are closed; long /start-discussion
+    and /submit-response requests are cancelled after this timeout so the
+    hook always gets to run before gunicorn's graceful_timeout kills us.
+    Cancelling a request does not cancel its session's graph task.
+    """
+
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "timeout_graceful_shutdown": int(settings.shutdown_drain_seconds),
+    }
@@ -0,0 +1,88 @@
+# src/workflow/budget.py
+from typing import Any, Dict, Optional
+import time
+
+from src.llm.tokens import token_ledger
+from src.metrics import metrics
+
+
+class SessionBudget:
+    """LLM call, token and per-topic wall-clock budget for one discussion session.
+
+    Usage is read from the token ledger, so every agent call made on behalf
+    of the session counts. The ledger only lives in this worker, so usage
+    from before a checkpoint is carried over via `usage()` / `restore_usage()`.
+    `steer()` tells the workflow when to move to the next topic or wrap the
+    session up.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        max_llm_calls: int,
+        max_tokens: int,
+        topic_target_seconds: float,
+    ):
+        self.session_id = session_id
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.topic_target_seconds = topic_target_seconds
+        self.topics_completed = 0
+        self.topic_started_at = time.monotonic()
+        # Usage recorded before this session was restored from a checkpoint
+        self.carried_calls = 0
+        self.carried_tokens = 0
+
+    def usage(self) -> Dict[str, int]:
+        """LLM calls and tokens used by the session so far, including carried-over usage."""
+        live = token_ledger.totals(self.session_id)["total"]
+        return {
+            "calls": self.carried_calls + live["calls"],
+            "total_tokens": self.carried_tokens + live["total_tokens"],
+        }
+
+    def restore_usage(self, saved: Dict[str, int]) -> None:
+        """Carry over checkpointed usage; whatever this worker's ledger still holds is not counted twice."""
+        live = token_ledger.totals(self.session_id)["total"]
+        self.carried_calls = max(0, saved.get("calls", 0) - live["calls"])
+        self.carried_tokens = max(0, saved.get("total_tokens", 0) - live["total_tokens"])
+
+    def start_next_topic(self) -> None:
+        self.topics_completed += 1
+        self.topic_started_at = time.monotonic()
+
+    def consumed_fraction(self) -> float:
+        """Share of the tighter of the call and token budgets already used."""
+        usage = self.usage()
+        return max(
+            usage["calls"] / self.max_llm_calls if self.max_llm_calls else 0.0,
+            usage["total_tokens"] / self.max_tokens if self.max_tokens else 0.0,
+        )
+
+    def steer(self, topic_count: int) -> Optional[str]:
+        """Return "complete", "next_topic" or None (let the evaluator decide)."""
+        consumed = self.consumed_fraction()
+        if consumed >= 1.0 or (topic_count and self.topics_completed >= topic_count):
+            metrics.increment("session_budget_steer_total", decision="complete")
+            return "complete"
+
+        topic_elapsed = time.monotonic() - self.topic_started_at
+        # Each topic gets an equal share of the session budget
+        topic_share = (self.topics_completed + 1) / topic_count if topic_count else 1.0
+        if topic_elapsed >= self.topic_target_seconds or consumed >= topic_share:
+            metrics.increment("session_budget_steer_total", decision="next_topic")
+            return "next_topic"
+        return None
+
+    def status(self) -> Dict[str, Any]:
+        usage = self.usage()
+        return {
+            "llm_calls": {"used": usage["calls"], "limit": self.max_llm_calls},
+            "tokens": {"used": usage["total_tokens"], "limit": self.max_tokens},
+            "topic": {
+                "completed": self.topics_completed,
+                "elapsed_seconds": round(time.monotonic() - self.topic_started_at, 1),
+                "target_seconds": self.topic_target_seconds,
+            },
+            "consumed_fraction": round(self.consumed_fraction(), 3),
+        }
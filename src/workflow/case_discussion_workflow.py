@@ -1,4 +1,5 @@
-from typing import Dict, Any, List, Annotated
+from typing import Dict, Any, List, Annotated, Callable, Optional
+from contextlib import aclosing
 import ast
 import aiohttp
 import asyncio
@@ -6,6 +7,12 @@ from langgraph.graph import StateGraph, START, END
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
 import uuid
+from src.config.settings import settings
+from src.prompts.acknowledgements import pick_acknowledgement
+from src.llm.tokens import current_node
+from src.workflow.budget import SessionBudget
+from src.sessions.channels import channel_hub
+from src.metrics import metrics
 class DiscussionState(TypedDict):
     case_content: str
     current_step: str
@@ -21,9 +28,10 @@ class DiscussionState(TypedDict):
     awaiting_user_input: bool
     user_response: str
     human_participant: Dict[str, Any]
+    human_input_cursor: Optional[str]
 
 class CaseDiscussionWorkflow:
-    def __init__(self):
+    def __init__(self, started_case_id: str = None):
         from src.agents.orchestrator_agent import OrchestratorAgent
         from src.agents.planner_agent import PlannerAgent
         from src.agents.executor_agent import ExecutorAgent
@@ -37,9 +45,14 @@ class CaseDiscussionWorkflow:
         
         self.API_BASE_URL = "http://localhost:8080"
         self.professor_uuid = None
-        self.started_case_id = uuid.uuid4()
+        self.started_case_id = uuid.UUID(str(started_case_id)) if started_case_id else uuid.uuid4()
+        self.current_state = {}
         self.professor_introduction_statement = None
+        self.professor_personality = None
+        self.last_acknowledgement = None
         self.START = True
+        self.active_node = None  # Node currently executing, consulted when draining on shutdown
+        self.state_version = 0  # Bumped by the session registry whenever the state changes
 
         self.orchestrator = OrchestratorAgent()
         self.planner = PlannerAgent()
@@ -51,6 +64,22 @@ class CaseDiscussionWorkflow:
         self.assignment_agent = AssignmentAgent()
         self.replan_agent = ReplanAgent()
         self.direct_human_response_agent = DirectHumanResponseAgent()
+
+        # Tag every agent with this session so the LLM scheduler can round-robin fairly
+        for agent in (
+            self.orchestrator, self.planner, self.executor, self.persona_creator,
+            self.evaluator, self.summarizer, self.topic_agent, self.assignment_agent,
+            self.replan_agent, self.direct_human_response_agent
+        ):
+            agent.session_id = str(self.started_case_id)
+
+        self.budget = SessionBudget(
+            str(self.started_case_id),
+            max_llm_calls=settings.session_max_llm_calls,
+            max_tokens=settings.session_max_tokens,
+            topic_target_seconds=settings.topic_target_seconds
+        )
+
         self.workflow = StateGraph(DiscussionState)
 
         self.setup_nodes()
@@ -58,21 +87,46 @@ class CaseDiscussionWorkflow:
 
         self.graph = self.workflow.compile()
 
+    def _track_node(self, name: str, node_fn):
+        """Wrap a node so LLM calls made inside it are attributed to `name` in token accounting."""
+        async def tracked(state: DiscussionState) -> Dict[str, Any]:
+            token = current_node.set(name)
+            self.active_node = name
+            channel_hub.publish(self.started_case_id, {"type": "state", "node": name, "current_step": state.get("current_step")})
+            try:
+                return await node_fn(state)
+            finally:
+                self.active_node = None
+                current_node.reset(token)
+        return tracked
+
     def setup_nodes(self):
-        self.workflow.add_node("create_personas", self.create_personas)
-        self.workflow.add_node("create_topics", self.create_topics)
-        self.workflow.add_node("create_plan", self.create_plan)
-        self.workflow.add_node("execute_discussion", self.execute_discussion)
-        self.workflow.add_node("evaluate_discussion", self.evaluate_discussion)
-        self.workflow.add_node("summarize_discussion", self.summarize_discussion)
-        self.workflow.add_node("orchestrate", self.orchestrate)
-        self.workflow.add_node("handle_user_input", self.handle_user_input)
-        self.workflow.add_node("assign_discussion", self.assign_discussion)
-        self.workflow.add_node("replan_sequence", self.replan_sequence)
-        self.workflow.add_node("direct_human_response_agent", self.direct_human_response)
+        self.workflow.add_node("create_personas", self._track_node("create_personas", self.create_personas))
+        self.workflow.add_node("create_topics", self._track_node("create_topics", self.create_topics))
+        self.workflow.add_node("create_plan", self._track_node("create_plan", self.create_plan))
+        self.workflow.add_node("execute_discussion", self._track_node("execute_discussion", self.execute_discussion))
+        self.workflow.add_node("evaluate_discussion", self._track_node("evaluate_discussion", self.evaluate_discussion))
+        self.workflow.add_node("summarize_discussion", self._track_node("summarize_discussion", self.summarize_discussion))
+        self.workflow.add_node("orchestrate", self._track_node("orchestrate", self.orchestrate))
+        self.workflow.add_node("handle_user_input", self._track_node("handle_user_input", self.handle_user_input))
+        self.workflow.add_node("assign_discussion", self._track_node("assign_discussion", self.assign_discussion))
+        self.workflow.add_node("replan_sequence", self._track_node("replan_sequence", self.replan_sequence))
+        self.workflow.add_node("direct_human_response_agent", self._track_node("direct_human_response_agent", self.direct_human_response))
+        self.workflow.add_node("complete_discussion", self._track_node("complete_discussion", self.complete_discussion))
 
     def setup_edges(self):
-        self.workflow.add_edge(START, "create_personas")
+        self.workflow.add_conditional_edges(
+            START,
+            self.entry_condition,
+            {
+                "create_personas": "create_personas",
+                "create_topics": "create_topics",
+                "create_plan": "create_plan",
+                "assign_discussion": "assign_discussion",
+                "handle_user_input": "handle_user_input",
+                END: END
+            }
+        )
 
         self.workflow.add_conditional_edges("create_personas", self.persona_creation_condition, {"create_topics": "create_topics", END: END})
         self.workflow.add_conditional_edges("create_topics", self.topic_creation_condition, {"create_plan": "create_plan", END: END})
@@ -94,12 +148,21 @@ class CaseDiscussionWorkflow:
             {
                 "summarize_discussion": "summarize_discussion",
                 "assign_discussion": "assign_discussion",
-                "replan_sequence": "replan_sequence"
+                "replan_sequence": "replan_sequence",
+                "complete_discussion": "complete_discussion"
             }
         )
         
-        self.workflow.add_edge("summarize_discussion", "assign_discussion")
+        self.workflow.add_conditional_edges(
+            "summarize_discussion",
+            self.topic_progress_condition,
+            {
+                "assign_discussion": "assign_discussion",
+                "complete_discussion": "complete_discussion"
+            }
+        )
         self.workflow.add_edge("replan_sequence", "assign_discussion")
+        self.workflow.add_edge("complete_discussion", END)
 
     async def create_personas(self, state: DiscussionState) -> Dict[str, Any]:
         print(f"Case ID: {self.started_case_id}")
@@ -111,6 +174,7 @@ class CaseDiscussionWorkflow:
         print(f"state['human_participant']: {state['human_participant']}")
         self.professor_uuid = result["professor"]["uuid"]
         self.professor_introduction_statement = result["professor"]["introduction_statement"]
+        self.professor_personality = result["professor"].get("personality")
         test_url = f"http://localhost:8080/test.html?started_case_id={self.started_case_id}&persona_id={state['human_participant']['uuid']}"
         print(f"Open this URL to start voice input: {test_url}")
         print(f"result: {result}")
@@ -243,6 +307,7 @@ class CaseDiscussionWorkflow:
             "current_discussion": state["current_discussion"],
             "evaluations": state["evaluations"]
         })
+        self.budget.start_next_topic()
         return {
             "summaries": [
                 {
@@ -252,6 +317,10 @@ class CaseDiscussionWorkflow:
             ]
         }
 
+    async def complete_discussion(self, state: DiscussionState) -> Dict[str, Any]:
+        print(f"Completing discussion. Budget: {self.budget.status()}")
+        return {"complete": True, "current_step": "complete", "awaiting_user_input": False}
+
     async def orchestrate(self, state: DiscussionState) -> Dict[str, Any]:
         result = await self.orchestrator.process({
             "current_step": state["current_step"],
@@ -262,8 +331,36 @@ class CaseDiscussionWorkflow:
 
         return {"complete": result["next_step"] == "complete", "current_step": result["next_step"]}
 
+    async def emit_acknowledgement(self, state: DiscussionState) -> None:
+        """Persist an instant, template-based professor acknowledgement of the human's turn.
+
+        This masks the latency of the LLM-generated reply that follows in
+        direct_human_response_agent.
+        """
+        if not settings.instant_acknowledgement_enabled or not self.professor_uuid:
+            return
+        human_name = state["human_participant"].get("name", "")
+        content = pick_acknowledgement(self.professor_personality, human_name, exclude=self.last_acknowledgement)
+        self.last_acknowledgement = content
+        from src.main import create_message as db_create_message
+        await db_create_message({
+            "started_case_id": self.started_case_id,
+            "persona_id": self.professor_uuid,
+            "content": content,
+            "is_user_message": False,
+            "awaiting_user_input": False
+        })
+        print(f"Acknowledgement sent: {content}")
+
     async def direct_human_response(self, state: DiscussionState) -> Dict[str, Any]:
         print(f"state: {state}")
+        if state.get("awaiting_user_input"):
+            # handle_user_input timed out: nobody said anything to acknowledge or answer
+            return {}
+        await self.emit_acknowledgement(state)
+        if not settings.direct_response_llm_enabled:
+            # The instant acknowledgement stands in; the evaluator asks the follow-up next
+            return {}
         result = await self.direct_human_response_agent.process({
             "user_inputs": state["user_inputs"],
             "case_content": state["case_content"]
@@ -280,47 +377,68 @@ class CaseDiscussionWorkflow:
 
     async def handle_user_input(self, state: DiscussionState) -> Dict[str, Any]:
         print("\n=== Starting handle_user_input ===")
+        # Turns sent to this worker arrive through the session channel; others are found by polling
+        channel = channel_hub.get(self.started_case_id)
+        channel.publish({
+            "type": "awaiting_input",
+            "persona_id": str(state["human_participant"].get("uuid", ""))
+        })
+        # While we wait, turns arriving on this worker are handed over directly instead of via the DB
+        channel.waiters += 1
+        try:
+            return await self._wait_for_human_message(state, channel)
+        finally:
+            channel.waiters -= 1
+
+    async def _wait_for_human_message(self, state: DiscussionState, channel) -> Dict[str, Any]:
         # Query for the latest human message from tmain
         
-        from src.main import get_unread_messages
-        
-        # Poll for messages with a timeout
+        cursor = state.get("human_input_cursor")
         max_attempts = 120  
         attempt = 0
+        poll_interval = 1.0
         
         while attempt < max_attempts:
-            print(f"\nPolling attempt {attempt}")
-            messages = await get_unread_messages(self.started_case_id)
-            print(f"Retrieved messages: {messages}")
-            
-            # Find the latest human message
-            human_message = None
-            for msg in messages:
-                print(f"Checking message: {msg}")
-                if msg:
-                    human_message = msg['content']
+            # A response posted to /submit-response arrives in the state itself
+            human_message = state.get("user_response") if attempt == 0 else None
+            path = "submit_response"
+            if not human_message:
+                human_message = channel.take_input()
+                path = "channel"
+            if not human_message:
+                print(f"\nPolling attempt {attempt}")
+                # Only rows after our cursor that nobody has consumed yet; each turn is read once
+                message = await self._claim_human_message(cursor)
+                print(f"Retrieved message: {message}")
+                if message:
+                    human_message = message['content']
+                    cursor = message['cursor']
+                    path = "db_poll"
                     print(f"Found human message: {human_message}")
-                    break
             
             if human_message:
+                metrics.increment("human_input_delivered_total", path=path)
                 user_message = {
                     "role": "user",
                     "content": human_message,
                 }
                 print(f"Created user message: {user_message}")
-                
+                # Nothing is awaited between taking the turn and returning it, so a
+                # cancellation here cannot drop it; the acknowledgement is sent by
+                # the next node
                 return {
                     **state,
                     "user_inputs": [user_message],
                     "current_discussion": [user_message],
                     "awaiting_user_input": False,
-                    "user_response": ""
+                    "user_response": "",
+                    "human_input_cursor": cursor
                 }
             
             # Wait before checking again
             print(f"No message found, waiting...")
-            await asyncio.sleep(0.2)
-            attempt += 0.2
+            await channel.wait_for_input(timeout=poll_interval)
+            attempt += poll_interval
         
         print("Timeout reached, still waiting for input")
         # If we timeout waiting for input
@@ -334,6 +452,23 @@ class CaseDiscussionWorkflow:
             ]
         }
 
+    async def _claim_human_message(self, cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Claim the next unread human message; if cancelled mid-claim, hand the row back as unread."""
+        from src.main import get_unread_message, release_unread_message
+
+        claim = asyncio.ensure_future(get_unread_message(self.started_case_id, cursor))
+        try:
+            return await asyncio.shield(claim)
+        except asyncio.CancelledError:
+            try:
+                message = await claim
+                if message:
+                    await release_unread_message(message["id"])
+                    print(f"Released human message {message['id']} claimed by a cancelled reader")
+            except Exception as e:
+                print(f"Could not release claimed human message: {e}")
+            raise
+
     async def assign_discussion(self, state: DiscussionState) -> Dict[str, Any]:
         # Use the current_sequence if it exists (after replan), otherwise use from discussion_plan
         print("Assigning Discussion...")
@@ -411,6 +546,47 @@ class CaseDiscussionWorkflow:
             "messages": result["messages"]
         }
 
+    def entry_condition(self, state: DiscussionState) -> str:
+        """Resume from wherever the state left off (fresh run, submitted response or restored checkpoint)."""
+        if not state.get("personas"):
+            return "create_personas"
+        if not state.get("topics"):
+            return "create_topics"
+        if not state.get("discussion_plan"):
+            return "create_plan"
+        if state.get("complete"):
+            return END
+        if state.get("awaiting_user_input"):
+            return "handle_user_input"
+        return "assign_discussion"
+
+    def checkpoint_metadata(self) -> Dict[str, Any]:
+        """Instance fields needed, alongside the graph state, to resume this session elsewhere."""
+        return {
+            "started_case_id": str(self.started_case_id),
+            "professor_uuid": self.professor_uuid,
+            "professor_introduction_statement": self.professor_introduction_statement,
+            "professor_personality": self.professor_personality,
+            "last_acknowledgement": self.last_acknowledgement,
+            "started": not self.START,
+            "topics_completed": self.budget.topics_completed,
+            "budget_usage": self.budget.usage(),
+            "state_version": self.state_version
+        }
+
+    @classmethod
+    def from_checkpoint(cls, metadata: Dict[str, Any]) -> "CaseDiscussionWorkflow":
+        workflow = cls(started_case_id=metadata["started_case_id"])
+        workflow.professor_uuid = metadata.get("professor_uuid")
+        workflow.professor_introduction_statement = metadata.get("professor_introduction_statement")
+        workflow.professor_personality = metadata.get("professor_personality")
+        workflow.last_acknowledgement = metadata.get("last_acknowledgement")
+        workflow.START = not metadata.get("started", False)
+        workflow.budget.topics_completed = metadata.get("topics_completed", 0)
+        workflow.budget.restore_usage(metadata.get("budget_usage") or {})
+        workflow.state_version = metadata.get("state_version", 0)
+        return workflow
+
     def persona_creation_condition(self, state: DiscussionState) -> str:
         return "create_topics" if state["personas"] else END
 
@@ -438,6 +614,13 @@ class CaseDiscussionWorkflow:
         action = latest_evaluation.additional_kwargs.get("action", "")
         sequence_complete = latest_evaluation.additional_kwargs.get("sequence_complete", False)
         current_topic_complete = latest_evaluation.additional_kwargs.get("current_topic_complete", False)
+
+        # The session budget overrides the evaluator once it is being consumed too fast
+        steer = self.budget.steer(self._topic_count(state))
+        if steer == "complete":
+            return "complete_discussion"
+        if steer == "next_topic":
+            current_topic_complete = True
         
         if current_topic_complete:
             return "summarize_discussion"
@@ -448,6 +631,16 @@ class CaseDiscussionWorkflow:
         else:
             return "assign_discussion"
 
+    def topic_progress_condition(self, state: DiscussionState) -> str:
+        topic_count = self._topic_count(state)
+        if topic_count and self.budget.topics_completed >= topic_count:
+            return "complete_discussion"
+        return "complete_discussion" if self.budget.consumed_fraction() >= 1.0 else "assign_discussion"
+
+    def _topic_count(self, state: DiscussionState) -> int:
+        topics = state.get("topics") or {}
+        return len(topics.get("topics", [])) if isinstance(topics, dict) else 0
+
     def user_input_condition(self, state: DiscussionState) -> str:
         return "handle_user_input" if state.get("awaiting_user_input") else "evaluate_discussion"
 
@@ -505,9 +698,15 @@ class CaseDiscussionWorkflow:
             
         print("\n" + "="*80 + "\n")
 
-    async def run(self, case_content: str, *, human_participant: Dict[str, Any]):
+    async def run(
+        self,
+        case_content: str,
+        *,
+        human_participant: Dict[str, Any],
+        on_state: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
         # Initialize state with all required fields
-        self.current_state = {
+        initial_state = {
             "case_content": case_content,
             "human_participant": human_participant,
             "current_step": "create_personas",
@@ -523,56 +722,89 @@ class CaseDiscussionWorkflow:
             "awaiting_user_input": False,
             "user_response": ""
         }
+        return await self.resume(initial_state, on_state=on_state)
+
+    async def resume(
+        self,
+        state: Dict[str, Any],
+        on_state: Optional[Callable[[Dict[str, Any]], None]] = None,
+        stop_when_awaiting_input: bool = False
+    ) -> Dict[str, Any]:
+        """Stream the graph from `state`, keeping `current_state` up to date, and return the final state.
+
+        `on_state` is called with the full state after every step. With
+        `stop_when_awaiting_input`, streaming stops at the first step that asks
+        the human for input, so the caller can answer the request that drove it.
+        """
+        self.current_state = state
 
         if not hasattr(self, 'graph'):
             self.graph = self.workflow.compile()
             
         try:
-            async for state in self.graph.astream(self.current_state, config={"recursion_limit": 1000}):
-                self.print_state(state)  # Use the new print function
-                if state.get("messages"):
-                    for message in state["messages"]:
-                        # Handle both direct dictionary and AIMessage formats
-                        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
-                        speaker = None
+            # The first values chunk is the input state itself, not the result of a step
+            skip_input_state = True
+            async with aclosing(self.graph.astream(
+                self.current_state,
+                config={"recursion_limit": 1000},
+                stream_mode=["updates", "values"]
+            )) as stream:
+                async for mode, chunk in stream:
+                    if mode == "values":
+                        if skip_input_state:
+                            skip_input_state = False
+                            continue
+                        self.current_state = chunk  # Full state after each step, used for checkpoints
+                        if on_state is not None:
+                            on_state(chunk)
+                        if stop_when_awaiting_input and chunk.get("awaiting_user_input"):
+                            break
+                        continue
+                    state = chunk
+                    self.print_state(state)  # Use the new print function
+                    if state.get("messages"):
+                        for message in state["messages"]:
+                            # Handle both direct dictionary and AIMessage formats
+                            content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+                            speaker = None
                         
-                        if isinstance(message, dict):
-                            speaker = message.get("speaker", "System")
-                        else:
-                            # Handle AIMessage format
-                            speaker = message.additional_kwargs.get("speaker", "System") if hasattr(message, "additional_kwargs") else "System"
+                            if isinstance(message, dict):
+                                speaker = message.get("speaker", "System")
+                            else:
+                                # Handle AIMessage format
+                                speaker = message.additional_kwargs.get("speaker", "System") if hasattr(message, "additional_kwargs") else "System"
                         
-                        if content:
-                            print(f"\n{speaker}: {content}")
+                            if content:
+                                print(f"\n{speaker}: {content}")
                 
-                self.current_state = state  # Update the stored state
+                    # # If we're awaiting user input, pause here and return the state
+                    # if state.get("awaiting_user_input"):
+                    #     # Get the latest assignment message
+                    #     latest_message = state.get("messages", [])[-1] if state.get("messages") else None
+                    #     if latest_message:
+                    #         print("\n" + "="*50)
+                    #         print("Awaiting user input:")
+                    #         print(latest_message["content"])
+                    #         print("="*50 + "\n")
+                    #     return state
                 
-                # # If we're awaiting user input, pause here and return the state
-                # if state.get("awaiting_user_input"):
-                #     # Get the latest assignment message
-                #     latest_message = state.get("messages", [])[-1] if state.get("messages") else None
-                #     if latest_message:
-                #         print("\n" + "="*50)
-                #         print("Awaiting user input:")
-                #         print(latest_message["content"])
-                #         print("="*50 + "\n")
-                #     return state
-                
-                # if state.get("complete"):
-                #     final_result = {
-                #         "personas": state["personas"],
-                #         "discussion_plan": state["discussion_plan"],
-                #         "discussions": state["current_discussion"],
-                #         "summaries": state["summaries"],
-                #         "evaluations": state["evaluations"]
-                #     }
-                #     print("Workflow complete! Final result:", final_result)
-                #     return final_result
+                    # if state.get("complete"):
+                    #     final_result = {
+                    #         "personas": state["personas"],
+                    #         "discussion_plan": state["discussion_plan"],
+                    #         "discussions": state["current_discussion"],
+                    #         "summaries": state["summaries"],
+                    #         "evaluations": state["evaluations"]
+                    #     }
+                    #     print("Workflow complete! Final result:", final_result)
+                    #     return final_result
                 
         except Exception as e:
             print(f"Error in workflow: {str(e)}")
             raise
 
+        return self.current_state
+
     def create_graph(self):
         """Create the workflow graph with all necessary agents"""
         graph = StateGraph(DiscussionState)
@@ -0,0 +1,33 @@
+import pytest
+
+from src.prompts.acknowledgements import (
+    ACKNOWLEDGEMENT_TEMPLATES, UNNAMED_ACKNOWLEDGEMENT_TEMPLATES, acknowledgement_style, pick_acknowledgement
+)
+
+
+def test_style_follows_the_personality():
+    assert acknowledgement_style("Warm and encouraging") == "warm"
+    assert acknowledgement_style("A Socratic questioner") == "challenging"
+    assert acknowledgement_style(None) == "default"
+
+
+def test_name_is_filled_in():
+    assert "Jordan" in pick_acknowledgement("warm", "Jordan")
+
+
+@pytest.mark.parametrize("name", ["", "   ", None])
+def test_blank_name_uses_the_unnamed_variants(name):
+    for _ in range(20):
+        text = pick_acknowledgement("analytical", name)
+        assert text in UNNAMED_ACKNOWLEDGEMENT_TEMPLATES["analytical"]
+        assert ", ," not in text and "{name}" not in text
+
+
+def test_every_style_has_unnamed_variants():
+    assert set(UNNAMED_ACKNOWLEDGEMENT_TEMPLATES) == set(ACKNOWLEDGEMENT_TEMPLATES)
+
+
+def test_previous_acknowledgement_is_not_repeated():
+    previous = pick_acknowledgement("default", "")
+    for _ in range(20):
+        assert pick_acknowledgement("default", "", exclude=previous) != previous
@@ -0,0 +1,109 @@
+import asyncio
+import base64
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("asyncpg")
+pytest.importorskip("fastapi")
+
+from src.db.database import (
+    consume_human_message, decode_message_cursor, encode_message_cursor, get_transcript_page
+)
+from src.db.queries import CLAIM_NEXT_HUMAN_MESSAGE, TRANSCRIPT_PAGE
+
+
+class FakeConnection:
+    """Serves the transcript and claim queries from an in-memory messages table."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def fetch(self, query, started_case_id, after, limit):
+        self.calls.append((query, after, limit))
+        matching = [row for row in self.rows if row["started_case_id"] == started_case_id and row["id"] > after]
+        return sorted(matching, key=lambda row: row["id"])[:limit]
+
+    async def fetchrow(self, query, started_case_id, after):
+        self.calls.append((query, after))
+        for row in sorted(self.rows, key=lambda row: row["id"]):
+            if (row["started_case_id"] == started_case_id and row["is_human"]
+                    and row["consumed_at"] is None and row["id"] > after):
+                row["consumed_at"] = "now"
+                return {"id": row["id"], "content": row["content"]}
+        return None
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+
+def make_app(rows):
+    conn = FakeConnection(rows)
+    return SimpleNamespace(state=SimpleNamespace(pool=FakePool(conn))), conn
+
+
+def message(id, is_human=False, case="case", consumed_at=None):
+    return {"id": id, "started_case_id": case, "content": f"m{id}", "is_human": is_human, "consumed_at": consumed_at}
+
+
+def test_cursor_round_trip():
+    assert decode_message_cursor(encode_message_cursor({"id": 42})) == 42
+
+
+def test_cursors_issued_before_id_ordering_still_decode():
+    legacy = base64.urlsafe_b64encode(json.dumps({"time_sent": "2024-01-01T00:00:00", "id": 7}).encode()).decode()
+    assert decode_message_cursor(legacy) == 7
+
+
+def test_transcript_pages_follow_ids_and_end_without_a_cursor():
+    # Ids are not in insert order here: a late commit must not be skipped or repeated
+    rows = [message(n) for n in (3, 1, 5, 2, 4)] + [message(6, case="other")]
+    app, conn = make_app(rows)
+
+    async def read_all():
+        pages, cursor = [], None
+        while True:
+            page, cursor = await get_transcript_page(app, "case", 2, cursor)
+            pages.append([row["id"] for row in page])
+            if cursor is None:
+                return pages
+
+    assert asyncio.run(read_all()) == [[1, 2], [3, 4], [5]]
+    # One extra row per page answers "is there more" without a COUNT
+    assert [call[2] for call in conn.calls] == [3, 3, 3]
+    assert all(call[0] is TRANSCRIPT_PAGE for call in conn.calls)
+
+
+def test_exact_last_page_has_no_next_cursor():
+    app, _ = make_app([message(1), message(2)])
+    page, cursor = asyncio.run(get_transcript_page(app, "case", 2))
+    assert [row["id"] for row in page] == [1, 2] and cursor is None
+
+
+def test_each_human_turn_is_consumed_once_in_order():
+    rows = [message(1, is_human=True, consumed_at="earlier"), message(2), message(3, is_human=True),
+            message(4, is_human=True)]
+    app, conn = make_app(rows)
+
+    async def scenario():
+        first = await consume_human_message(app, "case")
+        second = await consume_human_message(app, "case", first["cursor"])
+        third = await consume_human_message(app, "case", second["cursor"])
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert (first["id"], first["content"]) == (3, "m3")
+    assert second["id"] == 4
+    assert third is None
+    # Only rows after the cursor are asked for
+    assert [call[1] for call in conn.calls] == [0, 3, 4]
+    assert all(call[0] is CLAIM_NEXT_HUMAN_MESSAGE for call in conn.calls)
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("asyncpg")
+pytest.importorskip("fastapi")
+
+from src.db import database
+from src.config.settings import settings
+
+
+class FakeAsyncpgPool:
+    def __init__(self, size):
+        self.size = size
+        self.idle = size
+        self.pinged = 0
+
+    async def acquire(self, timeout=None):
+        self.idle -= 1
+        return SimpleNamespace(fetchval=self.fetchval)
+
+    async def release(self, conn):
+        self.idle += 1
+
+    async def fetchval(self, query):
+        self.pinged += 1
+        await asyncio.sleep(0.01)
+        return 1
+
+    def get_size(self):
+        return self.size
+
+    def get_idle_size(self):
+        return self.idle
+
+    def get_max_size(self):
+        return self.size
+
+
+@pytest.fixture
+def created(monkeypatch):
+    calls = []
+
+    async def create_pool(dsn, **options):
+        calls.append((dsn, options))
+        return FakeAsyncpgPool(options["min_size"])
+
+    monkeypatch.setattr(database.asyncpg, "create_pool", create_pool)
+    monkeypatch.setattr(settings, "database_url", "postgresql://app@db/discussions")
+    monkeypatch.setattr(settings, "db_pool_min_size", 3)
+    monkeypatch.setattr(settings, "db_pool_max_size", 7)
+    monkeypatch.setattr(settings, "db_statement_cache_size", 50)
+    return calls
+
+
+def test_pool_is_configured_from_settings(created, monkeypatch):
+    monkeypatch.setattr(settings, "db_pgbouncer_mode", False)
+    asyncio.run(database.create_db_pool())
+    dsn, options = created[0]
+    assert dsn == "postgresql://app@db/discussions"
+    assert (options["min_size"], options["max_size"], options["statement_cache_size"]) == (3, 7, 50)
+    assert options["command_timeout"] == settings.db_command_timeout_seconds
+
+
+def test_pgbouncer_mode_disables_the_statement_cache(created, monkeypatch):
+    monkeypatch.setattr(settings, "db_pgbouncer_mode", True)
+    asyncio.run(database.create_db_pool())
+    assert created[0][1]["statement_cache_size"] == 0
+
+
+def test_warmup_pings_every_initial_connection_concurrently(created):
+    async def scenario():
+        pool = await database.create_db_pool()
+        started = asyncio.get_running_loop().time()
+        await database.warm_db_pool(pool)
+        return pool, asyncio.get_running_loop().time() - started
+
+    pool, elapsed = asyncio.run(scenario())
+    assert pool._pool.pinged == 3
+    assert elapsed < 0.03
+    assert pool.get_idle_size() == 3  # every connection went back to the pool
+
+
+def test_instrumented_acquire_reports_utilization(created):
+    from src.metrics import metrics
+
+    async def scenario():
+        pool = await database.create_db_pool()
+        async with pool.acquire():
+            during = metrics.snapshot()["gauges"]
+        return pool, during, metrics.snapshot()["gauges"]
+
+    pool, during, after = asyncio.run(scenario())
+    assert (during["db_pool_in_use"], during["db_pool_utilization"]) == (1, 1 / 3)
+    assert after["db_pool_in_use"] == 0
+    assert pool.get_idle_size() == 3
+
+
+def test_settings_refuse_to_start_without_a_database_url(monkeypatch):
+    from src.config.settings import Settings
+
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    with pytest.raises(ValueError, match="DATABASE_URL"):
+        Settings()
@@ -0,0 +1,92 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip("asyncpg")
+
+from src.db.schema import HOT_QUERIES, MIGRATIONS, check_query_plans, migrate
+
+
+class FakeConnection:
+    def __init__(self, plans=None, applied=()):
+        self.plans = plans or {}
+        self.applied = list(applied)
+        self.executed = []
+
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+
+    async def execute(self, statement, *args):
+        self.executed.append(statement)
+        if statement.startswith("INSERT INTO schema_migrations"):
+            self.applied.append(args[0])
+
+    async def fetch(self, query):
+        return [{"version": version} for version in self.applied]
+
+    async def fetchval(self, query, *args):
+        for name, _, _, hot_query, _ in HOT_QUERIES:
+            if query.endswith(hot_query):
+                return json.dumps([{"Plan": self.plans[name]}])
+        raise AssertionError(f"unexpected query {query}")
+
+
+def index_scan(table, index):
+    return {"Node Type": "Index Scan", "Relation Name": table, "Index Name": index}
+
+
+def good_plans():
+    plans = {name: index_scan(table, index) for name, table, index, _, _ in HOT_QUERIES}
+    # The claim updates by primary key around the indexed lookup of the next unread turn
+    plans["next unread human message"] = {
+        "Node Type": "ModifyTable", "Relation Name": "messages",
+        "Plans": [
+            index_scan("messages", "messages_pkey"),
+            {"Node Type": "Limit", "Plans": [index_scan("messages", "messages_unconsumed_human_id_idx")]},
+        ],
+    }
+    return plans
+
+
+def test_plans_on_the_expected_indexes_pass():
+    results = asyncio.run(check_query_plans(FakeConnection(good_plans())))
+    assert all(result["uses_index"] for result in results)
+
+
+def test_primary_key_scan_is_not_enough():
+    plans = good_plans()
+    plans["transcript page"] = index_scan("messages", "messages_pkey")
+    results = {result["query"]: result for result in asyncio.run(check_query_plans(FakeConnection(plans)))}
+    assert not results["transcript page"]["uses_index"]
+    assert results["transcript page"]["indexes"] == ["messages_pkey"]
+
+
+def test_bitmap_scans_count_by_index_name_and_seq_scans_fail():
+    plans = good_plans()
+    plans["transcript page"] = {
+        "Node Type": "Bitmap Heap Scan", "Relation Name": "messages",
+        "Plans": [{"Node Type": "Bitmap Index Scan", "Index Name": "messages_started_case_id_idx"}],
+    }
+    plans["session checkpoint load"] = {"Node Type": "Seq Scan", "Relation Name": "session_checkpoints"}
+    results = {result["query"]: result for result in asyncio.run(check_query_plans(FakeConnection(plans)))}
+    assert results["transcript page"]["uses_index"]
+    assert not results["session checkpoint load"]["uses_index"]
+
+
+def test_every_expected_index_is_created_by_a_migration():
+    statements = " ".join(statement for _, _, migration in MIGRATIONS for statement in migration)
+    for name, _, index, _, _ in HOT_QUERIES:
+        assert index.endswith("_pkey") or f"CREATE INDEX IF NOT EXISTS {index}" in statements, name
+        assert f"DROP INDEX IF EXISTS {index}" not in statements, name
+
+
+def test_migrations_are_numbered_in_order_and_applied_once():
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+
+    conn = FakeConnection(applied=versions[:2])
+    assert asyncio.run(migrate(conn)) == versions[2:]
+    assert asyncio.run(migrate(conn)) == []
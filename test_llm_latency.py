@@ -0,0 +1,65 @@
+import time
+
+from src.llm.latency import LatencyTracker, ModelRouter
+
+
+def record(tracker, seconds, count, model="primary", agent="executor"):
+    for _ in range(count):
+        tracker.record(model, agent, seconds)
+
+
+def test_percentiles_use_nearest_rank():
+    tracker = LatencyTracker()
+    for seconds in (1, 2, 3, 4, 5, 6, 7, 8, 9, 10):
+        tracker.record("m", "a", seconds)
+    assert tracker.percentile("m", "a", 50) == 5
+    assert tracker.percentile("m", "a", 95) == 10
+    assert tracker.percentile("m", "other", 95) is None
+
+
+def test_old_samples_leave_the_window():
+    tracker = LatencyTracker(window_seconds=0.05)
+    record(tracker, 9.0, 3, model="m", agent="a")
+    time.sleep(0.06)
+    tracker.record("m", "a", 1.0)
+    assert tracker.count("m", "a") == 1
+    assert tracker.percentile("m", "a", 95) == 1.0
+
+
+def test_sample_count_is_capped():
+    tracker = LatencyTracker(max_samples=3)
+    record(tracker, 1.0, 10, model="m", agent="a")
+    assert tracker.count("m", "a") == 3
+
+
+def test_router_stays_on_primary_without_fallback_or_enough_samples():
+    tracker = LatencyTracker()
+    router = ModelRouter(tracker, min_samples=5)
+    record(tracker, 10.0, 4)
+    assert router.choose("executor", "primary", "fast", 2.0) == "primary"
+    assert router.choose("executor", "primary", None, 2.0) == "primary"
+    assert router.choose("executor", "primary", "fast", None) == "primary"
+
+
+def test_router_switches_on_slo_breach_and_probes_the_primary():
+    tracker = LatencyTracker()
+    router = ModelRouter(tracker, min_samples=5, probe_interval=0.05)
+    record(tracker, 10.0, 5)
+    assert router.choose("executor", "primary", "fast", 2.0) == "fast"
+    assert router.choose("executor", "primary", "fast", 2.0) == "fast"
+    time.sleep(0.06)
+    # One call goes to the primary so its latency window keeps filling
+    assert router.choose("executor", "primary", "fast", 2.0) == "primary"
+    assert router.choose("executor", "primary", "fast", 2.0) == "fast"
+
+
+def test_router_fails_back_once_the_primary_recovers():
+    tracker = LatencyTracker(max_samples=5)
+    router = ModelRouter(tracker, min_samples=5, recovery_ratio=0.8)
+    record(tracker, 10.0, 5)
+    assert router.choose("executor", "primary", "fast", 2.0) == "fast"
+    # Under the SLO but not under recovery_ratio * SLO: stay on the fallback
+    record(tracker, 1.9, 5)
+    assert router.choose("executor", "primary", "fast", 2.0) == "fast"
+    record(tracker, 1.0, 5)
+    assert router.choose("executor", "primary", "fast", 2.0) == "primary"
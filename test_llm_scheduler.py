@@ -0,0 +1,101 @@
+import asyncio
+
+from src.llm.scheduler import LLMScheduler, PRIORITY_BOOTSTRAP, PRIORITY_LIVE
+
+
+async def _hold(scheduler, model, priority, session_id, order, release):
+    async with scheduler.slot(model, priority, session_id):
+        order.append(session_id)
+        await release.wait()
+
+
+async def _queue_behind_a_busy_slot(scheduler, waiters):
+    """Occupy the only slot, queue `waiters` (priority, session_id) behind it; returns the grant order."""
+    order = []
+    gate = asyncio.Event()
+    blocker = asyncio.create_task(_hold(scheduler, "m", PRIORITY_LIVE, "blocker", order, gate))
+    await asyncio.sleep(0)
+    done = asyncio.Event()
+    done.set()  # queued calls return as soon as they are granted
+    tasks = []
+    for priority, session_id in waiters:
+        tasks.append(asyncio.create_task(_hold(scheduler, "m", priority, session_id, order, done)))
+        await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(blocker, *tasks)
+    return order[1:]
+
+
+def test_live_turns_are_served_before_bootstrap():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, rate_limits={})
+        return await _queue_behind_a_busy_slot(scheduler, [
+            (PRIORITY_BOOTSTRAP, "bootstrap"),
+            (PRIORITY_LIVE, "live"),
+        ])
+
+    assert asyncio.run(run()) == ["live", "bootstrap"]
+
+
+def test_sessions_take_turns_within_a_priority_class():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, rate_limits={})
+        return await _queue_behind_a_busy_slot(scheduler, [
+            (PRIORITY_LIVE, "a"),
+            (PRIORITY_LIVE, "a"),
+            (PRIORITY_LIVE, "b"),
+        ])
+
+    assert asyncio.run(run()) == ["a", "b", "a"]
+
+
+def test_concurrency_cap_is_respected():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=2, rate_limits={})
+        peak = 0
+
+        async def call(session_id):
+            nonlocal peak
+            async with scheduler.slot("m", PRIORITY_LIVE, session_id):
+                peak = max(peak, scheduler.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(call(f"s{i}") for i in range(6)))
+        return peak, scheduler.in_flight
+
+    assert asyncio.run(run()) == (2, 0)
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, rate_limits={})
+        gate = asyncio.Event()
+        blocker = asyncio.create_task(_hold(scheduler, "m", PRIORITY_LIVE, "blocker", [], gate))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(_hold(scheduler, "m", PRIORITY_LIVE, "waiting", [], asyncio.Event()))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        gate.set()
+        await blocker
+        await asyncio.sleep(0)
+        return scheduler.in_flight, scheduler.queue_depth()
+
+    assert asyncio.run(run()) == (0, 0)
+
+
+def test_rate_limited_model_waits_for_its_bucket():
+    async def run():
+        # One request of burst, then one every 50 ms
+        scheduler = LLMScheduler(max_concurrency=4, rate_limits={"m": (20.0, 1.0)})
+        loop = asyncio.get_running_loop()
+        granted = []
+
+        async def call():
+            async with scheduler.slot("m", PRIORITY_LIVE, "s"):
+                granted.append(loop.time())
+
+        await asyncio.gather(call(), call())
+        return granted[1] - granted[0]
+
+    assert asyncio.run(run()) >= 0.03
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from src.llm.singleflight import SingleFlight, prompt_key
+
+
+def test_prompt_key_depends_on_agent_model_and_text():
+    messages = ["Discuss the case", "Be brief"]
+    key = prompt_key("persona", "gpt-4o", messages)
+    assert key == prompt_key("persona", "gpt-4o", list(messages))
+    assert key != prompt_key("topic", "gpt-4o", messages)
+    assert key != prompt_key("persona", "gpt-4o-mini", messages)
+    assert key != prompt_key("persona", "gpt-4o", ["Discuss the case", "Be briefer"])
+
+
+def test_concurrent_callers_share_one_computation():
+    async def scenario():
+        flight = SingleFlight("test")
+        runs = []
+
+        async def generate():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return {"personas": ["a", "b"]}
+
+        results = await asyncio.gather(*(flight.do("case-1", generate) for _ in range(5)))
+        assert len(runs) == 1
+        assert all(result is results[0] for result in results)
+        # Nothing is cached once the flight lands
+        assert flight.in_flight() == 0
+        await flight.do("case-1", generate)
+        assert len(runs) == 2
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_do_not_coalesce():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def generate(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        assert await asyncio.gather(flight.do("a", lambda: generate(1)), flight.do("b", lambda: generate(2))) == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_every_caller_sees_the_failure():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("bad plan")
+
+        results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+    asyncio.run(scenario())
+
+
+def test_a_cancelled_caller_leaves_the_shared_work_running():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def generate():
+            await asyncio.sleep(0.05)
+            return "plan"
+
+        leaving = asyncio.create_task(flight.do("k", generate))
+        staying = asyncio.create_task(flight.do("k", generate))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        assert await staying == "plan"
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+
+    asyncio.run(scenario())
+
+
+def test_the_last_caller_leaving_cancels_the_work():
+    async def scenario():
+        flight = SingleFlight("test")
+        cancelled = []
+
+        async def generate():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        caller = asyncio.create_task(flight.do("k", generate))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        assert cancelled == [True]
+        assert flight.in_flight() == 0
+
+    asyncio.run(scenario())
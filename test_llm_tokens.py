@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.llm import tokens
+from src.llm.tokens import TokenLedger, count_tokens, preload_encodings, trim_text, usage_from_response
+
+
+@pytest.fixture
+def no_tiktoken(monkeypatch):
+    monkeypatch.setattr(tokens, "tiktoken", None)
+    monkeypatch.setattr(tokens, "_encodings", {})
+
+
+def test_character_estimate_without_tiktoken(no_tiktoken):
+    assert count_tokens("", "m") == 0
+    assert count_tokens("abcd", "m") == 1
+    assert count_tokens("abcde", "m") == 2
+
+
+def test_failing_encoding_download_falls_back_to_the_estimate(monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(tokens, "tiktoken", SimpleNamespace(encoding_for_model=unavailable, get_encoding=unavailable))
+    monkeypatch.setattr(tokens, "_encodings", {})
+    assert count_tokens("abcdefgh", "m") == 2
+    # The failure is cached: no second download attempt per call
+    assert tokens._encodings == {"m": None}
+
+
+def test_preload_runs_each_model_once(monkeypatch):
+    loaded = []
+
+    def encoding_for_model(model):
+        loaded.append(model)
+        return SimpleNamespace(encode=lambda text, disallowed_special=(): text.split())
+
+    monkeypatch.setattr(tokens, "tiktoken", SimpleNamespace(encoding_for_model=encoding_for_model))
+    monkeypatch.setattr(tokens, "_encodings", {})
+    asyncio.run(preload_encodings(["a", "b", "a"]))
+    assert sorted(loaded) == ["a", "b"]
+    assert count_tokens("three word text", "a") == 3
+    assert sorted(loaded) == ["a", "b"]
+
+
+def test_trim_text_keeps_head_and_tail_within_budget(no_tiktoken):
+    text = "HEAD " + "x" * 4000 + " TAIL"
+    trimmed = trim_text(text, 200, "m")
+    assert count_tokens(trimmed, "m") <= 200
+    assert trimmed.startswith("HEAD") and trimmed.endswith("TAIL")
+    assert "trimmed to fit the token budget" in trimmed
+    assert trim_text("short", 200, "m") == "short"
+
+
+def test_usage_from_response_reads_both_provider_formats():
+    assert usage_from_response(SimpleNamespace(usage_metadata={"input_tokens": 10, "output_tokens": 3})) == (10, 3)
+    response = SimpleNamespace(
+        usage_metadata=None,
+        response_metadata={"token_usage": {"prompt_tokens": 7, "completion_tokens": 2}}
+    )
+    assert usage_from_response(response) == (7, 2)
+    assert usage_from_response(SimpleNamespace()) is None
+
+
+def test_ledger_totals_by_session_agent_and_node():
+    ledger = TokenLedger()
+    ledger.record("s1", "executor", "execute_discussion", 100, (120, 30))
+    ledger.record("s1", "evaluator", "evaluate_discussion", 50, None)
+    ledger.record("s2", "executor", "execute_discussion", 10, (10, 5))
+
+    totals = ledger.totals("s1")
+    assert totals["total"]["calls"] == 2
+    # Without provider usage the local estimate stands in for the prompt, completion unknown
+    assert totals["total"]["prompt_tokens"] == 170
+    assert totals["total"]["completion_tokens"] == 30
+    assert totals["total"]["total_tokens"] == 200
+    assert totals["by_agent"]["evaluator"]["estimated_prompt_tokens"] == 50
+    assert set(totals["by_node"]) == {"execute_discussion", "evaluate_discussion"}
+    assert ledger.totals()["total"]["calls"] == 3
+
+
+def test_ledger_forget_drops_one_session():
+    ledger = TokenLedger()
+    ledger.record("s1", "executor", "n", 10, (10, 1))
+    ledger.record("s2", "executor", "n", 10, (10, 1))
+    ledger.forget("s1")
+    assert ledger.totals("s1")["total"]["calls"] == 0
+    assert ledger.totals("s2")["total"]["calls"] == 1
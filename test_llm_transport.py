@@ -0,0 +1,245 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("langchain")
+
+from src.llm import latency as latency_module
+from src.llm import scheduler as scheduler_module
+from src.llm import tokens as tokens_module
+from src.llm import transport as transport_module
+from src.llm.fake import FakeChatModel
+from src.llm.latency import LatencyTracker
+from src.llm.tokens import TokenBudgetExceeded, count_tokens, estimate_prompt_tokens, token_ledger
+from src.llm.scheduler import LLMScheduler
+from src.llm.transport import (
+    CircuitBreaker, CircuitOpenError, CompletionTruncatedError, LLMCallError, LLMCallPolicy, LLMTransport,
+    is_retryable
+)
+
+_models = itertools.count()
+
+
+@pytest.fixture(autouse=True)
+def local_singletons(monkeypatch):
+    # Worker-wide singletons are normally built from settings (and a .env file)
+    monkeypatch.setattr(scheduler_module, "_scheduler", LLMScheduler(max_concurrency=4, rate_limits={}))
+    monkeypatch.setattr(latency_module, "_tracker", LatencyTracker())
+
+
+def fake(*, breaker_threshold=5, breaker_reset=30.0, **options):
+    """A fake model with its own circuit breaker, so tests do not share breaker state."""
+    model = f"fake-{next(_models)}"
+    transport_module._breakers[model] = CircuitBreaker(model, breaker_threshold, breaker_reset)
+    return FakeChatModel(model_name=model, **options)
+
+
+def transport(**policy):
+    options = dict(timeout=1.0, max_retries=2, backoff_base=0.0, jitter=0.0)
+    options.update(policy)
+    return LLMTransport("test", LLMCallPolicy(**options))
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_transient_errors_are_retried():
+    llm = fake(responses=["ok"], errors=[asyncio.TimeoutError(), StatusError(503)])
+    response = asyncio.run(transport().ainvoke(llm, ["hi"]))
+    assert response.content == "ok"
+    assert len(llm.calls) == 3
+
+
+def test_retries_are_bounded():
+    llm = fake(error_rate=1.0)
+    with pytest.raises(LLMCallError):
+        asyncio.run(transport(max_retries=1).ainvoke(llm, ["hi"]))
+    assert len(llm.calls) == 2
+
+
+def test_client_errors_fail_without_retry():
+    llm = fake(errors=[StatusError(400)])
+    with pytest.raises(LLMCallError):
+        asyncio.run(transport().ainvoke(llm, ["hi"]))
+    assert len(llm.calls) == 1
+
+
+def test_deadline_cuts_a_slow_call():
+    llm = fake(responses=["late"], latency=0.5)
+    with pytest.raises(LLMCallError) as raised:
+        asyncio.run(transport(timeout=0.05, max_retries=0).ainvoke(llm, ["hi"]))
+    assert isinstance(raised.value.__cause__, asyncio.TimeoutError)
+
+
+def test_open_breaker_fails_fast():
+    llm = fake(error_rate=1.0, breaker_threshold=2)
+    with pytest.raises(LLMCallError):
+        asyncio.run(transport(max_retries=1).ainvoke(llm, ["hi"]))
+    calls = len(llm.calls)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(transport().ainvoke(llm, ["hi"]))
+    assert len(llm.calls) == calls
+
+
+def test_breaker_closes_after_a_successful_probe():
+    llm = fake(responses=["ok"], errors=[StatusError(503), StatusError(503)], breaker_threshold=2, breaker_reset=0.0)
+    with pytest.raises(LLMCallError):
+        asyncio.run(transport(max_retries=1).ainvoke(llm, ["hi"]))
+    assert asyncio.run(transport(max_retries=0).ainvoke(llm, ["hi"])).content == "ok"
+    assert transport_module._breakers[llm.model_name].state == "closed"
+
+
+def test_half_open_breaker_admits_a_single_probe():
+    breaker = CircuitBreaker("probe", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # concurrent callers wait for the probe's verdict
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+
+def test_unanswered_probe_is_replaced_after_the_reset_timeout():
+    breaker = CircuitBreaker("probe", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_client_error_answer_closes_a_half_open_breaker():
+    llm = fake(errors=[StatusError(503), StatusError(400)], breaker_threshold=1, breaker_reset=0.0)
+    with pytest.raises(LLMCallError):
+        asyncio.run(transport(max_retries=0).ainvoke(llm, ["hi"]))
+    with pytest.raises(LLMCallError):
+        asyncio.run(transport(max_retries=0).ainvoke(llm, ["hi"]))
+    assert transport_module._breakers[llm.model_name].state == "closed"
+
+
+def test_streamed_call_passes_deltas_and_returns_the_whole_answer():
+    llm = fake(responses=['{"response": {"message": "Hello there, professor"}}'])
+    deltas = []
+    response = asyncio.run(transport().ainvoke(llm, ["hi"], on_token=deltas.append))
+    assert "".join(deltas) == response.content
+    assert len(deltas) > 1
+
+
+class SlowFirstCall(FakeChatModel):
+    """The first request stalls for a second, later ones answer at once."""
+
+    stalled = False
+
+    async def ainvoke(self, messages, **kwargs):
+        if not self.stalled:
+            self.stalled = True
+            await asyncio.sleep(1.0)
+        return await super().ainvoke(messages, **kwargs)
+
+
+def hedging(**policy):
+    return transport(hedge=True, hedge_delay=0.02, hedge_min_delay=0.01, **policy)
+
+
+def test_hedge_answers_when_the_first_request_stalls():
+    model = f"fake-{next(_models)}"
+    transport_module._breakers[model] = CircuitBreaker(model)
+    llm = SlowFirstCall(responses=["hedge"], model_name=model)
+
+    async def run():
+        started = time.monotonic()
+        response = await hedging().ainvoke(llm, ["hi"])
+        return response, time.monotonic() - started
+
+    response, elapsed = asyncio.run(run())
+    assert response.content == "hedge"
+    assert elapsed < 0.5
+    assert llm.stalled and len(llm.calls) == 1  # the stalled request was cancelled
+
+
+def test_no_hedge_when_the_first_request_is_fast():
+    llm = fake(responses=["ok"])
+    assert asyncio.run(hedging().ainvoke(llm, ["hi"])).content == "ok"
+    assert len(llm.calls) == 1
+
+
+def test_streamed_calls_are_never_hedged():
+    llm = fake(responses=["streamed answer"], latency=0.1)
+    deltas = []
+    asyncio.run(hedging().ainvoke(llm, ["hi"], on_token=deltas.append))
+    assert len(llm.calls) == 1
+    assert "".join(deltas) == "streamed answer"
+
+
+def test_truncated_completion_is_retried_with_a_larger_cap():
+    answer = '{"response": {"message": "' + "x" * 50 + '"}}'
+    llm = fake(responses=[answer], max_tokens=20)
+    response = asyncio.run(transport(max_tokens_ceiling=100).ainvoke(llm, ["hi"]))
+    assert response.content == answer
+    assert len(llm.calls) == 3  # caps 20 -> 40 -> 80
+
+
+def test_truncation_at_the_ceiling_fails_instead_of_returning_cut_off_json():
+    llm = fake(responses=["y" * 50], max_tokens=20)
+    with pytest.raises(CompletionTruncatedError):
+        asyncio.run(transport(max_tokens_ceiling=30).ainvoke(llm, ["hi"]))
+    assert len(llm.calls) == 2
+
+
+def test_truncated_stream_is_not_streamed_twice():
+    llm = fake(responses=["z" * 30], max_tokens=16)
+    deltas = []
+    response = asyncio.run(transport(max_tokens_ceiling=64).ainvoke(llm, ["hi"], on_token=deltas.append))
+    assert response.content == "z" * 30
+    assert "".join(deltas) == "z" * 16
+
+
+def test_over_budget_prompt_is_trimmed_in_its_last_message(monkeypatch):
+    from langchain.schema import HumanMessage, SystemMessage
+
+    monkeypatch.setattr(tokens_module, "tiktoken", None)
+    monkeypatch.setattr(tokens_module, "_encodings", {})
+    llm = fake(responses=["ok"])
+    messages = [SystemMessage(content="static prefix"), HumanMessage(content="turn " + "x" * 2000)]
+    asyncio.run(transport(max_prompt_tokens=100).ainvoke(llm, messages))
+    sent = llm.calls[0]
+    assert sent[0].content == "static prefix"
+    assert estimate_prompt_tokens(sent, llm.model_name) <= 100
+    assert count_tokens(sent[1].content, llm.model_name) < count_tokens(messages[1].content, llm.model_name)
+
+
+def test_over_budget_prompt_is_refused_in_refuse_mode():
+    from langchain.schema import HumanMessage
+
+    llm = fake(responses=["ok"])
+    with pytest.raises(TokenBudgetExceeded):
+        asyncio.run(transport(max_prompt_tokens=10, budget_mode="refuse").ainvoke(llm, [HumanMessage(content="x" * 500)]))
+    assert llm.calls == []
+
+
+def test_calls_are_recorded_in_the_ledger_per_session():
+    llm = fake(responses=["ok"])
+    asyncio.run(transport().ainvoke(llm, ["hi"], session_id="ledger-test"))
+    totals = token_ledger.totals("ledger-test")
+    token_ledger.forget("ledger-test")
+    assert totals["total"]["calls"] == 1
+    assert totals["by_agent"]["test"]["estimated_prompt_tokens"] > 0
+
+
+def test_retryable_classification():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(StatusError(429))
+    assert is_retryable(StatusError(500))
+    assert is_retryable(StatusError(408))
+    assert not is_retryable(StatusError(409))
+    assert not is_retryable(StatusError(400))
+    assert not is_retryable(ValueError())
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("langchain")
+
+from src.prompts.assembly import assemble_prompt, prefix_tracker, render_sections
+
+STATIC = "You are the discussion planner. Answer in JSON."
+
+
+@pytest.fixture(autouse=True)
+def fresh_tracker():
+    prefix_tracker.reset()
+    yield
+    prefix_tracker.reset()
+
+
+def test_render_sections_is_order_and_key_stable():
+    first = render_sections({"Case": "text", "Participants": [{"name": "A", "role": "x"}], "Empty": []})
+    second = render_sections({"Case": "text", "Participants": [{"role": "x", "name": "A"}]})
+    assert first == second
+    assert first.index("## Case") < first.index("## Participants")
+    assert "## Empty" not in first
+
+
+def test_system_message_is_identical_across_turns():
+    context = {"Case": "A pricing case", "Participants": [{"name": "A"}]}
+    first = assemble_prompt("planner", "s1", STATIC, context, "turn 1")
+    second = assemble_prompt("planner", "s1", STATIC, dict(context), "turn 2 is much longer")
+    assert first[0].content == second[0].content
+    assert first[0].content.startswith(STATIC)
+    assert (first[1].content, second[1].content) == ("turn 1", "turn 2 is much longer")
+    assert prefix_tracker.stability("planner") == 1.0
+
+
+def test_changed_session_context_is_counted_as_unstable():
+    assemble_prompt("executor", "s1", STATIC, {"Participants": ["A"]}, "turn 1")
+    assemble_prompt("executor", "s1", STATIC, {"Participants": ["A", "B"]}, "turn 2")
+    assemble_prompt("executor", "s1", STATIC, {"Participants": ["A", "B"]}, "turn 3")
+    assert prefix_tracker.stability("executor") == 0.5
+
+
+def test_first_call_of_each_session_does_not_count_as_a_change():
+    assemble_prompt("executor", "s1", STATIC, {"Case": "one"}, "turn")
+    assemble_prompt("executor", "s2", STATIC, {"Case": "two"}, "turn")
+    assert prefix_tracker.stability("executor") == 1.0
+
+
+def test_forget_drops_only_that_session():
+    assemble_prompt("executor", "s1", STATIC, {"Case": "one"}, "turn")
+    assemble_prompt("executor", "s2", STATIC, {"Case": "two"}, "turn")
+    prefix_tracker.forget("s1")
+    # s1 starts over ("first"), s2 is still remembered ("stable")
+    assert prefix_tracker.record("executor", "s1", STATIC, "something else") is True
+    assert prefix_tracker.record("executor", "s2", STATIC, f"{STATIC}\n\n## Case\ntwo") is True
+    assert prefix_tracker.stability("executor") == 1.0
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from src.llm.tokens import token_ledger
+from src.workflow.budget import SessionBudget
+
+SESSION = "budget-test"
+
+
+@pytest.fixture(autouse=True)
+def clean_ledger():
+    token_ledger.forget(SESSION)
+    yield
+    token_ledger.forget(SESSION)
+
+
+def spend(calls, tokens_per_call):
+    for _ in range(calls):
+        token_ledger.record(SESSION, "executor", "execute_discussion", tokens_per_call, (tokens_per_call, 0))
+
+
+def make_budget(**overrides):
+    options = dict(max_llm_calls=10, max_tokens=1000, topic_target_seconds=60)
+    options.update(overrides)
+    return SessionBudget(SESSION, **options)
+
+
+def test_consumed_fraction_follows_the_tighter_budget():
+    budget = make_budget()
+    spend(2, 300)
+    assert budget.consumed_fraction() == pytest.approx(0.6)  # tokens: 600 / 1000, calls: 2 / 10
+
+
+def test_steer_moves_on_when_a_topic_has_used_its_share():
+    budget = make_budget()
+    assert budget.steer(topic_count=4) is None
+    spend(1, 300)  # 30% of the session on the first of four topics
+    assert budget.steer(topic_count=4) == "next_topic"
+    budget.start_next_topic()
+    assert budget.steer(topic_count=4) is None
+
+
+def test_steer_moves_on_when_the_topic_clock_runs_out():
+    budget = make_budget(topic_target_seconds=0.05)
+    time.sleep(0.06)
+    assert budget.steer(topic_count=4) == "next_topic"
+
+
+def test_steer_completes_when_exhausted_or_out_of_topics():
+    budget = make_budget()
+    spend(10, 1)
+    assert budget.steer(topic_count=4) == "complete"
+
+    fresh = SessionBudget("other-session", max_llm_calls=10, max_tokens=1000, topic_target_seconds=60)
+    fresh.topics_completed = 2
+    assert fresh.steer(topic_count=2) == "complete"
+
+
+def test_usage_survives_a_checkpoint_on_another_worker():
+    budget = make_budget()
+    spend(3, 100)
+    saved = budget.usage()
+    token_ledger.forget(SESSION)  # the new worker's ledger knows nothing of this session
+
+    restored = make_budget()
+    restored.restore_usage(saved)
+    assert restored.usage() == {"calls": 3, "total_tokens": 300}
+    spend(1, 100)
+    assert restored.usage() == {"calls": 4, "total_tokens": 400}
+
+
+def test_restore_on_the_same_worker_does_not_double_count():
+    budget = make_budget()
+    spend(3, 100)
+    restored = make_budget()
+    restored.restore_usage(budget.usage())
+    assert restored.usage() == {"calls": 3, "total_tokens": 300}
+
+
+def test_status_reports_usage_and_limits():
+    budget = make_budget()
+    spend(1, 250)
+    status = budget.status()
+    assert status["llm_calls"] == {"used": 1, "limit": 10}
+    assert status["tokens"] == {"used": 250, "limit": 1000}
+    assert status["topic"]["completed"] == 0
+    assert status["consumed_fraction"] == 0.25
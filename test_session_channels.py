@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from src.sessions.channels import ChannelHub, SessionChannel
+
+
+def test_input_goes_to_a_waiting_workflow_only():
+    channel = SessionChannel("case")
+    assert not channel.deliver_input("nobody is listening")
+    assert channel.take_input() is None
+
+    channel.waiters = 1
+    assert channel.deliver_input("first")
+    assert channel.deliver_input("second")
+    assert channel.take_input() == "first"
+    assert channel.take_input() == "second"
+    assert channel.take_input() is None
+
+
+def test_waiting_workflow_wakes_on_delivery():
+    async def scenario():
+        channel = SessionChannel("case")
+        channel.waiters = 1
+        assert not await channel.wait_for_input(timeout=0.01)
+        asyncio.get_running_loop().call_later(0.01, channel.deliver_input, "hello")
+        assert await channel.wait_for_input(timeout=1)
+        assert channel.take_input() == "hello"
+
+    asyncio.run(scenario())
+
+
+def test_events_fan_out_to_every_subscriber():
+    async def scenario():
+        channel = SessionChannel("case")
+        first, second = channel.subscribe(), channel.subscribe()
+        channel.publish({"type": "message", "content": "hi"})
+        assert first.get_nowait() == second.get_nowait() == {"id": 1, "type": "message", "content": "hi"}
+        channel.unsubscribe(second)
+        channel.publish({"type": "token", "delta": "h"})
+        assert first.get_nowait() == {"type": "token", "delta": "h"}
+        assert second.empty()
+
+    asyncio.run(scenario())
+
+
+def test_hub_keeps_channels_for_the_retention_window():
+    hub = ChannelHub()
+    hub.configure(retain_seconds=0.05)
+    channel = hub.get("case")
+    assert hub.get("case") is channel
+    hub.release("case")
+    assert hub.find("case") is channel  # a reconnect may still resume from its log
+    channel.last_activity = time.monotonic() - 1
+    hub.sweep()
+    assert hub.find("case") is None
+
+
+def test_hub_never_drops_a_channel_with_pending_input():
+    hub = ChannelHub()
+    channel = hub.get("case")
+    channel.waiters = 1
+    channel.deliver_input("unread")
+    hub.sweep()
+    assert hub.find("case") is channel
+
+
+def test_reconnect_replays_only_missed_events():
+    async def scenario():
+        channel = SessionChannel("case")
+        for n in range(3):
+            channel.publish({"type": "message", "content": str(n)})
+        channel.publish({"type": "token", "delta": "not logged"})
+
+        events = channel.subscribe(after=1)
+        assert [events.get_nowait()["id"] for _ in range(events.qsize())] == [2, 3]
+        assert channel.subscribe(after=channel.last_event_id).empty()
+
+    asyncio.run(scenario())
+
+
+def test_gap_beyond_the_log_asks_for_a_resync():
+    async def scenario():
+        channel = SessionChannel("case", log_size=2)
+        for n in range(5):
+            channel.publish({"type": "message", "content": str(n)})
+        assert [event["id"] for event in channel.replay(3)] == [4, 5]
+        assert channel.replay(1) is None
+        assert channel.subscribe(after=1).get_nowait() == {"id": 5, "type": "resync"}
+        # An id from an earlier incarnation of the channel cannot be trusted either
+        assert channel.replay(99) is None
+
+    asyncio.run(scenario())
+
+
+def test_a_stalled_subscriber_loses_events_without_blocking_others(monkeypatch):
+    from src.sessions import channels
+
+    monkeypatch.setattr(channels, "SUBSCRIBER_QUEUE_SIZE", 2)
+
+    async def scenario():
+        channel = SessionChannel("case")
+        stalled = channel.subscribe()
+        live = channel.subscribe()
+        for n in range(3):
+            channel.publish({"type": "message", "content": str(n)})
+            live.get_nowait()
+        assert stalled.qsize() == 2
+        assert channel.last_event_id == 3
+
+    asyncio.run(scenario())
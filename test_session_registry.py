@@ -0,0 +1,242 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("asyncpg")
+pytest.importorskip("fastapi")
+
+from src.sessions.registry import SessionRegistry, approximate_bytes
+
+
+class FakeStore:
+    def __init__(self, fail=False):
+        self.saved = {}
+        self.fail = fail
+
+    async def save(self, session_id, state, metadata):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.saved[session_id] = (state, metadata)
+
+    async def load(self, session_id):
+        return self.saved.get(session_id)
+
+
+class FakeWorkflow:
+    def __init__(self, started_case_id):
+        self.started_case_id = started_case_id
+        self.state_version = 0
+        self.active_node = None
+        self.current_state = None
+
+    def checkpoint_metadata(self):
+        return {"started_case_id": self.started_case_id}
+
+
+def make_registry(store=None, **limits):
+    registry = SessionRegistry()
+    registry.store = store if store is not None else FakeStore()
+    registry.configure(**limits)
+    return registry
+
+
+def add(registry, session_id, state=None):
+    return registry.add(session_id, FakeWorkflow(f"case-{session_id}"), state or {"current_discussion": []})
+
+
+def test_byte_estimate_follows_appends_without_remeasuring():
+    registry = make_registry()
+    add(registry, "s", {"current_discussion": ["a"], "current_step": 0})
+    registry.update_state("s", {"current_discussion": ["a", "bb", "ccc"], "current_step": 1})
+    registry.update_state("s", {"current_discussion": ["a", "bb", "ccc"], "current_step": 1, "topics": ["t"]})
+
+    final = registry.get("s")["state"]
+    # Appended tails are measured on their own, so allow a few bytes of JSON punctuation per step
+    measured = sum(approximate_bytes(value) for value in final.values())
+    assert abs(registry.get("s")["bytes"] - measured) <= 8
+    assert set(registry.get("s")["field_bytes"]) == {"current_discussion", "current_step", "topics"}
+
+    registry.update_state("s", {"current_step": 2})
+    assert set(registry.get("s")["field_bytes"]) == {"current_step"}
+
+
+def test_count_cap_evicts_least_recently_used_idle_sessions():
+    async def scenario():
+        store = FakeStore()
+        registry = make_registry(store, max_resident=2)
+        for session_id in ("a", "b"):
+            add(registry, session_id)
+        registry.touch("a")  # b is now the least recently used
+        add(registry, "c")
+        await registry.enforce_limits()
+        assert list(registry.sessions) == ["a", "c"]
+        assert "b" in store.saved
+
+    asyncio.run(scenario())
+
+
+def test_byte_cap_skips_busy_sessions():
+    async def scenario():
+        registry = make_registry(max_resident_bytes=1)
+        add(registry, "busy")
+        running = registry.start("busy", asyncio.sleep(10))
+        add(registry, "idle")
+        await registry.enforce_limits(keep="idle")
+        # Neither can go: one is running, the other is the one being served
+        assert set(registry.sessions) == {"busy", "idle"}
+        running.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_session_is_kept_when_its_checkpoint_fails():
+    async def scenario():
+        registry = make_registry(FakeStore(fail=True))
+        add(registry, "s")
+        assert not await registry.evict("s", reason="test")
+        assert registry.get("s") is not None
+
+    asyncio.run(scenario())
+
+
+def test_idle_sessions_past_the_ttl_are_spilled_and_reloaded_lazily():
+    async def scenario():
+        store = FakeStore()
+        registry = make_registry(store, idle_ttl_seconds=0.01)
+        add(registry, "old", {"current_step": 3})
+        time.sleep(0.02)
+        add(registry, "fresh")
+        await registry.evict_idle()
+        assert list(registry.sessions) == ["fresh"]
+        assert store.saved["old"][0] == {"current_step": 3}
+
+        reloads = []
+
+        async def reload(session_id):
+            reloads.append(session_id)
+            await asyncio.sleep(0.01)
+            state, metadata = store.saved[session_id]
+            return registry.add(session_id, FakeWorkflow(metadata["started_case_id"]), state)
+
+        registry._reload = reload
+        first, second = await asyncio.gather(registry.acquire("old"), registry.acquire("old"))
+        assert first is second and first["state"] == {"current_step": 3}
+        assert reloads == ["old"]
+
+    asyncio.run(scenario())
+
+
+def test_reaper_cancels_abandoned_graphs_only():
+    async def scenario():
+        store = FakeStore()
+        registry = make_registry(store)
+        add(registry, "abandoned")
+        add(registry, "polling")
+        add(registry, "idle")
+        abandoned = registry.start("abandoned", asyncio.sleep(10))
+        polling = registry.start("polling", asyncio.sleep(10))
+        for session_id in ("abandoned", "idle"):
+            registry.get(session_id)["last_seen"] -= 60
+
+        await registry.reap_abandoned(heartbeat_timeout=30)
+        assert abandoned.cancelled()
+        assert "abandoned" in store.saved
+        # A polling client keeps its graph; an idle session is left to the TTL
+        assert set(registry.sessions) == {"polling", "idle"}
+        polling.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_stops_the_graph_checkpoints_and_forgets_the_session():
+    from src.llm.tokens import token_ledger
+
+    async def scenario():
+        store = FakeStore()
+        registry = make_registry(store)
+        session = add(registry, "s", {"current_step": 1})
+        token_ledger.record("case-s", "executor", "execute_discussion", 10, (10, 1))
+        cancelled = []
+
+        async def graph():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        task = registry.start("s", graph())
+        await asyncio.sleep(0)
+        session["workflow"].current_state = {"current_step": 2}
+        await registry.cancel("s", reason="client_disconnect")
+
+        assert cancelled == [True] and task.done()
+        assert store.saved["s"] == ({"current_step": 2}, {"started_case_id": "case-s"})
+        assert registry.get("s") is None
+        assert token_ledger.totals("case-s")["total"]["calls"] == 0
+        await registry.cancel("s", reason="again")  # already gone: a no-op
+
+    asyncio.run(scenario())
+
+
+def test_a_session_runs_one_graph_at_a_time():
+    async def scenario():
+        registry = make_registry()
+        add(registry, "s")
+        first = registry.start("s", asyncio.sleep(0.01), key="request-1")
+        second = asyncio.sleep(0)
+        with pytest.raises(RuntimeError):
+            registry.start("s", second)
+        second.close()
+        assert registry.get("s")["inflight_key"] == "request-1"
+        await first
+        registry.start("s", asyncio.sleep(0), key="request-2")
+
+    asyncio.run(scenario())
+
+
+def test_response_cache_keeps_the_most_recent_results():
+    from src.sessions.registry import RESPONSE_CACHE_SIZE
+
+    registry = make_registry()
+    add(registry, "s")
+    for n in range(RESPONSE_CACHE_SIZE + 1):
+        registry.cache_response("s", f"request-{n}", {"n": n})
+    assert registry.cached_response("s", "request-0") is None
+    assert registry.cached_response("s", f"request-{RESPONSE_CACHE_SIZE}") == {"n": RESPONSE_CACHE_SIZE}
+    assert registry.cached_response("missing", "request-1") is None
+
+
+def test_drain_waits_for_running_steps_but_not_for_the_student():
+    async def scenario():
+        store = FakeStore()
+        registry = make_registry(store)
+        for session_id in ("stepping", "waiting", "stuck"):
+            add(registry, session_id)
+        stepping = registry.start("stepping", asyncio.sleep(0.05))
+        waiting = registry.start("waiting", asyncio.sleep(10))
+        registry.get("waiting")["workflow"].active_node = "handle_user_input"
+
+        started = time.monotonic()
+        await registry.drain(timeout=1)
+        assert time.monotonic() - started < 0.5  # did not sit out the student's wait
+        assert stepping.done() and not stepping.cancelled()
+        assert waiting.cancelled()
+        assert set(store.saved) == {"stepping", "waiting", "stuck"}
+        assert not registry.sessions
+
+    asyncio.run(scenario())
+
+
+def test_drain_cancels_what_outlives_the_timeout():
+    async def scenario():
+        registry = make_registry()
+        add(registry, "slow")
+        slow = registry.start("slow", asyncio.sleep(10))
+        await registry.drain(timeout=0.05)
+        assert slow.cancelled()
+        assert "slow" in registry.store.saved
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+from src.sessions.views import (
+    ETAG_CLOCK_BUCKET_SECONDS, etag_stable, make_etag, project_state, state_changes, state_delta
+)
+
+
+def test_state_changes_reports_appends_by_previous_length():
+    before = {"current_discussion": [1, 2], "current_step": 1, "topics": ["a"]}
+    after = {"current_discussion": [1, 2, 3], "current_step": 2, "topics": ["a"]}
+    assert state_changes(before, after) == {"current_discussion": 2, "current_step": None}
+
+
+def test_state_changes_treats_rewritten_lists_as_replaced():
+    assert state_changes({"topics": ["a", "b"]}, {"topics": ["c"]}) == {"topics": None}
+    assert state_changes({"topics": ["a"]}, {"topics": ["b", "c"]}) == {"topics": None}
+
+
+def _history(states):
+    return [(version, state_changes(states[version - 1], states[version])) for version in range(1, len(states))]
+
+
+def test_state_delta_carries_only_the_appended_tail():
+    states = [
+        {"current_discussion": ["a"], "current_step": 0},
+        {"current_discussion": ["a", "b"], "current_step": 0},
+        {"current_discussion": ["a", "b", "c"], "current_step": 1},
+    ]
+    delta = state_delta(states[-1], 2, _history(states), since=0)
+    assert delta == {
+        "version": 2,
+        "since": 0,
+        "set": {"current_step": 1},
+        "append": {"current_discussion": ["b", "c"]},
+    }
+
+
+def test_state_delta_replace_wins_over_append():
+    states = [
+        {"topics": ["a"]},
+        {"topics": ["a", "b"]},
+        {"topics": ["x"]},
+        {"topics": ["x", "y"]},
+    ]
+    delta = state_delta(states[-1], 3, _history(states), since=0)
+    assert delta["set"] == {"topics": ["x", "y"]}
+    assert delta["append"] == {}
+
+
+def test_state_delta_filters_fields_and_adds_virtual_ones():
+    states = [
+        {"current_discussion": ["a"], "current_step": 0, "awaiting_user_input": False},
+        {"current_discussion": ["a", "b"], "current_step": 1, "awaiting_user_input": True},
+    ]
+    delta = state_delta(states[-1], 1, _history(states), since=0, fields=["current_step", "status", "last_message"])
+    assert delta["set"] == {"current_step": 1, "status": "awaiting_input", "last_message": "b"}
+    assert delta["append"] == {}
+
+
+def test_state_delta_gives_up_beyond_the_history():
+    states = [{"n": 0}, {"n": 1}, {"n": 2}]
+    history = _history(states)[1:]  # version 1 has been forgotten
+    assert state_delta(states[-1], 2, history, since=0) is None
+    assert state_delta(states[-1], 2, history, since=1) is not None
+    assert state_delta(states[-1], 2, history, since=3) is None
+
+
+def test_state_delta_since_current_version_is_empty():
+    delta = state_delta({"n": 1}, 4, [], since=4)
+    assert delta == {"version": 4, "since": 4, "set": {}, "append": {}}
+
+
+def test_project_state_virtual_fields():
+    state = {"complete": True, "current_discussion": [], "current_step": 3}
+    assert project_state(state, ["status", "last_message", "current_step", "missing"]) == {
+        "status": "complete",
+        "last_message": None,
+        "current_step": 3,
+    }
+    assert project_state(state, None) is state
+
+
+def test_etag_ignores_the_topic_clock_within_a_bucket():
+    def extras(elapsed):
+        return {"budget": {"topic": {"completed": 1, "elapsed_seconds": elapsed}, "consumed_fraction": 0.2}}
+
+    early = make_etag("s", 3, etag_stable(extras(1.0)))
+    later = make_etag("s", 3, etag_stable(extras(ETAG_CLOCK_BUCKET_SECONDS - 1)))
+    next_bucket = make_etag("s", 3, etag_stable(extras(ETAG_CLOCK_BUCKET_SECONDS + 1)))
+    assert early == later
+    assert early != next_bucket
+    assert make_etag("s", 3, etag_stable({})) != make_etag("s", 4, etag_stable({}))
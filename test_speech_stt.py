@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import pytest
+
+from src.speech import stt
+from src.speech.stt import STTBackend, ScriptedSTTBackend, set_stt_backend, transcribe
+
+
+@pytest.fixture(autouse=True)
+def reset_backend():
+    yield
+    set_stt_backend(None)
+
+
+def test_backend_interface_is_abstract():
+    class Incomplete(STTBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        STTBackend()
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_scripted_backend_cycles_through_its_transcripts():
+    backend = ScriptedSTTBackend(["one", "two"])
+
+    async def scenario():
+        return [await backend.transcribe(b"audio") for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["one", "two", "one"]
+    with pytest.raises(ValueError):
+        ScriptedSTTBackend([])
+
+
+def test_scripted_latency_jitter_is_bounded_and_reproducible(monkeypatch):
+    slept = []
+
+    async def fake_sleep(delay):
+        slept.append(delay)
+
+    monkeypatch.setattr(stt.asyncio, "sleep", fake_sleep)
+
+    def delays(seed):
+        backend = ScriptedSTTBackend(["x"], latency=1.0, jitter=0.5, seed=seed)
+        slept.clear()
+
+        async def scenario():
+            for _ in range(20):
+                await backend.transcribe(b"audio")
+
+        asyncio.run(scenario())
+        return list(slept)
+
+    assert delays(7) == delays(7)
+    assert delays(7) != delays(8)
+    assert all(0.5 <= delay <= 1.5 for delay in delays(7))
+
+
+def test_blocking_backends_run_off_the_event_loop():
+    class BlockingBackend(STTBackend):
+        name = "blocking"
+
+        def transcribe(self, audio, filename="audio.mp3"):
+            time.sleep(0.05)
+            return f"{len(audio)} bytes"
+
+    set_stt_backend(BlockingBackend())
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        running = asyncio.create_task(ticker())
+        text = await transcribe(b"abc")
+        running.cancel()
+        return text, ticks
+
+    text, ticks = asyncio.run(scenario())
+    assert text == "3 bytes"
+    assert ticks >= 3  # the loop kept running while the clip was transcribed
+
+
+def test_concurrent_scripted_clips_overlap():
+    set_stt_backend(ScriptedSTTBackend(["hello"], latency=0.05))
+
+    async def scenario():
+        started = time.monotonic()
+        texts = await asyncio.gather(*(transcribe(b"clip") for _ in range(10)))
+        return texts, time.monotonic() - started
+
+    texts, elapsed = asyncio.run(scenario())
+    assert texts == ["hello"] * 10
+    assert elapsed < 0.3
@@ -0,0 +1,107 @@
+import array
+import math
+
+from src.speech.vad import EnergyVAD, frame_rms
+
+RATE = 16000
+FRAME_MS = 30
+
+
+def tone(ms, amplitude, rate=RATE):
+    """PCM16 sine at 440 Hz; its RMS is amplitude / sqrt(2)."""
+    samples = array.array("h", (
+        int(amplitude * math.sin(2 * math.pi * 440 * i / rate)) for i in range(rate * ms // 1000)
+    ))
+    return samples.tobytes()
+
+
+def silence(ms, rate=RATE):
+    return bytes(2 * (rate * ms // 1000))
+
+
+def make_vad(**overrides):
+    options = dict(
+        sample_rate=RATE, frame_ms=FRAME_MS, min_rms=500, segment_pause_ms=300, end_of_turn_ms=900,
+        max_segment_seconds=15, min_speech_ms=90
+    )
+    options.update(overrides)
+    return EnergyVAD(**options)
+
+
+def test_frame_rms_of_a_sine():
+    assert abs(frame_rms(tone(100, 2000)) - 2000 / math.sqrt(2)) < 20
+    assert frame_rms(silence(30)) == 0.0
+    assert frame_rms(b"") == 0.0
+
+
+def test_silence_produces_no_segments():
+    vad = make_vad()
+    assert vad.feed(silence(2000)) == []
+    assert vad.flush() == []
+
+
+def test_stream_opening_with_speech_is_segmented():
+    vad = make_vad()
+    segments = vad.feed(tone(600, 4000) + silence(1200))
+    assert [s.end_of_turn for s in segments] == [False, True]
+    assert segments[0].duration >= 0.6
+    # The end-of-turn marker follows the already emitted segment without audio of its own
+    assert segments[1].pcm == b""
+
+
+def test_short_pause_cuts_a_segment_but_keeps_the_turn():
+    vad = make_vad()
+    segments = vad.feed(tone(300, 4000) + silence(400) + tone(300, 4000) + silence(400))
+    assert len(segments) == 2
+    assert not any(s.end_of_turn for s in segments)
+    assert [s.end_of_turn for s in vad.feed(silence(600))] == [True]
+
+
+def test_blips_shorter_than_min_speech_are_dropped():
+    vad = make_vad()
+    segments = vad.feed(tone(30, 4000) + silence(1200))
+    assert [(s.pcm, s.end_of_turn) for s in segments] == [(b"", True)]
+
+
+def test_chunk_boundaries_do_not_matter():
+    audio = tone(450, 4000) + silence(450) + tone(450, 4000) + silence(1200)
+    whole = make_vad().feed(audio)
+    vad = make_vad()
+    pieces = []
+    for start in range(0, len(audio), 1234):
+        pieces += vad.feed(audio[start:start + 1234])
+    assert [(s.pcm, s.end_of_turn) for s in pieces] == [(s.pcm, s.end_of_turn) for s in whole]
+
+
+def test_flush_ends_an_open_turn():
+    vad = make_vad()
+    assert vad.feed(tone(600, 4000)) == []
+    segments = vad.flush()
+    assert len(segments) == 1 and segments[0].end_of_turn and segments[0].pcm
+    assert vad.flush() == []
+
+
+def test_long_speech_is_cut_at_max_segment_length():
+    vad = make_vad(max_segment_seconds=1)
+    segments = vad.feed(tone(2500, 4000))
+    assert len(segments) == 2
+    assert all(abs(s.duration - 1.0) < FRAME_MS / 1000 for s in segments)
+
+
+def test_noise_floor_adapts_on_background_only_and_stays_capped():
+    vad = make_vad(max_noise_floor=300)
+    start = vad.noise_floor
+    # Steady background (RMS ~424, below min_rms) raises the floor, but only up to the cap
+    assert vad.feed(tone(3000, 600)) == []
+    assert start < vad.noise_floor == 300
+    # Speech well above 3x the floor is still detected, and does not move the floor
+    segments = vad.feed(tone(600, 4000) + silence(1200))
+    assert any(s.pcm for s in segments)
+    assert vad.noise_floor <= 300
+
+
+def test_speech_does_not_raise_the_noise_floor():
+    vad = make_vad()
+    start = vad.noise_floor
+    vad.feed(tone(3000, 8000))
+    assert vad.noise_floor == start
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("asyncpg")
+pytest.importorskip("fastapi")
+
+from src.api.endpoints import websocket
+from src.sessions.registry import registry
+
+
+class ClosedSocket:
+    async def send_text(self, text):
+        raise ConnectionError("socket closed")
+
+
+def test_disconnect_leaves_the_session_to_the_reaper(monkeypatch):
+    cancelled = []
+
+    async def cancel(session_id, reason):
+        cancelled.append(session_id)
+
+    touched = []
+    monkeypatch.setattr(registry, "cancel", cancel)
+    monkeypatch.setattr(registry, "touch", touched.append)
+    websocket._on_disconnect("s")
+    websocket._on_disconnect(None)
+    assert cancelled == []
+    # The heartbeat clock restarts at the disconnect, giving the client the full window to reconnect
+    assert touched == ["s"]
+
+
+def test_stopping_the_forwarder_collects_its_failure(capsys):
+    async def scenario():
+        events = asyncio.Queue()
+        forwarder = asyncio.create_task(websocket._forward_events(ClosedSocket(), events))
+        events.put_nowait({"id": 1, "type": "message"})
+        await asyncio.sleep(0)
+        await websocket._stop_forwarder(forwarder)
+        assert forwarder.done()
+
+    asyncio.run(scenario())
+    assert "Session event forwarder failed: socket closed" in capsys.readouterr().out
+
+
+def test_stopping_an_idle_forwarder_cancels_it_quietly(capsys):
+    async def scenario():
+        forwarder = asyncio.create_task(websocket._forward_events(ClosedSocket(), asyncio.Queue()))
+        await asyncio.sleep(0)
+        await websocket._stop_forwarder(forwarder)
+        assert forwarder.cancelled()
+
+    asyncio.run(scenario())
+    assert "failed" not in capsys.readouterr().out
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("asyncpg")
+pytest.importorskip("fastapi")
+
+from src.api.endpoints import websocket
+from src.config.settings import settings
+from src.speech.stt import ScriptedSTTBackend, set_stt_backend
+
+
+@pytest.fixture
+def persisted(monkeypatch):
+    turns = []
+
+    async def persist(app, started_case_id, text):
+        turns.append((started_case_id, text))
+
+    monkeypatch.setattr(websocket, "_persist_human_message", persist)
+    yield turns
+    set_stt_backend(None)
+
+
+def collect():
+    sent = []
+
+    async def send(payload):
+        sent.append(payload)
+    return sent, send
+
+
+def test_clips_are_transcribed_in_order_and_persisted(persisted):
+    set_stt_backend(ScriptedSTTBackend(["one", "two"], latency=0.01))
+    sent, send = collect()
+
+    async def scenario():
+        clips = asyncio.Queue()
+        worker = asyncio.create_task(websocket._transcribe_clips(None, "case", clips, send))
+        for clip in (b"a", b"b"):
+            clips.put_nowait(clip)
+        await websocket._close_worker(worker, clips)
+        assert worker.done()
+
+    asyncio.run(scenario())
+    assert sent == [{"text": "one"}, {"text": "two"}]
+    assert persisted == [("case", "one"), ("case", "two")]
+
+
+def test_a_failed_clip_is_reported_and_the_worker_carries_on(persisted):
+    class FlakyBackend(ScriptedSTTBackend):
+        async def transcribe(self, audio, filename="audio.mp3"):
+            if audio == b"bad":
+                raise ValueError("unreadable audio")
+            return await super().transcribe(audio, filename)
+
+    set_stt_backend(FlakyBackend(["fine"]))
+    sent, send = collect()
+
+    async def scenario():
+        clips = asyncio.Queue()
+        worker = asyncio.create_task(websocket._transcribe_clips(None, "case", clips, send))
+        clips.put_nowait(b"bad")
+        clips.put_nowait(b"good")
+        await websocket._close_worker(worker, clips)
+
+    asyncio.run(scenario())
+    assert sent == [{"error": "unreadable audio"}, {"text": "fine"}]
+    assert persisted == [("case", "fine")]
+
+
+def test_draining_a_closed_connection_is_bounded(persisted, monkeypatch):
+    monkeypatch.setattr(settings, "stt_drain_timeout_seconds", 0.05)
+    set_stt_backend(ScriptedSTTBackend(["slow"], latency=10))
+    sent, send = collect()
+
+    async def scenario():
+        clips = asyncio.Queue()
+        worker = asyncio.create_task(websocket._transcribe_clips(None, "case", clips, send))
+        clips.put_nowait(b"clip")
+        await websocket._close_worker(worker, clips)
+        await asyncio.sleep(0)
+        assert worker.cancelled()
+
+    asyncio.run(scenario())
+    assert persisted == []
+
+
+def test_concurrent_connections_do_not_block_each_other(persisted):
+    set_stt_backend(ScriptedSTTBackend(["hi"], latency=0.05))
+
+    async def connection(case):
+        sent, send = collect()
+        clips = asyncio.Queue()
+        worker = asyncio.create_task(websocket._transcribe_clips(None, case, clips, send))
+        clips.put_nowait(b"clip")
+        await websocket._close_worker(worker, clips)
+
+    async def scenario():
+        started = asyncio.get_running_loop().time()
+        await asyncio.gather(*(connection(f"case-{n}") for n in range(10)))
+        return asyncio.get_running_loop().time() - started
+
+    assert asyncio.run(scenario()) < 0.3
+    assert sorted(persisted) == sorted((f"case-{n}", "hi") for n in range(10))